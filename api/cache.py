@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+BOARD_DETAIL_KEY = 'board-detail:{pk}:{version}'
+BOARD_DETAIL_TIMEOUT = 60 * 60
+
+
+def get_board_detail_content(board, render):
+    """
+    Returns the encoded board detail payload, calling `render` only on a cache miss.
+
+    Entries are keyed by the board version, which boards.signals bumps on every
+    write to the board tree, so a stale payload is never served and old
+    versions simply expire.
+    """
+    key = BOARD_DETAIL_KEY.format(pk=board.pk, version=board.version)
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        cache.set(key, content, BOARD_DETAIL_TIMEOUT)
+    return content
+
+
+class ConditionalGetMixin:
+    """
+    Answers `If-None-Match`/`If-Modified-Since` for views that know their content version.
+
+    A view calls `get_not_modified_response()` once the object permissions are
+    checked and returns its result if there is one, before doing any
+    serialization. The validators are added to the 200 and 304 responses alike.
+    """
+    etag = None
+    last_modified = None
+
+    def get_not_modified_response(self, request, etag=None, last_modified=None):
+        self.etag = quote_etag(etag) if etag else None
+        self.last_modified = last_modified
+        return get_conditional_response(request, etag=self.etag,
+                                        last_modified=last_modified and int(last_modified.timestamp()))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            if self.etag:
+                response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        return response
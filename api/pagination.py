@@ -0,0 +1,69 @@
+from drf_yasg import openapi
+from rest_framework import pagination
+from rest_framework.response import Response
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination over an indexed ordering with an opaque `cursor` param.
+
+    The body stays a plain list so existing clients keep working; the cursors
+    for the neighbouring pages are sent in the `Link` header.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+    def get_paginated_response(self, data):
+        return get_linked_response(data, self.get_next_link(), self.get_previous_link())
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    Numbered pages for results without a key to page on, like ranked search hits.
+
+    Like CursorPagination, the body is a plain list and the neighbouring
+    pages are linked in the `Link` header.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        return get_linked_response(data, self.get_next_link(), self.get_previous_link())
+
+
+def get_linked_response(data, next_link, previous_link):
+    links = [f'<{url}>; rel="{rel}"' for url, rel in ((next_link, 'next'), (previous_link, 'prev')) if url]
+    headers = {'Link': ', '.join(links)} if links else None
+    return Response(data, headers=headers)
+
+
+page_parameters = (
+    openapi.Parameter('page', openapi.IN_QUERY, description='Page number, from 1', type=openapi.TYPE_INTEGER),
+    openapi.Parameter('page_size', openapi.IN_QUERY, description='Number of items per page',
+                      type=openapi.TYPE_INTEGER),
+)
+
+
+pagination_parameters = (
+    openapi.Parameter('cursor', openapi.IN_QUERY,
+                      description='Opaque cursor taken from the next/prev URL of the Link header',
+                      type=openapi.TYPE_STRING),
+    openapi.Parameter('page_size', openapi.IN_QUERY,
+                      description='Number of items per page',
+                      type=openapi.TYPE_INTEGER),
+)
+
+
+class CursorPaginationMixin:
+    pagination_class = CursorPagination
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, ordering=None):
+        self.paginator = self.pagination_class()
+        self.paginator.ordering = ordering or self.ordering
+        return self.paginator.paginate_queryset(queryset, request, view=self)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
@@ -1,12 +1,12 @@
 from rest_framework import permissions
 
-from boards.models import BoardMember, CardComment
+from boards.access import get_user_access
 
 
 class IsProjectOwnerOrReadOnly(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.pk:
             return True
         return False
 
@@ -14,9 +14,10 @@ class IsProjectOwnerOrReadOnly(permissions.BasePermission):
 class IsBoardOwnerOrMember(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        if obj.project.owner == request.user:
+        access = get_user_access(request.user)
+        if obj.project_id in access.projects:
             return True
-        if BoardMember.objects.filter(user=request.user, board=obj).exists() and request.method in ('GET',):
+        if obj.pk in access.boards and request.method in ('GET',):
             return True
         return False
 
@@ -24,15 +25,16 @@ class IsBoardOwnerOrMember(permissions.BasePermission):
 class IsBoardMember(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        if BoardMember.objects.filter(user=request.user, board=obj).exists():
+        if obj.pk in get_user_access(request.user).boards:
             return True
         return False
 
 
 class IsCommentOwner(permissions.BasePermission):
+    # Expects the comment to be loaded with select_related('card__column').
 
     def has_object_permission(self, request, view, obj):
-        if (CardComment.objects.filter(user=request.user, card=obj.card).exists() and
-                BoardMember.objects.filter(user=request.user, board=obj.card.column.board).exists()):
+        column = obj.card.column if obj.card else None
+        if obj.user_id == request.user.pk and column and column.board_id in get_user_access(request.user).boards:
             return True
         return False
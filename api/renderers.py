@@ -0,0 +1,89 @@
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+# Floats stdlib json writes differently from orjson: with an exponent, "1e+16" where orjson writes "1e16",
+# and small ones, "1e-05" where orjson writes "0.00001". Numbers are mapped to runs of zeros so both are
+# found with plain substring searches rather than a regex over the whole output.
+NUMBERS = bytes.maketrans(b'123456789.-+E', b'000000000000e')
+SMALL_FLOAT = b'0.0000'
+# What precedes a value in compact JSON, anything else before a hit means it is inside a string.
+VALUE_START = b':,['
+
+
+def starts_value(content, index):
+    return index == 0 or content[index - 1] in VALUE_START
+
+
+def has_unlike_float(content):
+    """Whether orjson wrote a float in `content` that stdlib json would write differently."""
+    if b'0e' in (numbers := content.translate(NUMBERS)):
+        index = numbers.find(b'0e')
+        while index != -1:
+            # Floats take at most 24 characters, a longer run of digits is not one.
+            run = numbers[max(0, index - 32):index]
+            start = index - len(run) + len(run.rstrip(b'0'))
+            if starts_value(content, start):
+                return True
+            index = numbers.find(b'0e', index + 2)
+    index = content.find(SMALL_FLOAT)
+    while index != -1:
+        if starts_value(content, index - (content[index - 1:index] == b'-')):
+            return True
+        index = content.find(SMALL_FLOAT, index + len(SMALL_FLOAT))
+    return False
+
+
+_encoder = encoders.JSONEncoder()
+
+
+def encode_default(obj):
+    # Everything orjson and msgpack do not write as DRF does goes through DRF's own encoder.
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer writing with orjson, byte for byte the same as DRF's stdlib json.
+
+    Datetimes and other types DRF encodes its own way go through DRF's
+    encoder. Output with floats stdlib json would format differently,
+    indented, ASCII-only or non-compact output, and data orjson cannot
+    encode are rendered by JSONRenderer itself. Unlike it, NaN and infinite
+    floats come out as null instead of failing.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=encode_default,
+                                   option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                                   | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except orjson.JSONEncodeError:
+            # Integers past 64 bits, among others, which stdlib json writes or rejects itself.
+            return super().render(data, accepted_media_type, renderer_context)
+        if has_unlike_float(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80' in content:
+            # Same escapes as JSONRenderer, these are valid JSON but not valid JavaScript.
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renders the same data as the JSON renderers as MessagePack, asked for with `Accept: application/msgpack`."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    render_style = 'binary'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
@@ -0,0 +1,110 @@
+import hashlib
+from collections import OrderedDict
+
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+
+def parse_paths(value):
+    if not value:
+        return None
+    return frozenset(tuple(path.strip().split('.')) for path in value.split(',') if path.strip())
+
+
+def descend(paths, relation):
+    return frozenset(path[1:] for path in paths if path[0] == relation and len(path) > 1)
+
+
+class FieldSelection:
+    """
+    The part of a nested representation asked for with `?fields=`, `?expand=` and `?depth=`.
+
+    `fields` and `expand` take comma separated, dotted paths like `columns.cards.title`.
+    `fields` picks the keys to return, `expand` the relations to embed and
+    `depth` how many relation levels to embed at most. A relation that any of
+    them leaves out is neither prefetched nor serialized. Without parameters
+    the full representation is returned.
+    """
+
+    def __init__(self, fields=None, expand=None, depth=None):
+        self.fields = fields
+        self.expand = expand
+        self.depth = depth
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        depth = params.get('depth')
+        if depth is not None:
+            if not depth.isdigit():
+                raise ValidationError({'depth': 'A non-negative integer is required.'})
+            depth = int(depth)
+        return cls(parse_paths(params.get('fields')), parse_paths(params.get('expand')), depth)
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None and self.depth is None
+
+    def includes(self, name):
+        return self.fields is None or any(path[0] == name for path in self.fields)
+
+    def expands(self, relation):
+        return (self.includes(relation)
+                and (self.depth is None or self.depth > 0)
+                and (self.expand is None or any(path[0] == relation for path in self.expand)))
+
+    def nested(self, relation):
+        fields = None
+        # A bare relation name in `fields` asks for the whole nested object.
+        if self.fields is not None and (relation,) not in self.fields:
+            fields = descend(self.fields, relation)
+        expand = None if self.expand is None else descend(self.expand, relation)
+        depth = None if self.depth is None else self.depth - 1
+        return FieldSelection(fields, expand, depth)
+
+    def vary_etag(self, etag):
+        if self.is_default:
+            return etag
+        state = repr((sorted(self.fields or ()), sorted(self.expand or ()), self.depth))
+        return f'{etag}-' + hashlib.md5(state.encode()).hexdigest()
+
+
+ALL_FIELDS = FieldSelection()
+
+
+class SelectableFieldsMixin:
+    """
+    Serializer mixin that leaves out the fields the `selection` in its context does not ask for.
+
+    Serializers with nested relations check `selection.expands()` before
+    serializing one and hand `get_nested_context()` to the nested serializer.
+    """
+
+    @property
+    def selection(self):
+        return self.context.get('selection', ALL_FIELDS)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection.fields is None:
+            return fields
+        return OrderedDict((name, field) for name, field in fields.items() if selection.includes(name))
+
+    def get_nested_context(self, relation):
+        return {**self.context, 'selection': self.selection.nested(relation)}
+
+
+selection_parameters = (
+    openapi.Parameter('fields', openapi.IN_QUERY,
+                      description='Comma separated fields to return, nested ones as dotted paths '
+                                  '(e.g. id,title,columns.cards.title)',
+                      type=openapi.TYPE_STRING),
+    openapi.Parameter('expand', openapi.IN_QUERY,
+                      description='Comma separated relations to embed, nested ones as dotted paths '
+                                  '(e.g. columns.cards). All relations are embedded if omitted',
+                      type=openapi.TYPE_STRING),
+    openapi.Parameter('depth', openapi.IN_QUERY,
+                      description='Maximum number of nested relation levels to embed',
+                      type=openapi.TYPE_INTEGER),
+)
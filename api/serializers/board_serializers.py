@@ -1,52 +1,66 @@
 from collections import OrderedDict
-from io import BytesIO
 
-from PIL import Image
-from django.core.files import File
+from django.db.models import Prefetch
 from rest_framework import serializers
 
+from api.selection import ALL_FIELDS, SelectableFieldsMixin
 from api.serializers.user_serializers import User, UserSerializer
-from api.serializers.column_serializers import BarSerializer
+from boards.images import schedule_background_compression
 from boards.models import Project, Board, BoardMember, BoardFavourite, Mark
 
 
-def compress_img(image_to_compress):
-    image = Image.open(image_to_compress)
-    image_output = BytesIO()
-    image.save(image_output,
-               "JPEG",
-               optimize=True,
-               quality=30)
-    image = File(image_output, name=image_to_compress.name)
-    return image
+def set_background_img(board, background_img):
+    # The original is stored right away and compressed off the request.
+    board.background_img = background_img
+    board.background_status = Board.BackgroundStatus.PENDING
 
 
-class BoardSerializer(serializers.Serializer):
+class BackgroundSrcsetField(serializers.Field):
+    """`srcset` of the WebP variants of the board background, empty until they are rendered."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, board):
+        request = self.context.get('request')
+        return ', '.join(f'{request.build_absolute_uri(url) if request else url} {width}w'
+                         for width, url in board.get_background_variants())
+
+
+class BoardSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     project = serializers.PrimaryKeyRelatedField(read_only=True)
     title = serializers.CharField(max_length=50)
     background_img = serializers.ImageField()
+    background_status = serializers.CharField(read_only=True)
+    background_srcset = BackgroundSrcsetField()
+    background_placeholder = serializers.CharField(read_only=True)
     is_archived = serializers.BooleanField(read_only=True)
 
     created_on = serializers.DateTimeField(read_only=True)
     last_modified = serializers.DateTimeField(read_only=True)
 
     def create(self, validated_data):
-        background_img = compress_img(validated_data['background_img'])
         project = Project.objects.get(pk=validated_data['project'])
 
         board = Board(title=validated_data['title'],
-                      project=project,
-                      background_img=background_img)
+                      project=project)
+        set_background_img(board, validated_data['background_img'])
         board.save()
+        schedule_background_compression(board)
 
         return board
 
     def update(self, instance, validated_data):
+        background_img = validated_data.get('background_img')
         instance.title = validated_data.get('title', instance.title)
-        if validated_data.get('background_img'):
-            instance.background_img = compress_img(validated_data['background_img'])
+        if background_img:
+            set_background_img(instance, background_img)
         instance.save()
+        if background_img:
+            schedule_background_compression(instance)
         return instance
 
 
@@ -72,27 +86,52 @@ class BoardPatchSerializer(BoardSerializer):
         return new_fields
 
 
-class BoardDetailSerializer(serializers.Serializer):
+class BoardDetailSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     project = serializers.PrimaryKeyRelatedField(read_only=True)
     title = serializers.CharField(max_length=50, required=False)
     background_img = serializers.ImageField(required=False)
+    background_status = serializers.CharField(read_only=True)
+    background_srcset = BackgroundSrcsetField()
+    background_placeholder = serializers.CharField(read_only=True)
 
     created_on = serializers.DateTimeField(read_only=True)
     last_modified = serializers.DateTimeField(read_only=True)
 
     def update(self, instance, validated_data):
+        background_img = validated_data.get('background_img')
         instance.title = validated_data.get('title', instance.title)
-        if validated_data.get('background_img'):
-            instance.background_img = compress_img(validated_data['background_img'])
+        if background_img:
+            set_background_img(instance, background_img)
         instance.save()
+        if background_img:
+            schedule_background_compression(instance)
         return instance
 
+    @staticmethod
+    def get_prefetch_lookups(prefix='', selection=ALL_FIELDS):
+        from api.serializers.column_serializers import BarSerializer
+
+        lookups = []
+        if selection.expands('members'):
+            lookups.append(Prefetch(prefix + 'members', queryset=BoardMember.objects.select_related('user')))
+        if selection.expands('columns'):
+            lookups.append(prefix + 'columns')
+            lookups.extend(BarSerializer.get_prefetch_lookups(prefix + 'columns__', selection.nested('columns')))
+        return lookups
+
     def to_representation(self, instance):
-        members = [member.user for member in BoardMember.objects.filter(board=instance)]
+        from api.serializers.column_serializers import BarSerializer
+
+        selection = self.selection
         representation = super().to_representation(instance)
-        representation['columns'] = BarSerializer(instance.columns.all(), many=True, context=self.context).data
-        representation['members'] = UserSerializer(members, many=True, context=self.context).data
+        if selection.expands('columns'):
+            representation['columns'] = BarSerializer(instance.columns.all(), many=True,
+                                                      context=self.get_nested_context('columns')).data
+        if selection.expands('members'):
+            members = [member.user for member in instance.members.all()]
+            representation['members'] = UserSerializer(members, many=True,
+                                                       context=self.get_nested_context('members')).data
         return representation
 
 
@@ -102,11 +141,10 @@ class BoardFavouriteSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         board = Board.objects.get(pk=validated_data['board'])
-        bf, created = BoardFavourite(
+        bf, created = BoardFavourite.objects.get_or_create(
             board=board,
             user=validated_data['user']
         )
-        bf.save()
         return bf
 
 
@@ -115,16 +153,15 @@ class BoardMemberSerializer(serializers.Serializer):
     user = serializers.EmailField()
 
     def create(self, validated_data):
-        board_member = BoardMember(
+        board_member, created = BoardMember.objects.get_or_create(
             board=Board.objects.get(pk=validated_data['board']),
             user=User.objects.get(email=validated_data['user'])
         )
-        board_member.save()
 
         return board_member
 
 
-class BoardMarkSerializer(serializers.Serializer):
+class BoardMarkSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     board = serializers.PrimaryKeyRelatedField(read_only=True)
     title = serializers.CharField(max_length=30)
@@ -165,3 +202,11 @@ class BoardsLastSeenSerializer(serializers.Serializer):
         representation = super().to_representation(instance)
         representation['board'] = BoardSerializer(instance.board, context=self.context).data
         return representation
+
+
+class BoardChangeSerializer(serializers.Serializer):
+    seq = serializers.IntegerField(read_only=True)
+    model = serializers.CharField(read_only=True)
+    id = serializers.IntegerField(source='object_id', read_only=True)
+    action = serializers.CharField(read_only=True)
+    data = serializers.JSONField(read_only=True)
@@ -1,138 +1,243 @@
-from collections import OrderedDict
-
-from django.utils import timezone
-from rest_framework import serializers
-
-from api.serializers.board_serializers import BoardMarkSerializer
-from boards.models import Column, Card, Mark, CardMark, CardFile, CardComment
-
-
-class CardSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(read_only=True)
-    title = serializers.CharField(max_length=30)
-    description = serializers.CharField(max_length=500)
-    checklist = serializers.JSONField(default={'Make a to-do': False})
-    deadline = serializers.DateTimeField()
-
-    def create(self, validated_data):
-        column = Column.objects.get(pk=validated_data['column'])
-        card = Card(
-            column=column,
-            title=validated_data['title'],
-            description=validated_data['description'],
-            checklist=validated_data.get('checklist'),
-            deadline=validated_data['deadline'],
-        )
-
-        card.save()
-        return card
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        marks = [cardmark.mark for cardmark in instance.marks.all()]
-        representation['marks'] = BoardMarkSerializer(marks, many=True, context=self.context).data
-        representation['files'] = CardFileSerializer(instance.files.all(), many=True, context=self.context).data
-        representation['comments'] = CardCommentSerializer(instance.comments.all(), many=True,
-                                                           context=self.context).data
-        return representation
-
-    def update(self, instance, validated_data):
-        instance.title = validated_data.get('title', instance.title)
-        instance.description = validated_data.get('description', instance.description)
-        instance.checklist = validated_data.get('checklist', instance.checklist)
-        instance.deadline = validated_data.get('deadline', instance.deadline)
-        instance.save()
-        return instance
-
-
-class CardUpdateSerializer(CardSerializer):
-    # Only for schema generation, not actually used.
-    # because DRF-YASG does not support partial.
-    def get_fields(self):
-        new_fields = OrderedDict()
-        for name, field in super().get_fields().items():
-            field.required = False
-            new_fields[name] = field
-        return new_fields
-
-
-class CardMarkSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
-    mark = serializers.PrimaryKeyRelatedField(queryset=Mark.objects.all())
-
-    def create(self, validated_data):
-        card = Card.objects.get(pk=validated_data['card'])
-        mark = validated_data['mark']
-        card = CardMark(
-            card=card,
-            mark=mark
-        )
-        card.save()
-        return card
-
-
-class CardMarkDetailSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
-    mark = serializers.PrimaryKeyRelatedField(queryset=Mark.objects.all())
-    card = serializers.IntegerField()
-
-
-class CardFileSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
-    file = serializers.FileField()
-
-    def create(self, validated_data):
-        card = Card.objects.get(pk=validated_data['card'])
-        card_file = CardFile(
-            card=card,
-            file=validated_data['file']
-        )
-        card_file.save()
-        return card_file
-
-
-class CardFileDetailSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
-    file = serializers.FileField()
-    card = serializers.IntegerField()
-
-
-class CardCommentSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
-    card = serializers.PrimaryKeyRelatedField(read_only=True)
-    user = serializers.PrimaryKeyRelatedField(read_only=True)
-    body = serializers.CharField(max_length=300)
-    created_on = serializers.DateTimeField(default=timezone.now)
-
-    def create(self, validated_data):
-        card = Card.objects.get(pk=validated_data['card'])
-        card_comment = CardComment(
-            card=card,
-            user=validated_data['user'],
-            body=validated_data['body'],
-            created_on=validated_data['created_on']
-        )
-        card_comment.save()
-        return card_comment
-
-    def update(self, instance, validated_data):
-        instance.body = validated_data.get('body', instance.body)
-        instance.save()
-        return instance
-
-
-class CardCommentDetailSerializer(serializers.Serializer):
-    id = serializers.IntegerField()
-    card = serializers.PrimaryKeyRelatedField(read_only=True)
-    user = serializers.PrimaryKeyRelatedField(read_only=True)
-
-
-class CardCommentUpdateSerializer(CardCommentSerializer):
-    # Only for schema generation, not actually used.
-    # because DRF-YASG does not support partial.
-    def get_fields(self):
-        new_fields = OrderedDict()
-        for name, field in super().get_fields().items():
-            field.required = False
-            new_fields[name] = field
-        return new_fields
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import serializers
+
+from api.selection import ALL_FIELDS, SelectableFieldsMixin
+from api.serializers.board_serializers import BoardMarkSerializer
+from boards.models import Column, Card, Mark, CardMark, CardFile, CardFileUpload, CardComment
+
+
+class CardSerializer(SelectableFieldsMixin, serializers.Serializer):
+    id = serializers.PrimaryKeyRelatedField(read_only=True)
+    title = serializers.CharField(max_length=30)
+    description = serializers.CharField(max_length=500)
+    checklist = serializers.JSONField(default={'Make a to-do': False})
+    deadline = serializers.DateTimeField()
+
+    def create(self, validated_data):
+        column = Column.objects.get(pk=validated_data['column'])
+        card = Card(
+            column=column,
+            title=validated_data['title'],
+            description=validated_data['description'],
+            checklist=validated_data.get('checklist'),
+            deadline=validated_data['deadline'],
+        )
+
+        card.save()
+        return card
+
+    @staticmethod
+    def get_prefetch_lookups(prefix='', selection=ALL_FIELDS):
+        lookups = []
+        if selection.expands('marks'):
+            lookups.append(Prefetch(prefix + 'marks', queryset=CardMark.objects.select_related('mark')))
+        if selection.expands('files'):
+            lookups.append(prefix + 'files')
+        if selection.expands('comments'):
+            lookups.append(prefix + 'comments')
+        return lookups
+
+    def to_representation(self, instance):
+        selection = self.selection
+        representation = super().to_representation(instance)
+        if selection.expands('marks'):
+            marks = [cardmark.mark for cardmark in instance.marks.all()]
+            representation['marks'] = BoardMarkSerializer(marks, many=True,
+                                                          context=self.get_nested_context('marks')).data
+        if selection.expands('files'):
+            representation['files'] = CardFileSerializer(instance.files.all(), many=True,
+                                                         context=self.get_nested_context('files')).data
+        if selection.expands('comments'):
+            representation['comments'] = CardCommentSerializer(instance.comments.all(), many=True,
+                                                               context=self.get_nested_context('comments')).data
+        return representation
+
+    def update(self, instance, validated_data):
+        instance.title = validated_data.get('title', instance.title)
+        instance.description = validated_data.get('description', instance.description)
+        instance.checklist = validated_data.get('checklist', instance.checklist)
+        instance.deadline = validated_data.get('deadline', instance.deadline)
+        instance.save()
+        return instance
+
+
+class CardOperationSerializer(serializers.Serializer):
+    # Fields each operation needs; `update` changes whichever card fields are given.
+    REQUIRED_FIELDS = {
+        'create': ('column', 'title', 'description', 'deadline'),
+        'update': ('id',),
+        'move': ('id', 'column'),
+        'delete': ('id',),
+    }
+
+    op = serializers.ChoiceField(choices=tuple(REQUIRED_FIELDS))
+    id = serializers.IntegerField(required=False)
+    column = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=30, required=False)
+    description = serializers.CharField(max_length=500, required=False)
+    checklist = serializers.JSONField(required=False)
+    deadline = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        missing = {name: ['This field is required.']
+                   for name in self.REQUIRED_FIELDS[attrs['op']] if name not in attrs}
+        if missing:
+            raise serializers.ValidationError(missing)
+        return attrs
+
+
+class MoveSerializer(serializers.Serializer):
+    before = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if 'before' in attrs and 'after' in attrs:
+            raise serializers.ValidationError('Give either before or after, not both.')
+        return attrs
+
+
+class CardMoveSerializer(MoveSerializer):
+    column = serializers.IntegerField(required=False)
+
+
+class CardUpdateSerializer(CardSerializer):
+    # Only for schema generation, not actually used.
+    # because DRF-YASG does not support partial.
+    def get_fields(self):
+        new_fields = OrderedDict()
+        for name, field in super().get_fields().items():
+            field.required = False
+            new_fields[name] = field
+        return new_fields
+
+
+class CardMarkSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    mark = serializers.PrimaryKeyRelatedField(queryset=Mark.objects.all())
+
+    def create(self, validated_data):
+        card = Card.objects.get(pk=validated_data['card'])
+        mark = validated_data['mark']
+        card, created = CardMark.objects.get_or_create(
+            card=card,
+            mark=mark
+        )
+        return card
+
+
+class CardMarkDetailSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    mark = serializers.PrimaryKeyRelatedField(queryset=Mark.objects.all())
+    card = serializers.IntegerField()
+
+
+class CardFileSerializer(SelectableFieldsMixin, serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    file = serializers.FileField()
+    name = serializers.CharField(read_only=True)
+
+    def create(self, validated_data):
+        card = Card.objects.get(pk=validated_data['card'])
+        card_file = CardFile(
+            card=card,
+            file=validated_data['file']
+        )
+        card_file.save()
+        return card_file
+
+
+class CardFileDetailSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    file = serializers.FileField()
+    card = serializers.IntegerField()
+
+
+class CardFileUploadPartSerializer(serializers.Serializer):
+    number = serializers.IntegerField(read_only=True)
+    size = serializers.IntegerField(read_only=True)
+    sha256 = serializers.CharField(read_only=True)
+
+
+class CardFileUploadSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    card = serializers.PrimaryKeyRelatedField(read_only=True)
+    name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=0)
+    part_size = serializers.IntegerField(read_only=True)
+    part_count = serializers.IntegerField(read_only=True)
+    # The parts received so far, a resumed upload sends the others.
+    parts = CardFileUploadPartSerializer(many=True, read_only=True)
+    # Polled once completed, until the upload is done with its file or takes parts again after an error.
+    status = serializers.CharField(read_only=True)
+    error = serializers.CharField(read_only=True)
+    sha256 = serializers.CharField(read_only=True)
+    card_file = CardFileSerializer(read_only=True)
+
+    created_on = serializers.DateTimeField(read_only=True)
+    last_modified = serializers.DateTimeField(read_only=True)
+
+    def validate_size(self, value):
+        if value > settings.CARD_FILE_MAX_SIZE:
+            raise serializers.ValidationError(f'Files are limited to {settings.CARD_FILE_MAX_SIZE} bytes.')
+        return value
+
+    def create(self, validated_data):
+        upload = CardFileUpload(
+            card=Card.objects.get(pk=validated_data['card']),
+            owner=validated_data['owner'],
+            name=validated_data['name'],
+            size=validated_data['size'],
+            part_size=settings.CARD_FILE_UPLOAD_PART_SIZE
+        )
+        upload.save()
+        return upload
+
+
+class CardFileUploadCompleteSerializer(serializers.Serializer):
+    # Checked against the joined parts when given.
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+
+
+class CardCommentSerializer(SelectableFieldsMixin, serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    card = serializers.PrimaryKeyRelatedField(read_only=True)
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    body = serializers.CharField(max_length=300)
+    created_on = serializers.DateTimeField(default=timezone.now)
+
+    def create(self, validated_data):
+        card = Card.objects.get(pk=validated_data['card'])
+        card_comment = CardComment(
+            card=card,
+            user=validated_data['user'],
+            body=validated_data['body'],
+            created_on=validated_data['created_on']
+        )
+        card_comment.save()
+        return card_comment
+
+    def update(self, instance, validated_data):
+        instance.body = validated_data.get('body', instance.body)
+        instance.save()
+        return instance
+
+
+class CardCommentDetailSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    card = serializers.PrimaryKeyRelatedField(read_only=True)
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+
+
+class CardCommentUpdateSerializer(CardCommentSerializer):
+    # Only for schema generation, not actually used.
+    # because DRF-YASG does not support partial.
+    def get_fields(self):
+        new_fields = OrderedDict()
+        for name, field in super().get_fields().items():
+            field.required = False
+            new_fields[name] = field
+        return new_fields
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
+from api.selection import ALL_FIELDS, SelectableFieldsMixin
 from api.serializers.card_serializers import CardSerializer
 from boards.models import Board, Column
 
 
-class BarSerializer(serializers.Serializer):
+class BarSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     title = serializers.CharField(max_length=30)
 
@@ -23,7 +24,15 @@ class BarSerializer(serializers.Serializer):
         instance.save()
         return instance
 
+    @staticmethod
+    def get_prefetch_lookups(prefix='', selection=ALL_FIELDS):
+        if not selection.expands('cards'):
+            return []
+        return [prefix + 'cards', *CardSerializer.get_prefetch_lookups(prefix + 'cards__', selection.nested('cards'))]
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['cards'] = CardSerializer(instance.cards.all(), many=True, context=self.context).data
+        if self.selection.expands('cards'):
+            representation['cards'] = CardSerializer(instance.cards.all(), many=True,
+                                                     context=self.get_nested_context('cards')).data
         return representation
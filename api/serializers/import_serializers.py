@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from boards.models import ImportJob
+
+
+class ImportJobSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    source = serializers.FileField(write_only=True)
+    project = serializers.IntegerField(source='project_id', required=False, allow_null=True)
+    status = serializers.CharField(read_only=True)
+    error = serializers.CharField(read_only=True)
+    rows = serializers.IntegerField(read_only=True)
+    seconds = serializers.FloatField(read_only=True)
+    rows_per_second = serializers.IntegerField(read_only=True, allow_null=True)
+    created_on = serializers.DateTimeField(read_only=True)
+    last_modified = serializers.DateTimeField(read_only=True)
+
+    def create(self, validated_data):
+        return ImportJob.objects.create(
+            owner=validated_data['owner'],
+            project_id=validated_data.get('project_id'),
+            source=validated_data['source']
+        )
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
+from api.selection import ALL_FIELDS, SelectableFieldsMixin
 from api.serializers.board_serializers import BoardSerializer
 from boards.models import Project
 
 
-class ProjectSerializer(serializers.Serializer):
+class ProjectSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     title = serializers.CharField(max_length=50)
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
@@ -23,7 +24,13 @@ class ProjectSerializer(serializers.Serializer):
         instance.save()
         return instance
 
+    @staticmethod
+    def get_prefetch_lookups(prefix='', selection=ALL_FIELDS):
+        return [prefix + 'boards'] if selection.expands('boards') else []
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['boards'] = BoardSerializer(instance.boards.all(), many=True, context=self.context).data
+        if self.selection.expands('boards'):
+            representation['boards'] = BoardSerializer(instance.boards.all(), many=True,
+                                                       context=self.get_nested_context('boards')).data
         return representation
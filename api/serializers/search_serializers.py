@@ -0,0 +1,10 @@
+from rest_framework import serializers
+
+
+class SearchHitSerializer(serializers.Serializer):
+    type = serializers.CharField(source='model', read_only=True)
+    id = serializers.IntegerField(read_only=True)
+    board = serializers.IntegerField(source='board_id', read_only=True)
+    card = serializers.IntegerField(source='card_id', read_only=True, allow_null=True)
+    title = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
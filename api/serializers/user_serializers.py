@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from api.selection import SelectableFieldsMixin
+
 User = get_user_model()
 
 
-class UserSerializer(serializers.Serializer):
+class UserSerializer(SelectableFieldsMixin, serializers.Serializer):
     id = serializers.IntegerField(read_only=True)
     email = serializers.EmailField()
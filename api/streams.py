@@ -0,0 +1,161 @@
+import asyncio
+import json
+import re
+from importlib import import_module
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, parse_cookie
+from django.utils.http import is_same_domain
+
+from boards.events import Subscription, ResyncRequired
+from boards.models import Board
+from .permissions import IsBoardOwnerOrMember
+
+BOARD_EVENTS_PATH = re.compile(r'^/api/boards/(?P<pk>\d+)/events/$')
+
+
+def authorize(scope, board_id):
+    """Returns the status refusing the stream of the board to the session user, or None to allow it."""
+    headers = dict(scope['headers'])
+    request = HttpRequest()
+    request.method = 'GET'
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+        parse_cookie(headers.get(b'cookie', b'').decode('latin-1')).get(settings.SESSION_COOKIE_NAME))
+    request.user = get_user(request)
+
+    if not request.user.is_authenticated:
+        return 403
+    board = Board.objects.filter(pk=board_id).first()
+    if board is None:
+        return 404
+    if not IsBoardOwnerOrMember().has_object_permission(request, None, board):
+        return 403
+    return None
+
+
+def is_allowed_origin(scope):
+    """
+    Whether a WebSocket handshake comes from a page of the host it was sent to, or of CSRF_TRUSTED_ORIGINS.
+
+    Browsers send the session cookie along with cross-site WebSocket
+    handshakes, and always send their Origin, so only handshakes without one
+    are let through regardless. ALLOWED_HOSTS is no help here, Heroku sets
+    it to '*'.
+    """
+    headers = dict(scope['headers'])
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    if not origin:
+        return True
+    parsed = urlparse(origin)
+    if parsed.netloc and parsed.netloc == headers.get(b'host', b'').decode('latin-1').lower():
+        return True
+    # Trusted the way CsrfViewMiddleware trusts them, wildcards included.
+    return origin in settings.CSRF_TRUSTED_ORIGINS or any(
+        trusted.startswith(f'{parsed.scheme}://*') and is_same_domain(parsed.netloc, trusted.split('://*', 1)[1])
+        for trusted in settings.CSRF_TRUSTED_ORIGINS)
+
+
+def get_since(scope):
+    """Reads the last seq the client has seen from Last-Event-ID or the `since` query param."""
+    since = dict(scope['headers']).get(b'last-event-id', b'').decode('latin-1')
+    since = since or parse_qs(scope['query_string'].decode('latin-1')).get('since', [''])[0]
+    return int(since) if since.isdigit() else None
+
+
+def encode(data):
+    return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+class BoardEventsRouter:
+    """
+    Serves the live changes of a board at /api/boards/<pk>/events/ and hands every other request to Django.
+
+    Plain requests get Server-Sent Events, WebSocket connections get one JSON
+    message per change. Both resume after the seq given in Last-Event-ID or
+    `since`, the same seq as the changes endpoint, and end with a resync
+    event when the changes in between can no longer be delivered.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = scope['type'] in ('http', 'websocket') and BOARD_EVENTS_PATH.match(scope['path'])
+        if not match:
+            return await self.application(scope, receive, send)
+
+        board_id = int(match['pk'])
+        if scope['type'] == 'websocket':
+            return await self.serve_websocket(scope, receive, send, board_id)
+        return await self.serve_events(scope, receive, send, board_id)
+
+    async def serve_events(self, scope, receive, send, board_id):
+        refused = await sync_to_async(authorize)(scope, board_id)
+        if refused:
+            await send({'type': 'http.response.start', 'status': refused,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body', 'body': encode({'Details': 'Board is not available'}).encode()})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+
+        async def stream():
+            async with Subscription(board_id, get_since(scope)) as subscription:
+                await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+                while True:
+                    try:
+                        change = await subscription.get(timeout=settings.BOARD_EVENTS_HEARTBEAT)
+                    except ResyncRequired:
+                        await send({'type': 'http.response.body', 'body': b'event: resync\ndata: {}\n\n'})
+                        return
+                    if change is None:
+                        message = b': ping\n\n'
+                    else:
+                        message = f'id: {change["seq"]}\nevent: change\ndata: {encode(change)}\n\n'.encode()
+                    await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+
+        await self.until_disconnect(stream(), receive, 'http.disconnect')
+
+    async def serve_websocket(self, scope, receive, send, board_id):
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        refused = 403 if not is_allowed_origin(scope) else await sync_to_async(authorize)(scope, board_id)
+        if refused:
+            await send({'type': 'websocket.close', 'code': 4000 + refused})
+            return
+        await send({'type': 'websocket.accept'})
+
+        async def stream():
+            async with Subscription(board_id, get_since(scope)) as subscription:
+                while True:
+                    try:
+                        change = await subscription.get(timeout=settings.BOARD_EVENTS_HEARTBEAT)
+                    except ResyncRequired:
+                        await send({'type': 'websocket.send', 'text': encode({'event': 'resync'})})
+                        await send({'type': 'websocket.close', 'code': 4410})
+                        return
+                    if change is not None:
+                        await send({'type': 'websocket.send', 'text': encode({'event': 'change', **change})})
+
+        await self.until_disconnect(stream(), receive, 'websocket.disconnect')
+
+    @staticmethod
+    async def until_disconnect(stream, receive, disconnect):
+        """Runs `stream` until it ends or the client goes away, whichever comes first."""
+        async def wait_for_disconnect():
+            while (await receive())['type'] != disconnect:
+                pass
+
+        tasks = {asyncio.ensure_future(stream), asyncio.ensure_future(wait_for_disconnect())}
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
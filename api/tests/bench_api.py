@@ -0,0 +1,348 @@
+"""Scale benchmarks for every route in api/urls.py.
+
+Not collected by the regular test run. Run one or all sizes explicitly:
+
+    python manage.py test api.tests.bench_api
+    python manage.py test api.tests.bench_api.Bench10kCardsTest
+
+Each endpoint is measured for query count, peak memory and the median
+wall time of BENCH_ROUNDS warm runs. Query count and memory are compared
+against bench_baseline.json and fail the run when they grow. Wall time
+depends on the machine, so it is only reported unless BENCH_CHECK_TIME=1,
+for runs on the machine the baseline was recorded on. Set
+BENCH_UPDATE_BASELINE=1 to rewrite the baseline entries for the sizes that
+were run.
+"""
+import hashlib
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from boards.models import (Project, Board, BoardMember, BoardLastSeen, BoardFavourite,
+                           Column, Card, Mark, CardMark, CardFile, CardComment, CardFileUpload, CardFileUploadPart,
+                           ImportJob)
+from boards.ranks import spread_ranks
+from boards.recent import clear_recent_boards
+from boards.search import get_backend as get_search_backend
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).with_name('bench_baseline.json')
+UPDATE_BASELINE = os.environ.get('BENCH_UPDATE_BASELINE') == '1'
+CHECK_TIME = os.environ.get('BENCH_CHECK_TIME') == '1'
+ROUNDS = int(os.environ.get('BENCH_ROUNDS', 5))
+TIME_TOLERANCE = float(os.environ.get('BENCH_TIME_TOLERANCE', 2.0))
+TIME_SLACK = 0.05
+MEMORY_TOLERANCE = 1.5
+MEMORY_SLACK = 256 * 1024
+# Content of the single part of the benchmark's chunked upload.
+PART = b'bench part' * 6554
+
+
+def get_image():
+    image_output = BytesIO()
+    Image.new('RGB', (64, 64), '#336699').save(image_output, 'JPEG')
+    return SimpleUploadedFile(name='bench.jpg', content=image_output.getvalue(), content_type='image/jpeg')
+
+
+def get_trello_export():
+    board = {'id': 'b1', 'name': 'Bench', 'labels': [], 'lists': [{'id': 'l1', 'name': 'To do', 'pos': 1}],
+             'cards': [{'id': f'c{i}', 'idList': 'l1', 'name': f'Card {i}', 'pos': i} for i in range(10)]}
+    return SimpleUploadedFile('bench.json', json.dumps(board).encode(), content_type='application/json')
+
+
+def generate_dataset(cards, comments_per_card=3, marks=10, members=None, columns=None):
+    """Bulk-creates one project with a single board holding `cards` cards."""
+    members = members if members is not None else max(2, cards // 100)
+    columns = columns if columns is not None else min(30, max(1, cards // 50))
+
+    users = User.objects.bulk_create([
+        User(email=f'bench{i}@user.com', password='foo', first_name='Bench', last_name=str(i))
+        for i in range(members + 1)
+    ])
+    owner = users[0]
+    project = Project.objects.create(title='Bench', owner=owner)
+    board = Board.objects.create(title='Bench', project=project, background_img='back_img/bench.jpg')
+    # The last user is kept outside the board so it can be invited.
+    BoardMember.objects.bulk_create([BoardMember(board=board, user=user) for user in users[:-1]])
+    BoardLastSeen.objects.create(board=board, user=owner)
+    BoardFavourite.objects.create(board=board, user=owner)
+
+    board_marks = Mark.objects.bulk_create([
+        Mark(board=board, title=f'Mark {i}', color='#fff') for i in range(marks)
+    ])
+    board_columns = Column.objects.bulk_create([
+        Column(board=board, title=f'Column {i}', rank=rank) for i, rank in enumerate(spread_ranks(columns))
+    ])
+    deadline = timezone.now()
+    board_cards = Card.objects.bulk_create([
+        Card(column=board_columns[i % columns], title=f'Card {i}', description='bla',
+             deadline=deadline, checklist={'Make a to-do': False}, rank=rank)
+        for i, rank in enumerate(spread_ranks(cards))
+    ], batch_size=1000)
+    CardMark.objects.bulk_create([
+        CardMark(card=card, mark=board_marks[i % marks]) for i, card in enumerate(board_cards)
+    ], batch_size=1000)
+    CardFile.objects.bulk_create([
+        CardFile(card=card, file='card_files/bench.txt') for card in board_cards
+    ], batch_size=1000)
+    CardComment.objects.bulk_create([
+        CardComment(card=card, user=users[i % members], body='lorem ipsum')
+        for card in board_cards for i in range(comments_per_card)
+    ], batch_size=1000)
+    # Bulk inserts skip the signals keeping the search index up to date.
+    get_search_backend().rebuild()
+    # Failed, so it can be restarted. Jobs are scheduled on commit, which never comes in a benchmark.
+    job = ImportJob.objects.create(owner=owner, project=project, source='imports/bench.json',
+                                   status=ImportJob.Status.FAILED)
+    upload = CardFileUpload.objects.create(card=board_cards[0], owner=owner, name='bench.bin', size=len(PART),
+                                           part_size=len(PART))
+    part = CardFileUploadPart.objects.create(upload=upload, number=1, size=len(PART),
+                                             sha256=hashlib.sha256(PART).hexdigest(),
+                                             file=f'uploads/{upload.pk}/1.part')
+
+    return {
+        'user': owner,
+        'invitee': users[-1].email,
+        'project': project.pk,
+        'board': board.pk,
+        'column': board_columns[0].pk,
+        'card': board_cards[0].pk,
+        'mark': board_marks[0].pk,
+        'file': CardFile.objects.filter(card=board_cards[0]).first().pk,
+        'comment': CardComment.objects.filter(card=board_cards[0], user=owner).first().pk,
+        'import': job.pk,
+        'upload': upload.pk,
+        'part': part.number,
+        'part_file': part.file.name,
+    }
+
+
+# (method, url name, id used as pk or {url kwarg: id}, payload builder, payload format)
+ENDPOINTS = (
+    ('GET', 'api-projects', None, None, None),
+    ('POST', 'api-projects', None, lambda ids: {'title': 'Bench'}, 'json'),
+    ('GET', 'api-project-detail', 'project', None, None),
+    ('PUT', 'api-project-detail', 'project', lambda ids: {'title': 'Bench'}, 'json'),
+    ('DELETE', 'api-project-detail', 'project', None, None),
+    ('GET', 'api-project-boards', 'project', None, None),
+    ('POST', 'api-project-boards', 'project',
+     lambda ids: {'title': 'Bench', 'project': ids['project'], 'background_img': get_image()}, 'multipart'),
+    ('GET', 'api-boards', None, None, None),
+    ('GET', 'api-boards-favourite', None, None, None),
+    ('POST', 'api-boards-favourite', None, lambda ids: {'board': ids['board']}, 'json'),
+    ('DELETE', 'api-boards-favourite', None, lambda ids: [{'board': ids['board']}], 'json'),
+    ('GET', 'api-boards-recent', None, None, None),
+    ('GET', 'api-board-detail', 'board', None, None),
+    ('GET', 'api-board-changes', 'board', None, None),
+    ('PUT', 'api-board-detail', 'board', lambda ids: {'title': 'Bench'}, 'json'),
+    ('PATCH', 'api-board-detail', 'board', lambda ids: {'title': 'Bench'}, 'json'),
+    ('DELETE', 'api-board-detail', 'board', None, None),
+    ('POST', 'api-board-add-member', 'board', lambda ids: {'user': ids['invitee']}, 'json'),
+    ('POST', 'api-columns', 'board', lambda ids: {'title': 'Bench'}, 'json'),
+    ('GET', 'api-column-detail', 'column', None, None),
+    ('PUT', 'api-column-detail', 'column', lambda ids: {'title': 'Bench'}, 'json'),
+    ('DELETE', 'api-column-detail', 'column', None, None),
+    ('POST', 'api-column-move', 'column', lambda ids: {}, 'json'),
+    ('POST', 'api-cards', 'column',
+     lambda ids: {'title': 'Bench', 'description': 'bla', 'deadline': timezone.now().isoformat()}, 'json'),
+    ('GET', 'api-card-detail', 'card', None, None),
+    ('PUT', 'api-card-detail', 'card',
+     lambda ids: {'title': 'Bench', 'description': 'bla', 'deadline': timezone.now().isoformat()}, 'json'),
+    ('PATCH', 'api-card-detail', 'card',
+     lambda ids: {'title': 'Bench', 'description': 'bla', 'deadline': timezone.now().isoformat()}, 'json'),
+    ('DELETE', 'api-card-detail', 'card', None, None),
+    ('POST', 'api-card-move', 'card', lambda ids: {'column': ids['column']}, 'json'),
+    ('POST', 'api-cards-bulk', None,
+     lambda ids: [*({'op': 'create', 'column': ids['column'], 'title': 'Bench', 'description': 'bla',
+                     'deadline': timezone.now().isoformat()} for _ in range(100)),
+                  {'op': 'move', 'id': ids['card'], 'column': ids['column']},
+                  {'op': 'delete', 'id': ids['card']}], 'json'),
+    ('GET', 'api-board-mark', 'board', None, None),
+    ('POST', 'api-board-mark', 'board', lambda ids: {'title': 'Bench', 'color': '#fff'}, 'json'),
+    ('GET', 'api-board-mark-detail', 'mark', None, None),
+    ('PUT', 'api-board-mark-detail', 'mark', lambda ids: {'title': 'Bench', 'color': '#fff'}, 'json'),
+    ('PATCH', 'api-board-mark-detail', 'mark', lambda ids: {'title': 'Bench'}, 'json'),
+    ('DELETE', 'api-board-mark-detail', 'mark', None, None),
+    ('POST', 'api-card-mark', 'card', lambda ids: {'mark': ids['mark']}, 'json'),
+    ('DELETE', 'api-card-mark-detail', 'card', lambda ids: [{'mark': ids['mark']}], 'json'),
+    ('GET', 'api-card-file', 'card', None, None),
+    ('POST', 'api-card-file', 'card',
+     lambda ids: {'file': SimpleUploadedFile('bench.txt', b'bench')}, 'multipart'),
+    ('DELETE', 'api-card-file-detail', 'card', lambda ids: [{'file': ids['file']}], 'json'),
+    ('GET', 'api-card-comment', 'card', None, None),
+    ('POST', 'api-card-comment', 'card', lambda ids: {'body': 'lorem ipsum'}, 'json'),
+    ('DELETE', 'api-card-comment', 'card', lambda ids: [{'id': ids['comment']}], 'json'),
+    ('PUT', 'api-card-comment-detail', 'comment', lambda ids: {'body': 'lorem not ipsum'}, 'json'),
+    ('GET', 'api-search', None, lambda ids: {'q': 'lorem'}, 'query'),
+    ('GET', 'api-project-export', 'project', None, None),
+    ('GET', 'api-board-export', 'board', None, None),
+    ('POST', 'api-imports', None, lambda ids: {'source': get_trello_export()}, 'multipart'),
+    ('GET', 'api-import-detail', 'import', None, None),
+    ('POST', 'api-import-detail', 'import', None, None),
+    ('POST', 'api-card-file-uploads', 'card', lambda ids: {'name': 'bench.bin', 'size': len(PART)}, 'json'),
+    ('GET', 'api-card-file-upload', 'upload', None, None),
+    ('PUT', 'api-card-file-upload-part', {'pk': 'upload', 'number': 'part'}, lambda ids: PART, 'raw'),
+    ('POST', 'api-card-file-upload-complete', 'upload', lambda ids: {}, 'json'),
+    ('DELETE', 'api-card-file-upload', 'upload', None, None),
+)
+
+
+def load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def save_baseline(baseline):
+    BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ApiBenchmarkMixin:
+    cards = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = generate_dataset(cls.cards)
+
+    def request(self, method, url_name, pk_key, payload, payload_format):
+        if isinstance(pk_key, dict):
+            url = reverse(url_name, kwargs={name: self.ids[key] for name, key in pk_key.items()})
+        else:
+            url = reverse(url_name, kwargs={'pk': self.ids[pk_key]} if pk_key else None)
+        data = payload(self.ids) if payload else None
+        call = getattr(self.client, method.lower())
+        if payload_format == 'json':
+            response = call(url, json.dumps(data), content_type='application/json')
+        elif payload_format in ('multipart', 'query'):
+            response = call(url, data)
+        elif payload_format == 'raw':
+            response = call(url, data, content_type='application/octet-stream')
+        else:
+            response = call(url)
+        if response.streaming:
+            # Streamed bodies are only produced, and their queries run, as they are read.
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def restore_media(self):
+        # Completing or aborting an upload deletes its part files, which the rolled back rows still point at.
+        if not default_storage.exists(self.ids['part_file']):
+            default_storage.save(self.ids['part_file'], ContentFile(PART))
+
+    def run_once(self, endpoint):
+        """Requests `endpoint` in a rolled back transaction, returns the response, its time and query count."""
+        # Every run starts from an empty cache so cached endpoints report their cold cost,
+        # and from an empty view buffer so no run pays for a flush.
+        cache.clear()
+        clear_recent_boards()
+        self.restore_media()
+        queries = QueryCounter()
+        with transaction.atomic(), connection.execute_wrapper(queries):
+            start = time.perf_counter()
+            response = self.request(*endpoint)
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return response, elapsed, queries.count
+
+    def measure(self, endpoint):
+        # The first run warms the endpoint up and counts its queries, the timed ones follow.
+        # Time and queries are measured without tracemalloc, which slows every allocation down.
+        response, _, queries = self.run_once(endpoint)
+        elapsed = statistics.median(self.run_once(endpoint)[1] for _ in range(ROUNDS))
+
+        cache.clear()
+        clear_recent_boards()
+        self.restore_media()
+        with transaction.atomic():
+            tracemalloc.start()
+            self.request(*endpoint)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            transaction.set_rollback(True)
+
+        return {
+            'status': response.status_code,
+            'time': round(elapsed, 4),
+            'queries': queries,
+            'memory': peak,
+        }
+
+    @staticmethod
+    def compare(result, expected):
+        problems = []
+        if result['status'] != expected['status']:
+            problems.append(f"status {result['status']} != {expected['status']}")
+        if result['queries'] > expected['queries']:
+            problems.append(f"queries {result['queries']} > {expected['queries']}")
+        if CHECK_TIME and result['time'] > expected['time'] * TIME_TOLERANCE + TIME_SLACK:
+            problems.append(f"time {result['time']:.4f}s > {expected['time']:.4f}s")
+        if result['memory'] > expected['memory'] * MEMORY_TOLERANCE + MEMORY_SLACK:
+            problems.append(f"memory {result['memory']} > {expected['memory']}")
+        return problems
+
+    def test_endpoints(self):
+        self.client.force_login(self.ids['user'])
+        # Warm up URL resolution, imports and the session before measuring.
+        self.client.get(reverse('api-projects'))
+        baseline = load_baseline()
+        expected = baseline.get(str(self.cards), {})
+
+        results, regressions = {}, []
+        for endpoint in ENDPOINTS:
+            key = f'{endpoint[0]} {endpoint[1]}'
+            results[key] = result = self.measure(endpoint)
+            print(f"{self.cards:>6} cards  {key:<36} {result['status']}  {result['time']:>8.4f}s  "
+                  f"{result['queries']:>5} queries  {result['memory'] / 1024:>9.1f} KiB")
+
+            if key not in expected:
+                if not UPDATE_BASELINE:
+                    regressions.append(f'{key}: missing from baseline')
+                continue
+            regressions.extend(f'{key}: {problem}' for problem in self.compare(result, expected[key]))
+
+        if UPDATE_BASELINE:
+            baseline[str(self.cards)] = results
+            save_baseline(baseline)
+            return
+
+        if regressions:
+            self.fail(f'{len(regressions)} regression(s) on a {self.cards}-card board:\n' + '\n'.join(regressions))
+
+
+class Bench10CardsTest(ApiBenchmarkMixin, TestCase):
+    cards = 10
+
+
+class Bench1kCardsTest(ApiBenchmarkMixin, TestCase):
+    cards = 1000
+
+
+class Bench10kCardsTest(ApiBenchmarkMixin, TestCase):
+    cards = 10000
@@ -0,0 +1,97 @@
+"""Fan-out benchmark for live board events.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_events
+
+Holds a growing number of Server-Sent Events subscribers to one board in a
+single event loop, the way one ASGI worker would, and reports how fast they
+connect, the memory each one holds and how long a change takes to reach all
+of them.
+"""
+import asyncio
+import os
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from api.streams import BoardEventsRouter
+from boards.models import Project, Board, BoardMember, Mark
+
+User = get_user_model()
+
+SUBSCRIBERS = [int(count) for count in os.environ.get('BENCH_EVENT_SUBSCRIBERS', '100,1000,5000').split(',')]
+CHANGES = int(os.environ.get('BENCH_EVENT_CHANGES', 20))
+
+
+class BoardEventsFanOutBenchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='bench@user.com', password='foo')
+        cls.project = Project.objects.create(title='Bench', owner=cls.user)
+        cls.board = Board.objects.create(title='Bench', project=cls.project, background_img='back_img/bench.jpg')
+        BoardMember.objects.create(user=cls.user, board=cls.board)
+
+    def test_fan_out(self):
+        self.client.force_login(self.user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        scope = {'type': 'http', 'path': f'/api/boards/{self.board.pk}/events/', 'query_string': b'',
+                 'headers': [(b'cookie', cookie.encode())]}
+        for count in SUBSCRIBERS:
+            async_to_sync(self.fan_out)(scope, count)
+
+    def write(self, i):
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.create(title=f'Mark {i}', board=self.board)
+
+    async def fan_out(self, scope, count):
+        app = BoardEventsRouter(None)
+        connected, delivered, disconnected = [0], [0], asyncio.Event()
+        progress = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            body = message.get('body', b'')
+            if body.startswith(b': connected'):
+                connected[0] += 1
+            elif b'event: change' in body:
+                delivered[0] += 1
+            else:
+                return
+            progress.set()
+
+        async def wait_until(counter, target):
+            while counter[0] < target:
+                progress.clear()
+                await progress.wait()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(app(scope, receive, send)) for _ in range(count)]
+        await wait_until(connected, count)
+        connecting = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        latencies = []
+        for i in range(CHANGES):
+            start = time.perf_counter()
+            await sync_to_async(self.write)(i)
+            await wait_until(delivered, count * (i + 1))
+            latencies.append(time.perf_counter() - start)
+
+        disconnected.set()
+        await asyncio.gather(*tasks)
+
+        latencies.sort()
+        print(f'{count:6} subscribers  connect {count / connecting:7.0f}/s  {memory / count / 1024:6.1f}KiB each  '
+              f'fan-out median {latencies[len(latencies) // 2] * 1000:7.1f}ms  max {latencies[-1] * 1000:7.1f}ms  '
+              f'{count * CHANGES / sum(latencies):9.0f} events/s')
@@ -0,0 +1,42 @@
+"""Memory benchmark for streaming project exports.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_export
+
+Exports projects of growing size through the export endpoint and reports
+the throughput and the peak memory held while the archive is streamed,
+which should stay flat however many cards the project has.
+"""
+import os
+import time
+import tracemalloc
+
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from api.tests.bench_api import generate_dataset
+
+SIZES = [int(size) for size in os.environ.get('BENCH_EXPORT_CARDS', '1000,10000,100000').split(',')]
+
+
+class ProjectExportBenchTest(TestCase):
+
+    def test_export_memory(self):
+        for cards in SIZES:
+            with transaction.atomic():
+                ids = generate_dataset(cards, comments_per_card=1)
+                self.client.force_login(ids['user'])
+
+                tracemalloc.start()
+                start = time.perf_counter()
+                response = self.client.get(reverse('api-project-export', kwargs={'pk': ids['project']}))
+                size = sum(len(chunk) for chunk in response.streaming_content)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                transaction.set_rollback(True)
+
+            print(f'{cards:>7} cards  {size / 1024 / 1024:7.1f}MiB  {elapsed:6.2f}s  '
+                  f'{cards / elapsed:8.0f} cards/s  peak {peak / 1024:8.1f}KiB')
@@ -0,0 +1,82 @@
+"""Throughput benchmark for board background compression.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_images
+
+Compares compressing a burst of uploads inline, one after the other, with
+handing them to the bounded process pool, and reports the latency of the
+upload request now that compression happens after the response.
+"""
+import os
+import time
+from concurrent.futures import wait
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from boards.images import compress_image, get_process_pool
+from boards.models import Project
+
+User = get_user_model()
+
+UPLOADS = int(os.environ.get('BENCH_IMAGE_UPLOADS', 16))
+
+
+def get_upload():
+    image_output = BytesIO()
+    Image.effect_noise((1920, 1080), 64).convert('RGB').save(image_output, 'PNG')
+    return image_output.getvalue()
+
+
+class ImageCompressionBenchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='bench@user.com', password='foo')
+        cls.project = Project.objects.create(title='Bench', owner=cls.user)
+        cls.content = get_upload()
+
+    def test_compression_throughput(self):
+        pool = get_process_pool()
+        # Start the workers so process spawning is not counted.
+        wait([pool.submit(compress_image, self.content) for _ in range(settings.BOARD_IMAGE_WORKERS)])
+
+        start = time.perf_counter()
+        for _ in range(UPLOADS):
+            compress_image(self.content)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        wait([pool.submit(compress_image, self.content) for _ in range(UPLOADS)])
+        pooled = time.perf_counter() - start
+
+        print(f'{UPLOADS} uploads  sequential {UPLOADS / sequential:6.2f}/s  '
+              f'pool({settings.BOARD_IMAGE_WORKERS}) {UPLOADS / pooled:6.2f}/s')
+
+    def test_upload_latency(self):
+        self.client.force_login(self.user)
+        url = reverse('api-project-boards', kwargs={'pk': self.project.pk})
+
+        timings = []
+        for i in range(UPLOADS):
+            data = {
+                'title': f'Bench {i}',
+                'project': self.project.pk,
+                'background_img': SimpleUploadedFile('bench.png', self.content, 'image/png'),
+            }
+            # Compression is scheduled on commit, so it never runs inside the measured request.
+            with self.captureOnCommitCallbacks():
+                start = time.perf_counter()
+                response = self.client.post(url, data)
+                timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 201)
+
+        timings.sort()
+        print(f'{UPLOADS} uploads  median {timings[len(timings) // 2] * 1000:7.1f}ms  '
+              f'max {timings[-1] * 1000:7.1f}ms')
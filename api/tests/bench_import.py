@@ -0,0 +1,41 @@
+"""Throughput benchmark for bulk imports.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_import
+
+Exports projects of growing size, imports each archive back as a new
+project and reports the rows imported per second.
+"""
+import os
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase
+
+from api.tests.bench_api import generate_dataset
+from boards.export import export_project
+from boards.imports import run_import
+from boards.models import Project, ImportJob
+
+SIZES = [int(size) for size in os.environ.get('BENCH_IMPORT_CARDS', '1000,10000,100000').split(',')]
+
+
+class ImportBenchTest(TestCase):
+
+    def test_import_throughput(self):
+        for cards in SIZES:
+            with transaction.atomic():
+                ids = generate_dataset(cards, comments_per_card=1)
+                archive = b''.join(export_project(Project.objects.get(pk=ids['project']), media=False))
+                job = ImportJob(owner=ids['user'])
+                job.source.save('bench.zip', ContentFile(archive))
+
+                with mock.patch('boards.imports.schedule_background_compression'):
+                    job = run_import(job)
+                job.source.delete()
+                transaction.set_rollback(True)
+
+            print(f'{cards:>7} cards  {job.status}  {job.rows:>7} rows  {job.seconds:6.2f}s  '
+                  f'{job.rows_per_second:>7} rows/s')
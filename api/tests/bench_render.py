@@ -0,0 +1,66 @@
+"""Rendering benchmark for the read-only board payloads.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_render
+
+Renders the full detail payload of boards of growing size with
+BoardDetailSerializer and with api.payloads, queries included, checks the
+two are byte-identical and reports the speedup, which should be at least
+MIN_SPEEDUP on the largest board.
+"""
+import os
+import time
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from api.payloads import render_board
+from api.serializers.board_serializers import BoardDetailSerializer
+from api.tests.bench_api import generate_dataset
+from boards.models import Board
+
+SIZES = [int(size) for size in os.environ.get('BENCH_RENDER_CARDS', '500,5000').split(',')]
+ROUNDS = int(os.environ.get('BENCH_RENDER_ROUNDS', 3))
+MIN_SPEEDUP = 5
+
+
+def render_with_serializer(pk):
+    board = Board.objects.get(pk=pk)
+    prefetch_related_objects([board], *BoardDetailSerializer.get_prefetch_lookups())
+    return JSONRenderer().render(BoardDetailSerializer(board).data)
+
+
+def render_fast(pk):
+    return JSONRenderer().render(render_board(Board.objects.get(pk=pk)))
+
+
+def measure(render, pk):
+    """Returns the output of `render` and its best time over ROUNDS runs."""
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        content = render(pk)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return content, best
+
+
+class BoardRenderBenchTest(TestCase):
+
+    def test_render_speedup(self):
+        speedup = None
+        for cards in SIZES:
+            with transaction.atomic():
+                pk = generate_dataset(cards)['board']
+                serialized, serializer_time = measure(render_with_serializer, pk)
+                fast, fast_time = measure(render_fast, pk)
+                transaction.set_rollback(True)
+
+            self.assertEqual(fast, serialized)
+            speedup = serializer_time / fast_time
+            print(f'{cards:>7} cards  {len(fast) / 1024 / 1024:6.1f}MiB  serializer {serializer_time * 1000:8.1f}ms  '
+                  f'payloads {fast_time * 1000:8.1f}ms  {speedup:5.1f}x')
+        self.assertGreaterEqual(speedup, MIN_SPEEDUP)
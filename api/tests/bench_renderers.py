@@ -0,0 +1,56 @@
+"""Encoding benchmark for the API renderers.
+
+Not collected by the regular test run:
+
+    python manage.py test api.tests.bench_renderers
+
+Encodes the full detail payload of boards of growing size with DRF's
+JSONRenderer, FastJSONRenderer and MessagePackRenderer, checks the two JSON
+outputs are byte-identical and reports times and sizes. FastJSONRenderer
+should be at least MIN_SPEEDUP times faster on the largest board.
+"""
+import os
+import time
+
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from api.payloads import render_board
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from api.tests.bench_api import generate_dataset
+from boards.models import Board
+
+SIZES = [int(size) for size in os.environ.get('BENCH_RENDERERS_CARDS', '500,5000').split(',')]
+ROUNDS = int(os.environ.get('BENCH_RENDERERS_ROUNDS', 5))
+MIN_SPEEDUP = 2
+
+
+def measure(renderer, data):
+    """Returns the output of `renderer` for `data` and its best time over ROUNDS runs."""
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        content = renderer.render(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return content, best
+
+
+class RendererBenchTest(TestCase):
+
+    def test_renderer_speedup(self):
+        speedup = None
+        for cards in SIZES:
+            with transaction.atomic():
+                data = render_board(Board.objects.get(pk=generate_dataset(cards)['board']))
+                transaction.set_rollback(True)
+
+            results = {name: measure(renderer, data) for name, renderer in (
+                ('json', JSONRenderer()), ('orjson', FastJSONRenderer()), ('msgpack', MessagePackRenderer()))}
+            self.assertEqual(results['orjson'][0], results['json'][0])
+            speedup = results['json'][1] / results['orjson'][1]
+            print(f'{cards:>7} cards  ' + '  '.join(f'{name} {seconds * 1000:7.1f}ms {len(content) / 1024:8.0f}KiB'
+                                                    for name, (content, seconds) in results.items())
+                  + f'  {speedup:5.1f}x')
+        self.assertGreaterEqual(speedup, MIN_SPEEDUP)
@@ -1,12 +1,26 @@
-from django.test import TestCase
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 import time
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from boards.models import Project, Board, BoardMember, BoardLastSeen
+from api.permissions import IsBoardMember, IsBoardOwnerOrMember
+from api.views import BoardChangesView
+from api.serializers.board_serializers import BoardDetailSerializer
+from boards.changes import compact_changes
+from boards.models import (Project, Board, BoardChange, BoardMember, BoardLastSeen, BoardFavourite,
+                           Column, Card, Mark, CardMark, CardFile, CardComment)
+from boards.recent import flush_recent_boards, clear_recent_boards
 
 User = get_user_model()
 
@@ -24,6 +38,8 @@ def get_file():
 class BoardTest(TestCase):
 
     def setUp(self):
+        cache.clear()
+        clear_recent_boards()
         User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
         User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
         User(email='n3@user.com', password='foo', first_name='N3', last_name='U3').save()
@@ -61,6 +77,7 @@ class BoardTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(BoardMember.objects.get(board=Board.objects.get(pk=2)).user, get_user(1))
         self.assertEqual(Board.objects.count(), 2)
+        flush_recent_boards()
         self.assertEqual(BoardLastSeen.objects.count(), 1)
 
     def test_board_get_by_pk(self):
@@ -128,6 +145,20 @@ class BoardTest(TestCase):
         self.assertLess(end-start, 0.02)
         self.assertEqual(response_get.status_code, status.HTTP_200_OK)
 
+    def test_board_favourite_and_member_are_added_once(self):
+        self.client.force_login(get_user(1))
+        for _ in range(2):
+            response = self.client.post(reverse('api-boards-favourite'), [{'board': 1}],
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response = self.client.post(reverse('api-board-add-member', kwargs={'pk': 1}), {'user': 'n2@user.com'},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(BoardFavourite.objects.filter(board=1, user=1).count(), 1)
+        self.assertEqual(BoardMember.objects.filter(board=1, user=2).count(), 1)
+        self.assertEqual([board['id'] for board in self.client.get(reverse('api-boards-favourite')).data], [1])
+
     def test_board_get_recent(self):
         self.client.force_login(get_user(1))
 
@@ -145,3 +176,282 @@ class BoardTest(TestCase):
         self.assertLess(end-start, 0.02)
         self.assertEqual(response_recent.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response_recent.data), 1)
+
+    def fill_board(self, board, columns, cards):
+        mark = Mark.objects.create(board=board, title='Important', color='#fff')
+        for i in range(columns):
+            column = Column.objects.create(board=board, title=f'Column {i}')
+            for j in range(cards):
+                card = Card.objects.create(column=column, title=f'Card {j}', description='bla',
+                                           deadline=timezone.now())
+                CardMark.objects.create(card=card, mark=mark)
+                CardFile.objects.create(card=card, file=SimpleUploadedFile('note.txt', b'note'))
+                CardComment.objects.create(card=card, user=get_user(1), body='lorem ipsum')
+
+    def get_board_queries(self, pk, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': pk}), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_board_get_by_pk_query_count_does_not_grow(self):
+        self.client.force_login(get_user(1))
+        self.fill_board(Board.objects.get(pk=1), columns=1, cards=1)
+
+        large_board = Board.objects.create(title='Large', project=Project.objects.get(pk=1),
+                                           background_img=get_file())
+        BoardMember.objects.create(user=get_user(1), board=large_board)
+        BoardMember.objects.create(user=get_user(2), board=large_board)
+        self.fill_board(large_board, columns=3, cards=4)
+
+        self.get_board_queries(1)
+        self.get_board_queries(large_board.pk)
+        self.assertEqual(self.get_board_queries(1), self.get_board_queries(large_board.pk))
+
+    def test_board_put_query_count_does_not_grow(self):
+        self.client.force_login(get_user(1))
+        self.fill_board(Board.objects.get(pk=1), columns=1, cards=1)
+        large_board = Board.objects.create(title='Large', project=Project.objects.get(pk=1),
+                                           background_img=get_file())
+        BoardMember.objects.create(user=get_user(1), board=large_board)
+        self.fill_board(large_board, columns=3, cards=4)
+
+        def put_queries(pk):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.put(reverse('api-board-detail', kwargs={'pk': pk}), {'title': 'Renamed'},
+                                           content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['title'], 'Renamed')
+            return len(queries)
+
+        put_queries(1)
+        self.assertEqual(put_queries(1), put_queries(large_board.pk))
+        self.assertEqual(len(self.client.put(reverse('api-board-detail', kwargs={'pk': large_board.pk}),
+                                             {'title': 'Large'}, content_type='application/json').data['columns']), 3)
+
+    def test_board_get_by_pk_output_matches_lazy_serialization(self):
+        self.client.force_login(get_user(1))
+        BoardMember.objects.create(user=get_user(2), board=Board.objects.get(pk=1))
+        self.fill_board(Board.objects.get(pk=1), columns=2, cards=2)
+
+        response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content),
+                         json.loads(JSONRenderer().render(BoardDetailSerializer(Board.objects.get(pk=1)).data)))
+
+    def test_board_get_by_pk_is_cached_until_content_changes(self):
+        self.client.force_login(get_user(1))
+        self.fill_board(Board.objects.get(pk=1), columns=2, cards=2)
+
+        first = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}), format='json')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}), format='json')
+
+        self.assertEqual(first.content, second.content)
+        self.assertFalse([q for q in queries if 'boards_card' in q['sql']])
+
+        card = Card.objects.first()
+        card.title = 'Renamed'
+        card.save()
+        third = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}), format='json')
+
+        self.assertNotEqual(second.content, third.content)
+        self.assertIn(b'Renamed', third.content)
+
+    def test_board_get_by_pk_conditional(self):
+        self.client.force_login(get_user(1))
+        url = reverse('api-board-detail', kwargs={'pk': 1})
+
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+
+        start = time.time()
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        end = time.time()
+
+        self.assertLess(end-start, 0.02)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+        Column.objects.create(board=Board.objects.get(pk=1), title='New')
+        modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    def test_board_access_is_cached_until_membership_changes(self):
+        board = Board.objects.get(pk=1)
+        request = RequestFactory().get('/')
+        request.user = get_user(2)
+
+        self.assertFalse(IsBoardMember().has_object_permission(request, None, board))
+        with self.assertNumQueries(0):
+            self.assertFalse(IsBoardMember().has_object_permission(request, None, board))
+            self.assertFalse(IsBoardOwnerOrMember().has_object_permission(request, None, board))
+
+        member = BoardMember.objects.create(user=get_user(2), board=board)
+        request.user = get_user(2)
+        self.assertTrue(IsBoardMember().has_object_permission(request, None, board))
+
+        member.delete()
+        request.user = get_user(2)
+        self.assertFalse(IsBoardMember().has_object_permission(request, None, board))
+
+    def test_board_get_by_pk_sparse_fieldsets(self):
+        self.client.force_login(get_user(1))
+        self.fill_board(Board.objects.get(pk=1), columns=2, cards=2)
+        url = reverse('api-board-detail', kwargs={'pk': 1})
+
+        response = self.client.get(url, {'fields': 'id,title,columns.id,columns.title'})
+        self.assertEqual(set(response.data), {'id', 'title', 'columns'})
+        self.assertEqual([set(column) for column in response.data['columns']], [{'id', 'title'}] * 2)
+        # Only the columns are prefetched, not members, cards or anything below them.
+        self.assertEqual(self.get_board_queries(1, {'fields': 'id,title,columns.id,columns.title'}),
+                         self.get_board_queries(1) - 5)
+
+        response = self.client.get(url, {'depth': 1})
+        self.assertIn('members', response.data)
+        self.assertEqual(set(response.data['columns'][0]), {'id', 'title'})
+
+        response = self.client.get(url, {'expand': 'columns.cards', 'fields': 'columns.cards.title'})
+        self.assertEqual(set(response.data), {'columns'})
+        self.assertEqual(set(response.data['columns'][0]), {'cards'})
+        self.assertEqual(response.data['columns'][0]['cards'][0], {'title': 'Card 0'})
+
+        response = self.client.get(url, {'depth': 'deep'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_board_get_by_pk_sparse_fieldsets_have_own_etag(self):
+        self.client.force_login(get_user(1))
+        url = reverse('api-board-detail', kwargs={'pk': 1})
+
+        full = self.client.get(url)
+        sparse = self.client.get(url, {'fields': 'title'})
+        self.assertNotEqual(full['ETag'], sparse['ETag'])
+
+        response = self.client.get(url, {'fields': 'title'}, HTTP_IF_NONE_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(RECENT_BOARDS_LIMIT=2)
+    def test_board_views_are_buffered_and_capped(self):
+        self.client.force_login(get_user(1))
+        boards = [Board.objects.get(pk=1)]
+        for i in range(2):
+            boards.append(Board.objects.create(title=f'Board {i}', project=Project.objects.get(pk=1),
+                                               background_img='back_img/example.jpg'))
+            BoardMember.objects.create(user=get_user(1), board=boards[-1])
+
+        with CaptureQueriesContext(connection) as queries:
+            for board in boards:
+                self.client.get(reverse('api-board-detail', kwargs={'pk': board.pk}))
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertFalse([sql for sql in writes if 'boardlastseen' in sql])
+        self.assertEqual(BoardLastSeen.objects.count(), 0)
+
+        response = self.client.get(reverse('api-boards-recent'))
+        self.assertEqual([item['board']['id'] for item in response.data], [boards[2].pk, boards[1].pk])
+
+        flush_recent_boards()
+        self.assertEqual(set(BoardLastSeen.objects.values_list('board_id', flat=True)), {boards[2].pk, boards[1].pk})
+
+        # The list is rebuilt from the table once it drops out of the cache.
+        self.client.get(reverse('api-board-detail', kwargs={'pk': boards[1].pk}))
+        flush_recent_boards()
+        cache.clear()
+        response = self.client.get(reverse('api-boards-recent'))
+        self.assertEqual([item['board']['id'] for item in response.data], [boards[1].pk, boards[2].pk])
+
+    def test_views_of_deleted_boards_are_not_flushed(self):
+        self.client.force_login(get_user(1))
+        board = Board.objects.create(title='Deleted', project=Project.objects.get(pk=1),
+                                     background_img='back_img/example.jpg')
+        BoardMember.objects.create(user=get_user(1), board=board)
+        self.client.get(reverse('api-board-detail', kwargs={'pk': board.pk}))
+        self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        board.delete()
+
+        with self.assertNoLogs('boards.recent', 'ERROR'):
+            flush_recent_boards()
+        self.assertEqual(list(BoardLastSeen.objects.values_list('board_id', flat=True)), [1])
+
+    def test_flushed_views_refresh_every_cached_list(self):
+        self.client.force_login(get_user(1))
+        board = Board.objects.create(title='Other', project=Project.objects.get(pk=1),
+                                     background_img='back_img/example.jpg')
+        BoardMember.objects.create(user=get_user(1), board=board)
+        self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertEqual([item['board']['id'] for item in self.client.get(reverse('api-boards-recent')).data], [1])
+
+        # A view written by another worker shows up once this one writes its own views.
+        BoardLastSeen.objects.create(user=get_user(1), board=board)
+        self.assertEqual([item['board']['id'] for item in self.client.get(reverse('api-boards-recent')).data], [1])
+        flush_recent_boards()
+        self.assertEqual([item['board']['id'] for item in self.client.get(reverse('api-boards-recent')).data],
+                         [board.pk, 1])
+
+    @override_settings(RECENT_BOARDS_FLUSH_INTERVAL=0.01)
+    def test_board_views_are_flushed_on_a_timer(self):
+        self.client.force_login(get_user(1))
+        with mock.patch('boards.recent._background_flush', True), \
+                mock.patch('boards.recent.flush_recent_boards') as flush:
+            self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+            for _ in range(100):
+                if flush.called:
+                    break
+                time.sleep(0.01)
+        flush.assert_called_once_with()
+
+    def test_board_changes_since(self):
+        self.client.force_login(get_user(1))
+        url = reverse('api-board-changes', kwargs={'pk': 1})
+        seq = self.client.get(url).data['seq']
+        self.assertEqual(seq, Board.objects.get(pk=1).version)
+
+        column = Column.objects.create(title='To do', board=Board.objects.get(pk=1))
+        card = Card.objects.create(title='Card', column=column, checklist={}, deadline=timezone.now())
+        card_id = card.pk
+        card.title = 'Renamed'
+        card.save()
+        card.delete()
+
+        response = self.client.get(url, {'since': seq})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(change['model'], change['id'], change['action']) for change in response.data['changes']],
+                         [('column', column.pk, 'created'), ('card', card_id, 'created'),
+                          ('card', card_id, 'updated'), ('card', card_id, 'deleted')])
+        self.assertEqual(response.data['changes'][2]['data']['title'], 'Renamed')
+        self.assertIsNone(response.data['changes'][3]['data'])
+        self.assertEqual(response.data['seq'], seq + 4)
+        self.assertFalse(response.data['more'])
+
+        response = self.client.get(url, {'since': seq + 4})
+        self.assertEqual((response.data['changes'], response.data['seq']), ([], seq + 4))
+        self.assertEqual(self.client.get(url, {'since': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_board_changes_are_paged_and_compacted(self):
+        self.client.force_login(get_user(1))
+        url = reverse('api-board-changes', kwargs={'pk': 1})
+        board = Board.objects.get(pk=1)
+        seq = board.version
+        for i in range(4):
+            Mark.objects.create(title=f'Mark {i}', board=board)
+
+        with mock.patch.object(BoardChangesView, 'page_size', 3):
+            response = self.client.get(url, {'since': seq})
+        self.assertEqual(len(response.data['changes']), 3)
+        self.assertTrue(response.data['more'])
+        self.assertEqual(response.data['seq'], seq + 3)
+
+        compact_changes(keep=2)
+        response = self.client.get(url, {'since': seq + 1})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data['seq'], seq + 4)
+        response = self.client.get(url, {'since': seq + 2})
+        self.assertEqual([change['data']['title'] for change in response.data['changes']], ['Mark 2', 'Mark 3'])
+
+        # The cascade of a deleted board is not journaled.
+        board.delete()
+        self.assertFalse(BoardChange.objects.exists())
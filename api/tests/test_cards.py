@@ -1,13 +1,28 @@
-from django.test import TestCase
+import hashlib
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 import time
+from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from boards.models import Project, Board, BoardMember, Column, Card, Mark, CardMark
+from boards.models import (Project, Board, BoardMember, Column, Card, Mark, CardMark, CardFile, CardFileUpload,
+                           MediaBlob)
+from boards.storage import IMMUTABLE_CACHE_CONTROL, get_media_storage
+from boards.views import serve_content_addressed_media
+from boards.ranks import REBALANCE_LENGTH, get_rank, rebalance
+from boards.uploads import UploadError, assemble_upload, save_part
 
 User = get_user_model()
 
@@ -26,6 +41,7 @@ def get_file():
 class CardTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
         User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
         Project(title='Example', owner=get_user(1)).save()
@@ -245,6 +261,195 @@ class CardTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertLess(end-start, optimal_response_time)
 
+    def test_card_files_are_stored_once(self):
+        self.client.force_login(get_user(1))
+        content = b'%PDF-1.4 the same handbook attached twice'
+        for name in ('handbook.pdf', 'handbook (1).pdf'):
+            file = SimpleUploadedFile(name, content, 'application/pdf')
+            response = self.client.post(reverse('api-card-file', kwargs={'pk': 1}), {'file': file}, format='formdata')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        first, second = CardFile.objects.order_by('id')
+        self.assertEqual((first.name, second.name), ('handbook.pdf', 'handbook (1).pdf'))
+        self.assertEqual(first.file.name, f'cas/{hashlib.sha256(content).hexdigest()[:2]}/'
+                                          f'{hashlib.sha256(content).hexdigest()}.pdf')
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.file.name).refs, 2)
+
+        response = serve_content_addressed_media(RequestFactory().get('/'), first.file.name)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+        # The file goes with the last card file referring to it.
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=first.file.name).refs, 1)
+        self.assertTrue(default_storage.exists(second.file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('api-card-file-detail', kwargs={'pk': 1}), [{'file': second.pk}],
+                               content_type='application/json')
+        self.assertFalse(MediaBlob.objects.filter(name=first.file.name).exists())
+        self.assertFalse(default_storage.exists(second.file.name))
+
+    def test_content_is_stored_again_after_its_last_reference(self):
+        storage = get_media_storage()
+        name = storage.save('card_files/a.txt', ContentFile(b'shared'))
+        self.assertEqual(storage.save('card_files/b.txt', ContentFile(b'shared')), name)
+        storage.delete(name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        storage.delete(name)
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+        # Whatever is left under the name once nothing refers to it, like a file going with a racing delete,
+        # is written over.
+        storage.backend.save(name, ContentFile(b'stale'))
+        self.assertEqual(storage.save('card_files/c.txt', ContentFile(b'shared')), name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        self.assertEqual(storage.open(name).read(), b'shared')
+        storage.delete(name)
+
+    def test_dedupe_media(self):
+        names = [default_storage.save('card_files/logo.png', ContentFile(b'logo')) for _ in range(2)]
+        names.append(default_storage.save('card_files/other.png', ContentFile(b'other')))
+        for name in names + names[:1]:
+            CardFile.objects.create(card=Card.objects.get(pk=1), file=name)
+        CardFile.objects.create(card=Card.objects.get(pk=1), file='card_files/missing.png')
+
+        call_command('dedupe_media', stdout=StringIO(), stderr=StringIO())
+
+        files = [card_file.file.name for card_file in CardFile.objects.order_by('id')]
+        self.assertEqual(len(set(files[:4])), 2)
+        self.assertEqual(files[0], files[1])
+        self.assertEqual(files[4], 'card_files/missing.png')
+        self.assertEqual(dict(MediaBlob.objects.filter(name__in=files).values_list('name', 'refs')),
+                         {files[0]: 3, files[2]: 1})
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertEqual(get_media_storage().open(files[0]).read(), b'logo')
+
+        # Running it again finds nothing to move.
+        call_command('dedupe_media', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(MediaBlob.objects.get(name=files[0]).refs, 3)
+
+    @override_settings(CARD_FILE_UPLOAD_PART_SIZE=4)
+    def test_chunked_card_file_upload(self):
+        content = b'0123456789'
+        data = {'name': 'notes.txt', 'size': len(content)}
+        self.client.force_login(get_user(2))
+        response = self.client.post(reverse('api-card-file-uploads', kwargs={'pk': 1}), data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_login(get_user(1))
+        response = self.client.post(reverse('api-card-file-uploads', kwargs={'pk': 1}), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['part_size'], response.data['part_count']), (4, 3))
+        pk = response.data['id']
+
+        def put_part(number, part):
+            return self.client.put(reverse('api-card-file-upload-part', kwargs={'pk': pk, 'number': number}),
+                                   part, content_type='application/octet-stream')
+
+        def complete(**data):
+            # The parts are joined by the background job once the request commits.
+            with mock.patch('boards.uploads._get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+                executor.return_value.submit.side_effect = \
+                    lambda run, upload_id: assemble_upload(CardFileUpload.objects.get(pk=upload_id))
+                return self.client.post(reverse('api-card-file-upload-complete', kwargs={'pk': pk}), data)
+
+        def get_upload():
+            return self.client.get(reverse('api-card-file-upload', kwargs={'pk': pk})).data
+
+        self.assertEqual(put_part(2, b'45').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(put_part(4, b'89').status_code, status.HTTP_400_BAD_REQUEST)
+        # Backends like S3 rewind what they are given to save.
+        save = default_storage.save
+
+        def rewinding_save(name, content, max_length=None):
+            self.assertTrue(content.seekable())
+            content.seek(0)
+            return save(name, content, max_length)
+
+        with mock.patch.object(default_storage, 'save', rewinding_save):
+            response = put_part(1, content[:4])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['sha256'], hashlib.sha256(content[:4]).hexdigest())
+        self.assertEqual(CardFileUpload.objects.get(pk=pk).parts.get().file.read(), content[:4])
+        self.assertEqual(put_part(3, content[8:]).status_code, status.HTTP_200_OK)
+        response = complete()
+        self.assertEqual((response.status_code, response.data['Details']),
+                         (status.HTTP_409_CONFLICT, 'Parts 2 are missing'))
+
+        # A part cut short by a disconnect is dropped, the upload resumes from the parts it has.
+        with self.assertRaises(UploadError):
+            save_part(CardFileUpload.objects.get(pk=pk), 2, BytesIO(content[4:6]), 4)
+        response = self.client.get(reverse('api-card-file-upload', kwargs={'pk': pk}))
+        self.assertEqual([part['number'] for part in response.data['parts']], [1, 3])
+
+        # A corrupted part fails the checksum and can be sent again.
+        put_part(2, b'xxxx')
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.assertEqual(complete(sha256=sha256).status_code, status.HTTP_202_ACCEPTED)
+        upload = get_upload()
+        self.assertEqual(upload['status'], CardFileUpload.Status.UPLOADING)
+        corrupted = hashlib.sha256(content[:4] + b'xxxx' + content[8:]).hexdigest()
+        self.assertEqual(upload['error'], f'The file has SHA-256 {corrupted}, not {sha256}')
+        self.assertFalse(CardFile.objects.filter(name='notes.txt').exists())
+        put_part(2, content[4:8])
+        names = [part.file.name for part in CardFileUpload.objects.get(pk=pk).parts.all()]
+        response = complete(sha256=sha256)
+
+        self.assertEqual((response.status_code, response.data['status']),
+                         (status.HTTP_202_ACCEPTED, CardFileUpload.Status.ASSEMBLING))
+        upload = get_upload()
+        self.assertEqual((upload['status'], upload['error'], upload['sha256'], upload['parts']),
+                         (CardFileUpload.Status.DONE, '', sha256, []))
+        card_file = CardFile.objects.get(pk=upload['card_file']['id'])
+        self.assertEqual((card_file.card_id, card_file.file.read()), (1, content))
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertEqual(complete().status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(put_part(1, content[:4]).status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Idle uploads are aborted, and done ones forgotten.
+        response = self.client.post(reverse('api-card-file-uploads', kwargs={'pk': 1}), data)
+        pk = response.data['id']
+        put_part(1, content[:4])
+        call_command('clear_card_file_uploads', hours=0, stdout=StringIO())
+        self.assertFalse(CardFileUpload.objects.exists())
+        self.assertTrue(CardFile.objects.filter(pk=card_file.pk).exists())
+
+    @override_settings(CARD_FILE_UPLOAD_PART_SIZE=4)
+    def test_completed_upload_takes_no_parts(self):
+        upload = CardFileUpload.objects.create(card_id=1, owner=get_user(1), name='notes.txt', size=4, part_size=4)
+        save_part(upload, 1, BytesIO(b'0123'), 4)
+        self.client.force_login(get_user(1))
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('api-card-file-upload-complete', kwargs={'pk': upload.pk}), {})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+
+        # Parts in flight when the upload was completed are turned away too.
+        with self.assertRaisesMessage(UploadError, 'completed or aborted in the meantime'):
+            save_part(upload, 1, BytesIO(b'4567'), 4)
+        with self.assertRaisesMessage(UploadError, 'The upload is assembling'):
+            save_part(CardFileUpload.objects.get(pk=upload.pk), 1, BytesIO(b'4567'), 4)
+        response = self.client.post(reverse('api-card-file-upload-complete', kwargs={'pk': upload.pk}), {})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @override_settings(CARD_FILE_UPLOAD_PART_SIZE=4)
+    def test_upload_aborted_while_assembling_leaves_no_file(self):
+        upload = CardFileUpload.objects.create(card_id=1, owner=get_user(1), name='notes.txt', size=4, part_size=4)
+        save_part(upload, 1, BytesIO(b'0123'), 4)
+        self.client.force_login(get_user(1))
+        with self.captureOnCommitCallbacks():
+            self.client.post(reverse('api-card-file-upload-complete', kwargs={'pk': upload.pk}), {})
+        upload = CardFileUpload.objects.get(pk=upload.pk)
+
+        # Aborted after the parts were joined, before the file was created.
+        with mock.patch.object(CardFileUpload.objects, 'select_for_update',
+                               return_value=CardFileUpload.objects.none()):
+            assemble_upload(upload)
+        self.assertFalse(CardFile.objects.filter(name='notes.txt').exists())
+        self.assertFalse(MediaBlob.objects.filter(sha256=hashlib.sha256(b'0123').hexdigest()).exists())
+        self.assertEqual(CardFileUpload.objects.get(pk=upload.pk).status, CardFileUpload.Status.ASSEMBLING)
+
     def test_create_card_comments(self):
         self.client.force_login(get_user(1))
 
@@ -326,3 +531,140 @@ class CardTest(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertLess(end-start, optimal_response_time)
+
+    def test_get_card_comments_paginated(self):
+        self.client.force_login(get_user(1))
+        for body in ('first', 'second', 'third'):
+            self.client.post(reverse('api-card-comment', kwargs={'pk': 1}), {'body': body}, format='json',
+                             content_type='application/json')
+
+        start = time.time()
+        response = self.client.get(reverse('api-card-comment', kwargs={'pk': 1}), {'page_size': 2})
+        end = time.time()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(end-start, optimal_response_time)
+        self.assertEqual([c['body'] for c in response.data], ['first', 'second'])
+        self.assertIn('rel="next"', response['Link'])
+
+        next_url = response['Link'].split(';')[0].strip('<>')
+        response = self.client.get(next_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['body'] for c in response.data], ['third'])
+        self.assertNotIn('rel="next"', response['Link'])
+
+    def test_bulk_card_operations(self):
+        self.client.force_login(get_user(1))
+        Column(title='Done', board=Board.objects.get(pk=1)).save()
+        version = Board.objects.get(pk=1).version
+        deadline = timezone.now().isoformat()
+        operations = [
+            *({'op': 'create', 'column': 1, 'title': f'Card {i}', 'description': 'bla', 'deadline': deadline}
+              for i in range(50)),
+            {'op': 'update', 'id': 1, 'title': 'Renamed'},
+            {'op': 'move', 'id': 1, 'column': 2},
+        ]
+
+        with self.assertNumQueries(16):
+            response = self.client.post(reverse('api-cards-bulk'), operations, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 52)
+        self.assertEqual(response.data[-1], {'op': 'move', 'id': 1})
+        self.assertEqual(Card.objects.filter(column=1).count(), 50)
+        self.assertEqual(Card.objects.get(pk=1).title, 'Renamed')
+        self.assertEqual(Card.objects.get(pk=1).column_id, 2)
+        # One journal entry per card, in its final state.
+        self.assertEqual(Board.objects.get(pk=1).version, version + 51)
+        last = Board.objects.get(pk=1).changes.order_by('seq').last()
+        self.assertEqual((last.seq, last.object_id, last.action, last.data['column']), (version + 51, 1, 'updated', 2))
+        # The created and changed cards are indexed for search.
+        response = self.client.get(reverse('api-search'), {'q': 'card 49'})
+        self.assertEqual([hit['id'] for hit in response.data], [51])
+        response = self.client.get(reverse('api-search'), {'q': 'renamed'})
+        self.assertEqual([(hit['type'], hit['id']) for hit in response.data], [('card', 1)])
+
+        deleted = [{'op': 'delete', 'id': pk} for pk in range(2, 52)]
+        response = self.client.post(reverse('api-cards-bulk'), deleted, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Card.objects.count(), 1)
+        self.assertEqual(self.client.get(reverse('api-search'), {'q': 'card'}).data, [])
+
+    def test_bulk_card_operations_are_all_or_nothing(self):
+        self.client.force_login(get_user(1))
+        operations = [
+            {'op': 'update', 'id': 1, 'title': 'Renamed'},
+            {'op': 'delete', 'id': 1},
+            {'op': 'move', 'id': 1, 'column': 1},
+            {'op': 'create', 'column': 1},
+        ]
+
+        response = self.client.post(reverse('api-cards-bulk'), operations, content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data[3]), {'title', 'description', 'deadline'})
+        self.assertEqual(Card.objects.get(pk=1).title, 'Example')
+
+        response = self.client.post(reverse('api-cards-bulk'), operations[:3], content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {}, {'id': ['Card not found.']}])
+
+        self.client.force_login(get_user(2))
+        response = self.client.post(reverse('api-cards-bulk'), operations[:1], content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Card.objects.get(pk=1).title, 'Example')
+
+    def test_card_move_writes_only_the_moved_card(self):
+        self.client.force_login(get_user(1))
+        Column(title='Done', board=Board.objects.get(pk=1)).save()
+        for i in range(3):
+            Card(title=f'Card {i}', column=Column.objects.get(pk=2), description='bla', deadline=timezone.now()).save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('api-card-move', kwargs={'pk': 1}), {'column': 2, 'after': 2},
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        card_writes = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "boards_card"')]
+        self.assertEqual(len(card_writes), 1)
+        self.assertIn('WHERE "boards_card"."id" = 1', card_writes[0])
+
+        response = self.client.get(reverse('api-column-detail', kwargs={'pk': 2}))
+        self.assertEqual([card['title'] for card in response.data['cards']], ['Card 0', 'Example', 'Card 1', 'Card 2'])
+
+        self.client.post(reverse('api-card-move', kwargs={'pk': 4}), {'before': 2}, content_type='application/json')
+        response = self.client.get(reverse('api-column-detail', kwargs={'pk': 2}))
+        self.assertEqual([card['title'] for card in response.data['cards']], ['Card 2', 'Card 0', 'Example', 'Card 1'])
+
+        response = self.client.post(reverse('api-card-move', kwargs={'pk': 1}), {'before': 99},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_card_moved_with_update_form_goes_to_end_of_column(self):
+        Column(title='Done', board=Board.objects.get(pk=1)).save()
+        Card(title='Done', column=Column.objects.get(pk=2), description='bla', deadline=timezone.now()).save()
+
+        card = Card.objects.get(pk=1)
+        card.column = Column.objects.get(pk=2)
+        card.save()
+
+        self.assertEqual(list(Column.objects.get(pk=2).cards.values_list('id', flat=True)), [2, 1])
+
+    def test_rebalance_keeps_card_order(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(80):
+                card = Card(title=f'Card {i}', column=Column.objects.get(pk=1), description='bla',
+                            deadline=timezone.now())
+                # Always inserting right after the first card makes the keys grow.
+                card.rank = get_rank(Card, {'column_id': 1}, after=Card.objects.get(pk=1))
+                card.save()
+        order = list(Card.objects.filter(column=1).values_list('id', flat=True))
+        self.assertGreater(len(card.rank), REBALANCE_LENGTH)
+        self.assertTrue(callbacks)
+
+        rebalance(Card, {'column_id': 1})
+
+        self.assertEqual(list(Card.objects.filter(column=1).values_list('id', flat=True)), order)
+        self.assertLessEqual(max(len(rank) for rank in Card.objects.values_list('rank', flat=True)), 3)
+
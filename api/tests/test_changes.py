@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TransactionTestCase
+
+from boards.changes import record_change, record_changes
+from boards.models import Project, Board, BoardChange, Mark
+
+User = get_user_model()
+
+
+class BoardChangeJournalTest(TransactionTestCase):
+    """Runs outside of a test transaction, where the journal opens its own."""
+
+    def setUp(self):
+        user = User.objects.create(email='n@user.com', password='foo', first_name='N', last_name='U')
+        self.board = Board.objects.create(title='Example', project=Project.objects.create(title='Example', owner=user),
+                                          background_img='back_img/example.jpg')
+        self.mark = Mark.objects.create(title='Urgent', board=self.board)
+        self.version = Board.objects.get(pk=self.board.pk).version
+
+    def test_version_is_not_bumped_without_its_journal_entry(self):
+        with mock.patch.object(BoardChange, 'save', side_effect=IntegrityError), self.assertRaises(IntegrityError):
+            record_change(self.board.pk, self.mark, BoardChange.Action.UPDATED)
+        self.assertEqual(Board.objects.get(pk=self.board.pk).version, self.version)
+
+    def test_version_is_not_bumped_without_its_journal_batch(self):
+        with mock.patch.object(BoardChange.objects, 'bulk_create', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            record_changes(self.board.pk, [(self.mark, BoardChange.Action.UPDATED)] * 2)
+        self.assertEqual(Board.objects.get(pk=self.board.pk).version, self.version)
@@ -1,4 +1,8 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -6,7 +10,8 @@ import time
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from boards.models import Project, Board, BoardMember, Column
+from boards.models import Project, Board, BoardChange, BoardMember, Column, Card, CardComment
+from boards.search import get_backend as get_search_backend
 
 User = get_user_model()
 
@@ -24,6 +29,7 @@ def get_file():
 class ColumnTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
         User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
         Project(title='Example', owner=get_user(1)).save()
@@ -83,4 +89,45 @@ class ColumnTest(TestCase):
         end = time.time()
 
         self.assertLess(end-start, 0.025)
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_column_deletion_query_count_does_not_grow(self):
+        self.client.force_login(get_user(1))
+
+        def delete_column(cards):
+            column = Column.objects.create(title='Doomed', board=Board.objects.get(pk=1))
+            cards = Card.objects.bulk_create([Card(title=f'Card {i}', column=column, description='', checklist={},
+                                                   deadline=timezone.now(), rank=f'{i:04}') for i in range(cards)])
+            CardComment.objects.bulk_create([CardComment(card=card, user=get_user(1), body='Comment')
+                                             for card in cards])
+            get_search_backend().update(cards)
+            version = Board.objects.get(pk=1).version
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(reverse('api-column-detail', kwargs={'pk': column.pk}))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertFalse(Card.objects.filter(pk__in=[card.pk for card in cards], column__isnull=False).exists())
+            self.assertEqual(get_search_backend().search('Card', {1}, 0, 1000), [])
+            # The cascade is journaled as the deletion of the column alone.
+            self.assertEqual(list(BoardChange.objects.filter(board=1, seq__gt=version).values_list('model', 'action')),
+                             [('column', BoardChange.Action.DELETED)])
+            return len(queries)
+
+        delete_column(2)  # Warms up the access and session caches.
+        self.assertEqual(delete_column(2), delete_column(250))
+
+    def test_column_move(self):
+        self.client.force_login(get_user(1))
+        for title in ('Doing', 'Done'):
+            self.client.post(reverse('api-columns', kwargs={'pk': 1}), {'title': title}, format='json')
+
+        response = self.client.post(reverse('api-column-move', kwargs={'pk': 3}), {'after': 1},
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}), {'fields': 'columns.title'})
+        self.assertEqual([column['title'] for column in response.data['columns']], ['Example', 'Done', 'Doing'])
+
+        response = self.client.post(reverse('api-column-move', kwargs={'pk': 3}), {'after': 1, 'before': 2},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from boards.models import Board, BoardMember, Card, CardMark, CardComment, MediaBlob
+from boards.search import get_backend as get_search_backend
+
+User = get_user_model()
+
+OPTIONS = {'users': 20, 'projects': 5, 'boards': 2, 'cards': 30, 'seed': 7, 'batch_size': 50}
+
+
+def generate(prefix):
+    call_command('generate_dataset', email_prefix=prefix, stdout=StringIO(), stderr=StringIO(), **OPTIONS)
+
+
+def snapshot(prefix):
+    boards = Board.objects.filter(project__owner__email__startswith=prefix).order_by('id')
+    return (list(boards.values_list('title', 'project__title', 'project__owner__last_name')),
+            list(Card.objects.filter(column__board__in=boards).order_by('id')
+                 .values_list('title', 'column__title', 'rank', 'checklist')),
+            list(CardComment.objects.filter(card__column__board__in=boards).order_by('id')
+                 .values_list('body', 'user__last_name')),
+            BoardMember.objects.filter(board__in=boards).count(),
+            CardMark.objects.filter(card__column__board__in=boards).count())
+
+
+class GenerateDatasetTest(TestCase):
+
+    def test_users_can_log_in(self):
+        generate('load')
+        self.assertTrue(snapshot('load')[1])
+        self.assertTrue(User.objects.get(email='load0@example.com').check_password('password'))
+
+    def test_existing_prefix_is_refused(self):
+        generate('load')
+        with self.assertRaises(CommandError):
+            generate('load')
+
+    def test_same_seed_gives_same_dataset(self):
+        generate('load')
+        generate('again')
+        self.assertEqual(snapshot('again'), snapshot('load'))
+
+    def test_boards_share_one_background(self):
+        generate('load')
+        backgrounds = set(Board.objects.values_list('background_img', flat=True))
+        self.assertEqual(len(backgrounds), 1)
+        self.assertEqual(MediaBlob.objects.get(name=backgrounds.pop()).refs, Board.objects.count())
+
+    def test_cards_are_indexed_for_search(self):
+        generate('load')
+        card = Card.objects.first()
+        hits = get_search_backend().search(card.title, {card.column.board_id}, 0, 1000)
+        self.assertIn(card.pk, [hit.id for hit in hits if hit.model == 'card'])
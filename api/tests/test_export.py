@@ -0,0 +1,88 @@
+import json
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from boards.models import Project, Board, BoardMember, Column, Card, Mark, CardMark, CardFile, CardComment
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+def get_file():
+    return SimpleUploadedFile(name='test_image.jpg',
+                              content=open('media/back_img/ryan-lum-1ak3Z7ZmtQA-unsplash.jpg', 'rb').read(),
+                              content_type='image/jpeg')
+
+
+def read_archive(response):
+    return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img=get_file()).save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        column = Column.objects.create(title='To do', board=Board.objects.get(pk=1))
+        self.card = Card.objects.create(title='Card', column=column, checklist={'Step': True}, deadline=timezone.now())
+        self.mark = Mark.objects.create(title='Urgent', board=Board.objects.get(pk=1))
+        CardMark.objects.create(card=self.card, mark=self.mark)
+        CardComment.objects.create(card=self.card, user=get_user(1), body='Comment')
+        CardFile.objects.create(card=self.card, file=get_file())
+        self.client.force_login(get_user(1))
+
+    def test_board_export_is_streamed(self):
+        response = self.client.get(reverse('api-board-export', kwargs={'pk': 1}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="board-1.zip"')
+
+    def test_board_export_has_every_table(self):
+        archive = read_archive(self.client.get(reverse('api-board-export', kwargs={'pk': 1})))
+        tables = {name: [json.loads(line) for line in archive.read(name).splitlines()]
+                  for name in archive.namelist() if name.endswith('.ndjson')}
+        self.assertEqual(json.loads(archive.read('manifest.json'))['board'], {'id': 1, 'title': 'Example'})
+        self.assertEqual([row['title'] for row in tables['boards.ndjson']], ['Example'])
+        self.assertEqual(tables['members.ndjson'], [{'board': 1, 'user': 1, 'email': 'n@user.com'}])
+        self.assertEqual(tables['cards.ndjson'][0]['checklist'], {'Step': True})
+        self.assertEqual(tables['card_marks.ndjson'], [{'card': self.card.pk, 'mark': self.mark.pk}])
+        self.assertEqual([row['body'] for row in tables['comments.ndjson']], ['Comment'])
+
+    def test_board_export_has_media(self):
+        archive = read_archive(self.client.get(reverse('api-board-export', kwargs={'pk': 1})))
+        for name in (Board.objects.get(pk=1).background_img.name, CardFile.objects.get().file.name):
+            self.assertEqual(archive.read(f'media/{name}'), open(f'media/{name}', 'rb').read())
+
+    def test_project_export_without_media(self):
+        response = self.client.get(reverse('api-project-export', kwargs={'pk': 1}), {'media': 0})
+        archive = read_archive(response)
+        self.assertEqual(json.loads(archive.read('manifest.json'))['project'], {'id': 1, 'title': 'Example'})
+        self.assertFalse([name for name in archive.namelist() if name.startswith('media/')])
+
+    def test_command_exports_like_the_api(self):
+        archive = read_archive(self.client.get(reverse('api-project-export', kwargs={'pk': 1}), {'media': 0}))
+        with tempfile.NamedTemporaryFile(suffix='.zip') as output:
+            call_command('export_boards', project=1, output=output.name, no_media=True, stderr=StringIO())
+            self.assertEqual(zipfile.ZipFile(output.name).read('cards.ndjson'), archive.read('cards.ndjson'))
+
+    def test_export_is_for_members(self):
+        self.client.force_login(get_user(2))
+        self.assertEqual(self.client.get(reverse('api-board-export', kwargs={'pk': 1})).status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse('api-project-export', kwargs={'pk': 1})).status_code,
+                         status.HTTP_403_FORBIDDEN)
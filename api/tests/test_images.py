@@ -0,0 +1,196 @@
+import json
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from boards.images import compress_board_background
+from boards.models import Project, Board, BoardChange, BoardMember, MediaBlob
+from boards.storage import get_media_storage
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+def get_file():
+    return SimpleUploadedFile(name='test_image.jpg',
+                              content=open('media/back_img/ryan-lum-1ak3Z7ZmtQA-unsplash.jpg', 'rb').read(),
+                              content_type='image/jpeg')
+
+
+def get_png(color, mode='RGB'):
+    image_output = BytesIO()
+    Image.new(mode, (320, 200), color).save(image_output, 'PNG')
+    return SimpleUploadedFile('background.png', image_output.getvalue(), 'image/png')
+
+
+class BoardBackgroundTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img=get_file()).save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        self.client.force_login(get_user(1))
+
+    def create_board(self, background):
+        """Creates a board with `background` through the API, leaving its compression unscheduled."""
+        data = {'title': 'Example Board', 'project': 1, 'background_img': background}
+        with mock.patch('boards.images.submit_compression'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('api-project-boards', kwargs={'pk': 1}), data, format='formdata')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def create_compressed_board(self):
+        board = Board.objects.get(pk=self.create_board(get_png('#33669980', 'RGBA')).data['id'])
+        compress_board_background(board.pk)
+        board.refresh_from_db()
+        return board
+
+    def test_board_create_leaves_background_pending(self):
+        response = self.create_board(get_png('#33669980', 'RGBA'))
+        self.assertEqual(response.data['background_status'], Board.BackgroundStatus.PENDING)
+        self.assertTrue(response.data['background_img'].endswith('.png'))
+        self.assertEqual(response.data['background_srcset'], '')
+
+    def test_board_create_queues_compression_after_commit(self):
+        data = {'title': 'Example Board', 'project': 1, 'background_img': get_png('#336699')}
+        with mock.patch('boards.images.submit_compression') as submit:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post(reverse('api-project-boards', kwargs={'pk': 1}), data, format='formdata')
+            submit.assert_not_called()
+            for callback in callbacks:
+                callback()
+        submit.assert_called_once_with(response.data['id'])
+
+    def test_compressed_background_is_jpeg(self):
+        board = Board.objects.get(pk=self.create_board(get_png('#33669980', 'RGBA')).data['id'])
+        version = board.version
+        compress_board_background(board.pk)
+        board.refresh_from_db()
+
+        self.assertEqual(board.background_status, Board.BackgroundStatus.READY)
+        self.assertTrue(board.background_img.name.endswith('.jpg'))
+        self.assertEqual(Image.open(board.background_img).format, 'JPEG')
+        self.assertGreater(board.version, version)
+
+    def test_variants_are_not_upscaled(self):
+        board = self.create_compressed_board()
+        self.assertEqual(list(board.background_variants), ['320'])
+        variant = board.background_img.storage.open(board.background_variants['320'])
+        self.assertEqual((Image.open(variant).format, Image.open(variant).size), ('WEBP', (320, 200)))
+        self.assertTrue(board.background_placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(board.background_placeholder), 1024)
+
+    def test_variants_are_served(self):
+        board = self.create_compressed_board()
+        data = json.loads(self.client.get(reverse('api-board-detail', kwargs={'pk': board.pk})).content)
+        self.assertEqual(data['background_srcset'], f'/media/{board.background_variants["320"]} 320w')
+        self.assertEqual(data['background_placeholder'], board.background_placeholder)
+        response = self.client.get(reverse('project-detail', kwargs={'pk': 1}))
+        self.assertContains(response, f'srcset="/media/{board.background_variants["320"]} 320w"')
+
+    def test_command_renders_missing_variants(self):
+        # Backgrounds compressed before variants existed.
+        board = self.create_compressed_board()
+        Board.objects.filter(pk=board.pk).update(background_variants={}, background_placeholder='')
+        version = Board.objects.get(pk=board.pk).version
+        call_command('render_board_backgrounds', stdout=StringIO())
+        board.refresh_from_db()
+        self.assertEqual(list(board.background_variants), ['320'])
+        self.assertTrue(board.background_placeholder)
+        change = board.changes.get(seq=board.version)
+        self.assertEqual((board.version, change.model, change.action),
+                         (version + 1, 'board', BoardChange.Action.UPDATED))
+        self.assertEqual(change.data['background_variants'], board.background_variants)
+
+    def test_full_queue_leaves_background_pending(self):
+        data = {'title': 'Example Board', 'project': 1, 'background_img': get_png('#336699')}
+        with mock.patch('boards.images._slots', threading.BoundedSemaphore(1)) as slots, \
+                mock.patch('boards.images.get_thread_pool') as pool, self.assertLogs('boards.images', 'WARNING'):
+            slots.acquire()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('api-project-boards', kwargs={'pk': 1}), data, format='formdata')
+        pool.return_value.submit.assert_not_called()
+        self.assertEqual(Board.objects.get(pk=response.data['id']).background_status, Board.BackgroundStatus.PENDING)
+
+    @override_settings(BOARD_IMAGE_PENDING_MINUTES=10)
+    def test_recently_queued_background_is_left_pending(self):
+        # It may still be compressing elsewhere.
+        board = Board.objects.get(pk=self.create_board(get_png('#336699')).data['id'])
+        call_command('render_board_backgrounds', stdout=StringIO())
+        board.refresh_from_db()
+        self.assertEqual(board.background_status, Board.BackgroundStatus.PENDING)
+
+    @override_settings(BOARD_IMAGE_PENDING_MINUTES=10)
+    def test_orphaned_background_is_compressed_by_command(self):
+        board = Board.objects.get(pk=self.create_board(get_png('#336699')).data['id'])
+        # Writes to the board's content do not postpone the recovery of its background.
+        Board.objects.filter(pk=board.pk).update(background_queued_on=timezone.now() - timedelta(minutes=11),
+                                                 last_modified=timezone.now())
+        output = StringIO()
+        call_command('render_board_backgrounds', stdout=output)
+        board.refresh_from_db()
+        self.assertEqual(board.background_status, Board.BackgroundStatus.READY)
+        self.assertTrue(board.background_img.name.endswith('.jpg'))
+        self.assertEqual(list(board.background_variants), ['320'])
+        self.assertIn('Compressed the backgrounds of 1 boards', output.getvalue())
+
+    def test_failed_compression_releases_stale_variants(self):
+        storage = get_media_storage()
+        stale = {'320': storage.save('back_img/old_320w.webp', ContentFile(b'old variant'))}
+        Board.objects.filter(pk=1).update(background_status=Board.BackgroundStatus.PENDING,
+                                          background_variants=stale, background_placeholder='data:old')
+        version = Board.objects.get(pk=1).version
+
+        with mock.patch('boards.images.get_process_pool') as pool, self.assertLogs('boards.images', 'ERROR'):
+            pool.return_value.submit.side_effect = OSError('The worker died')
+            compress_board_background(1)
+
+        board = Board.objects.get(pk=1)
+        self.assertEqual((board.background_status, board.background_variants, board.background_placeholder),
+                         (Board.BackgroundStatus.FAILED, {}, ''))
+        self.assertFalse(MediaBlob.objects.filter(name=stale['320']).exists())
+        self.assertEqual(board.version, version + 1)
+        self.assertEqual(board.changes.get(seq=board.version).data['background_status'], 'failed')
+
+
+class BoardBackgroundReplaceTest(TransactionTestCase):
+    """Runs outside of a test transaction, where on_commit() callbacks run right away."""
+
+    def setUp(self):
+        user = User.objects.create(email='n@user.com', password='foo', first_name='N', last_name='U')
+        self.board = Board.objects.create(title='Example', project=Project.objects.create(title='Example', owner=user),
+                                          background_img=ContentFile(b'old background', 'old.jpg'))
+        self.previous = self.board.background_img.name
+
+    def tearDown(self):
+        for blob in MediaBlob.objects.all():
+            get_media_storage().backend.delete(blob.name)
+
+    def test_failed_save_keeps_the_previous_background(self):
+        self.board.background_img = ContentFile(b'new background', 'new.jpg')
+        with mock.patch.object(Board, '_do_update', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.board.save()
+        self.assertTrue(MediaBlob.objects.filter(name=self.previous).exists())
+        self.assertTrue(get_media_storage().exists(self.previous))
+
+    def test_saved_background_releases_the_previous_one(self):
+        self.board.background_img = ContentFile(b'new background', 'new.jpg')
+        self.board.save()
+        self.assertFalse(MediaBlob.objects.filter(name=self.previous).exists())
+        self.assertFalse(get_media_storage().exists(self.previous))
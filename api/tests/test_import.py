@@ -0,0 +1,172 @@
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from boards.export import export_project
+from boards.imports import Importer, run_import
+from boards.models import (Project, Board, BoardChange, BoardMember, Column, Card, Mark, CardMark, CardComment,
+                           ImportJob, ImportedRow)
+
+User = get_user_model()
+
+TRELLO_BOARD = {
+    'id': 'b1', 'name': 'Trello board', 'closed': False, 'prefs': {'backgroundColor': '#d29034'},
+    'labels': [{'id': 'l1', 'name': '', 'color': 'green'}],
+    'lists': [{'id': 'c2', 'name': 'Done', 'pos': 2}, {'id': 'c1', 'name': 'To do', 'pos': 1}],
+    'cards': [
+        {'id': 'k1', 'idList': 'c1', 'name': 'A card title longer than thirty characters', 'pos': 5,
+         'desc': 'Text', 'due': '2023-01-02T03:04:05.000Z', 'idLabels': ['l1']},
+        {'id': 'k2', 'idList': 'c1', 'name': 'First', 'pos': 1, 'desc': '', 'due': None},
+    ],
+    'checklists': [{'idCard': 'k2', 'checkItems': [{'name': 'Item', 'state': 'complete'}]}],
+    'actions': [{'id': 'a1', 'type': 'commentCard', 'data': {'card': {'id': 'k1'}, 'text': 'Hello'}}],
+}
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+def get_file():
+    return SimpleUploadedFile(name='test_image.jpg',
+                              content=open('media/back_img/ryan-lum-1ak3Z7ZmtQA-unsplash.jpg', 'rb').read(),
+                              content_type='image/jpeg')
+
+
+class ImportTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
+        User(email='n3@user.com', password='foo', first_name='N3', last_name='U3').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img=get_file()).save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+
+    def export_example(self):
+        board = Board.objects.get(pk=1)
+        column = Column.objects.create(title='To do', board=board)
+        mark = Mark.objects.create(title='Urgent', board=board)
+        for i in range(5):
+            card = Card.objects.create(title=f'Card {i}', column=column, checklist={'Step': i % 2 == 0},
+                                       deadline=timezone.now())
+            CardMark.objects.create(card=card, mark=mark)
+            CardComment.objects.create(card=card, user=get_user(1), body=f'Comment {i}')
+        BoardMember.objects.create(board=board, user=get_user(2))
+        return b''.join(export_project(Project.objects.get(pk=1)))
+
+    def import_archive(self):
+        """Imports the example export as user 3 through the API, running the job in the test."""
+        archive = self.export_example()
+        self.client.force_login(get_user(3))
+        with mock.patch('boards.imports._get_executor') as executor:
+            executor.return_value.submit.side_effect = lambda run, job_id: run_import(ImportJob.objects.get(pk=job_id))
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('api-imports'),
+                                            {'source': SimpleUploadedFile('export.zip', archive)})
+        return ImportJob.objects.get(pk=response.data['id'])
+
+    def import_trello_board(self):
+        with tempfile.NamedTemporaryFile(suffix='.json') as source:
+            source.write(json.dumps(TRELLO_BOARD).encode())
+            source.flush()
+            with mock.patch('boards.imports.schedule_background_compression'):
+                call_command('import_boards', source.name, user='n2@user.com', project=None, stdout=StringIO(),
+                             stderr=StringIO())
+        return Board.objects.get(title='Trello board')
+
+    def test_import_runs_in_the_background(self):
+        archive = self.export_example()
+        self.client.force_login(get_user(3))
+        with mock.patch('boards.imports._get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('api-imports'), {'source': SimpleUploadedFile('export.zip', archive)})
+        self.assertEqual((response.status_code, response.data['status']), (status.HTTP_202_ACCEPTED, 'pending'))
+        executor.return_value.submit.assert_called_once_with(mock.ANY, response.data['id'])
+
+    def test_archive_is_imported_into_a_new_project(self):
+        job = self.import_archive()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        imported = Board.objects.get(project__owner=get_user(3))
+        self.assertEqual(imported.project.title, 'Example')
+        self.assertEqual(set(imported.members.values_list('user', flat=True)), {1, 2, 3})
+        cards = Card.objects.filter(column__board=imported).order_by('rank')
+        self.assertEqual([(card.title, card.checklist['Step']) for card in cards],
+                         [(f'Card {i}', i % 2 == 0) for i in range(5)])
+        self.assertEqual(CardMark.objects.filter(card__in=cards, mark__board=imported).count(), 5)
+        self.assertEqual(sorted(CardComment.objects.filter(card__in=cards).values_list('body', 'user')),
+                         [(f'Comment {i}', 1) for i in range(5)])
+        self.assertEqual(job.rows, ImportedRow.objects.filter(job=job).count())
+
+    def test_imported_rows_are_searchable(self):
+        self.import_archive()
+        response = self.client.get(reverse('api-search'), {'q': 'comment 3'})
+        self.assertEqual([hit['type'] for hit in response.data], ['cardcomment'])
+
+    def test_imported_board_is_visible_to_its_new_member(self):
+        self.import_archive()
+        imported = Board.objects.get(project__owner=get_user(3))
+        self.assertEqual(self.client.get(reverse('api-board-detail', kwargs={'pk': imported.pk})).status_code,
+                         status.HTTP_200_OK)
+
+    @override_settings(BOARD_IMPORT_BATCH_SIZE=2)
+    def test_failed_import_restarts_where_it_stopped(self):
+        archive = self.export_example()
+        job = ImportJob.objects.create(owner=get_user(3), source=SimpleUploadedFile('export.zip', archive))
+        flush = Importer.flush
+
+        def flush_until_crash(importer, model, batch):
+            if ImportedRow.objects.count() >= 9:
+                raise OSError('Worker died')
+            flush(importer, model, batch)
+
+        with mock.patch.object(Importer, 'flush', flush_until_crash), self.assertLogs('boards.imports', 'ERROR'):
+            run_import(job)
+        self.assertEqual((job.status, job.error), ('failed', 'Worker died'))
+        self.client.force_login(get_user(3))
+        self.assertEqual(self.client.get(reverse('api-import-detail', kwargs={'pk': job.pk})).data['rows'], 9)
+
+        with mock.patch('boards.imports._get_executor') as executor:
+            executor.return_value.submit.side_effect = lambda run, job_id: run_import(ImportJob.objects.get(pk=job_id))
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('api-import-detail', kwargs={'pk': job.pk}))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.get(reverse('api-import-detail', kwargs={'pk': job.pk}))
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(Card.objects.filter(column__board__project=job.project).count(), 5)
+        self.assertEqual(response.data['rows'], ImportedRow.objects.filter(job=job).count())
+
+    def test_done_import_is_not_restarted(self):
+        job = self.import_archive()
+        self.assertEqual(self.client.post(reverse('api-import-detail', kwargs={'pk': job.pk})).status_code,
+                         status.HTTP_409_CONFLICT)
+
+    def test_trello_board(self):
+        board = self.import_trello_board()
+        self.assertEqual(board.project.owner, get_user(2))
+        self.assertEqual([column.title for column in board.columns.all()], ['To do', 'Done'])
+        cards = list(Card.objects.filter(column__board=board))
+        self.assertEqual([card.title for card in cards], ['First', 'A card title longer than thirt'])
+        self.assertEqual(cards[0].checklist, {'Item': True})
+        self.assertEqual(cards[1].deadline.year, 2023)
+        self.assertEqual([(mark.title, mark.color) for mark in board.marks.all()], [('green', '#61bd4f')])
+        self.assertEqual(cards[1].marks.get().mark.title, 'green')
+        self.assertEqual(cards[1].comments.get().body, 'Hello')
+
+    def test_trello_board_is_journaled(self):
+        # Delta clients learn about every imported row of the board.
+        board = self.import_trello_board()
+        changes = list(board.changes.order_by('seq').values_list('seq', 'model', 'action'))
+        self.assertEqual(sorted(model for _, model, _ in changes),
+                         ['card', 'card', 'cardcomment', 'cardmark', 'column', 'column', 'mark'])
+        self.assertEqual({action for _, _, action in changes}, {BoardChange.Action.CREATED})
+        self.assertEqual(changes[-1][0], board.version)
+        self.assertEqual(len({seq for seq, _, _ in changes}), len(changes))
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from boards.models import Project, Board, BoardMember
+from trello.metrics import registry
+
+User = get_user_model()
+
+REQUESTS_KEY = ('api-board-detail', 'GET', '200')
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg').save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        self.client.force_login(get_user(1))
+
+    def get_uploads(self):
+        return registry.get_values().get('trello_uploads_total', {}).get(('card_file',), 0)
+
+    def test_requests_are_exposed(self):
+        before = registry.collect().get('trello_http_requests_total', {}).get(REQUESTS_KEY, 0)
+        self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn(f'trello_http_requests_total{{view="api-board-detail",method="GET",status="200"}} {before + 1}',
+                      text)
+        self.assertIn('trello_http_request_duration_seconds_bucket{view="api-board-detail",method="GET",le="+Inf"}',
+                      text)
+        self.assertRegex(text, r'trello_http_request_db_queries_count\{view="api-board-detail"\} \d+')
+        self.assertRegex(text, r'trello_http_response_size_bytes_sum\{view="api-board-detail"\} [1-9]')
+
+    def test_other_workers_are_added(self):
+        before = registry.collect().get('trello_http_requests_total', {}).get(REQUESTS_KEY, 0)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            registry.flush()
+            other = {'trello_http_requests_total': [[list(REQUESTS_KEY), 5]],
+                     'trello_uploads_total': [[['card_file'], 2]]}
+            with open(f'{directory}/1.json', 'w') as file:
+                json.dump(other, file)
+            totals = registry.collect()
+        self.assertEqual(totals['trello_http_requests_total'][REQUESTS_KEY], before + 5)
+        self.assertGreaterEqual(totals['trello_uploads_total'][('card_file',)], 2)
+
+    def test_dead_workers_are_archived(self):
+        # Along with what an earlier process under this pid left, once this one has values of its own.
+        self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        uploads = self.get_uploads()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            worker = subprocess.Popen([sys.executable, '-c', ''])
+            worker.wait()
+            for pid in (worker.pid, os.getpid()):
+                with open(f'{directory}/{pid}.json', 'w') as file:
+                    json.dump({'trello_uploads_total': [[['card_file'], 3]]}, file)
+            registry.flush()
+            self.assertEqual(registry.collect()['trello_uploads_total'][('card_file',)], uploads + 6)
+            self.assertEqual(set(os.listdir(directory)), {'archive.json', 'archive.lock', f'{os.getpid()}.json'})
+
+    def test_archived_workers_are_counted_once(self):
+        uploads = self.get_uploads()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            worker = subprocess.Popen([sys.executable, '-c', ''])
+            worker.wait()
+            with open(f'{directory}/{worker.pid}.json', 'w') as file:
+                json.dump({'trello_uploads_total': [[['card_file'], 3]]}, file)
+            registry.flush()
+            registry.flush()
+            self.assertEqual(registry.collect()['trello_uploads_total'][('card_file',)], uploads + 3)
+
+    @override_settings(WORKER_PROCESSES=2, METRICS_DIR=None)
+    def test_several_workers_need_a_directory(self):
+        with self.assertRaises(ImproperlyConfigured):
+            registry.collect()
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from rest_framework import status
 from django.urls import reverse
@@ -6,7 +7,7 @@ import time
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from boards.models import Project
+from boards.models import Project, Board
 
 User = get_user_model()
 
@@ -24,6 +25,7 @@ def get_file():
 class ProjectTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
         User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
         Project(title='Example', owner=User.objects.get(pk=1)).save()
@@ -137,3 +139,33 @@ class ProjectTest(TestCase):
         self.assertLess(end-start, 0.02)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Project.objects.count(), 0)
+
+    def test_get_project_by_pk_conditional(self):
+        self.client.force_login(get_user(1))
+        url = reverse('api-project-detail', kwargs={'pk': 1})
+
+        response = self.client.get(url, format='json')
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Board.objects.create(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg')
+        modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(modified.data['boards']), 1)
+
+    def test_get_projects_without_boards(self):
+        self.client.force_login(get_user(1))
+        Project(title='Example 2', owner=get_user(1)).save()
+        for project in Project.objects.all():
+            Board.objects.create(title='Example', project=project, background_img='back_img/example.jpg')
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('api-projects'), {'fields': 'id,title,boards.title'})
+        self.assertEqual(response.data[1], {'id': 2, 'title': 'Example 2', 'boards': [{'title': 'Example'}]})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api-projects'), {'depth': 0})
+        self.assertEqual(set(response.data[0]), {'id', 'title', 'owner'})
+
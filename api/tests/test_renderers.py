@@ -0,0 +1,102 @@
+import json
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import prefetch_related_objects
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from api.payloads import render_board, render_column, render_card
+from api.renderers import FastJSONRenderer
+from api.serializers.board_serializers import BoardDetailSerializer
+from api.serializers.card_serializers import CardSerializer
+from api.serializers.column_serializers import BarSerializer
+from boards.models import Project, Board, BoardMember, Column, Card, Mark, CardMark, CardFile, CardComment
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+class RendererTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg').save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        board = Board.objects.get(pk=1)
+        mark = Mark.objects.create(board=board, title='Important', color='#fff')
+        for i in range(2):
+            column = Column.objects.create(board=board, title=f'Column {i}')
+            for j in range(2):
+                card = Card.objects.create(column=column, title=f'Card {j}', description='bla',
+                                           deadline=timezone.now())
+                CardMark.objects.create(card=card, mark=mark)
+                CardFile.objects.create(card=card, file=SimpleUploadedFile('note.txt', b'note'))
+                CardComment.objects.create(card=card, user=get_user(1), body='lorem ipsum')
+        self.client.force_login(get_user(1))
+
+    def test_fast_payloads_match_serializers(self):
+        board = Board.objects.get(pk=1)
+        BoardMember.objects.create(user=get_user(2), board=board)
+        card = Card.objects.last()
+        card.checklist = {'Ship it ✓': True, 'Say "hi" ': False}
+        card.save()
+        CardMark.objects.create(card=card, mark=Mark.objects.create(board=board, title='Second', color='#000'))
+        CardComment.objects.create(card=card, user=None, body='ünïcode')
+        Column.objects.create(board=board, title='Empty')
+
+        def render(serializer_class, instance):
+            prefetch_related_objects([instance], *serializer_class.get_prefetch_lookups())
+            return JSONRenderer().render(serializer_class(instance).data)
+
+        for zone in ('UTC', 'Asia/Bishkek'):
+            with timezone.override(zone):
+                board = Board.objects.get(pk=1)
+                self.assertEqual(JSONRenderer().render(render_board(board)), render(BoardDetailSerializer, board))
+                for column in Column.objects.all():
+                    self.assertEqual(JSONRenderer().render(render_column(column)), render(BarSerializer, column))
+                for card in Card.objects.all():
+                    self.assertEqual(JSONRenderer().render(render_card(card)), render(CardSerializer, card))
+
+    def test_fast_json_renderer_matches_json_renderer(self):
+        data = [1e-05, 1e16, -0.0, 1.5, 10 ** 20, 'line sep ', {'1e5': '0.00001', 2: None},
+                timezone.now(), Board.objects.get(pk=1).created_on.date()]
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+                         JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
+
+    def test_board_detail_is_json_by_default(self):
+        response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(render_board(Board.objects.get(pk=1))))
+
+    def test_board_detail_as_msgpack(self):
+        url = reverse('api-board-detail', kwargs={'pk': 1})
+        packed = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(packed.status_code, status.HTTP_200_OK)
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content), json.loads(self.client.get(url).content))
+
+    def test_msgpack_request_body(self):
+        response = self.client.post(reverse('api-board-add-member', kwargs={'pk': 1}),
+                                    msgpack.packb({'user': 'n2@user.com'}), content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(BoardMember.objects.filter(board_id=1, user=get_user(2)).exists())
+
+    def test_malformed_request_body(self):
+        url = reverse('api-board-add-member', kwargs={'pk': 1})
+        response = self.client.post(url, b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, b'{"user": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from boards.models import Project, Board, BoardMember, Column, Card, Mark, CardComment
+from boards.search import PostgresSearchBackend
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg').save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        column = Column.objects.create(title='To do', board=Board.objects.get(pk=1))
+        self.card = Card.objects.create(title='Release notes', column=column, description='Draft the changelog',
+                                        checklist={}, deadline=timezone.now())
+        self.other = Card.objects.create(title='Website', column=column, description='Link the release notes',
+                                         checklist={}, deadline=timezone.now())
+        self.comment = CardComment.objects.create(card=self.other, user=get_user(1), body='Notes are in the wiki')
+        # Boards of other users' projects are not searched.
+        hidden = Board.objects.create(title='Release notes', project=Project.objects.create(title='Other',
+                                                                                            owner=get_user(2)))
+        Mark.objects.create(title='Release', board=hidden)
+        self.client.force_login(get_user(1))
+
+    def search(self, q, **params):
+        return self.client.get(reverse('api-search'), {'q': q, **params})
+
+    def test_title_matches_come_first(self):
+        response = self.search('releas NOTE')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(hit['type'], hit['id']) for hit in response.data],
+                         [('card', self.card.pk), ('card', self.other.pk)])
+        self.assertIn('release notes', response.data[1]['snippet'])
+
+    def test_results_are_paged(self):
+        response = self.search('release notes', page_size=1)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('page=2', response['Link'])
+
+    def test_comments_are_searched(self):
+        response = self.search('wiki')
+        self.assertEqual([(hit['type'], hit['id'], hit['card']) for hit in response.data],
+                         [('cardcomment', self.comment.pk, self.other.pk)])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.card.title = 'Roadmap'
+        self.card.save()
+        self.other.delete()
+        self.assertEqual(self.search('notes').data, [])
+        self.assertEqual([hit['id'] for hit in self.search('roadmap').data], [self.card.pk])
+
+    def test_results_page(self):
+        response = self.client.get(reverse('search_results'), {'q': 'release'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, reverse('card-detail', kwargs={'pk': self.card.pk}))
+
+    def test_postgres_matches_word_prefixes(self):
+        self.assertEqual(PostgresSearchBackend.get_query('releas NOTE-2'), 'releas:* & NOTE:* & 2:*')
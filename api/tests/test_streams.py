@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from api.streams import BoardEventsRouter
+from boards.changes import compact_changes
+from boards.models import Project, Board, BoardMember, Column, Mark
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+class BoardEventsTest(TestCase):
+
+    def setUp(self):
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        User(email='n2@user.com', password='foo', first_name='N2', last_name='U2').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg').save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+
+    def listen(self, scope, until):
+        """Runs the board events app for `scope`, writes a mark once it is streaming and disconnects on `until`."""
+        sent, streaming, disconnected = [], asyncio.Event(), asyncio.Event()
+
+        async def receive():
+            if scope['type'] == 'websocket' and not sent:
+                return {'type': 'websocket.connect'}
+            await disconnected.wait()
+            return {'type': scope['type'] + '.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            streaming.set()
+            if until(sent):
+                disconnected.set()
+
+        def write():
+            with self.captureOnCommitCallbacks(execute=True):
+                Mark.objects.create(title='Live', board=Board.objects.get(pk=1))
+
+        async def run():
+            app = asyncio.ensure_future(BoardEventsRouter(None)(scope, receive, send))
+            await asyncio.wait_for(streaming.wait(), 5)
+            if not app.done():
+                await sync_to_async(write)()
+            await asyncio.wait_for(app, 5)
+
+        async_to_sync(run)()
+        return sent
+
+    def get_events_scope(self, user, type='http', headers=()):
+        self.client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        return {'type': type, 'path': '/api/boards/1/events/', 'query_string': b'',
+                'headers': [(b'cookie', cookie.encode()), *headers]}
+
+    def test_board_events_stream(self):
+        seq = Board.objects.get(pk=1).version
+        Column.objects.create(title='To do', board=Board.objects.get(pk=1))
+        scope = self.get_events_scope(get_user(1), headers=[(b'last-event-id', str(seq).encode())])
+
+        def events(sent):
+            body = b''.join(message.get('body', b'') for message in sent).decode()
+            return [json.loads(line[6:]) for line in body.splitlines() if line.startswith('data: ')]
+
+        sent = self.listen(scope, until=lambda sent: len(events(sent)) == 2)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(dict(sent[0]['headers'])[b'content-type'], b'text/event-stream')
+        # The change missed since Last-Event-ID, then the one made while connected.
+        self.assertEqual([(event['seq'], event['model'], event['action']) for event in events(sent)],
+                         [(seq + 1, 'column', 'created'), (seq + 2, 'mark', 'created')])
+        self.assertEqual(events(sent)[1]['data']['title'], 'Live')
+
+    def test_board_events_websocket(self):
+        sent = self.listen(self.get_events_scope(get_user(2), 'websocket'), until=lambda sent: True)
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': 4403}])
+
+        sent = self.listen(self.get_events_scope(get_user(1), 'websocket'), until=lambda sent: len(sent) == 2)
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        self.assertEqual(json.loads(sent[1]['text'])['data']['title'], 'Live')
+
+        compact_changes(keep=0)
+        scope = self.get_events_scope(get_user(1), 'websocket')
+        scope['query_string'] = b'since=0'
+        sent = self.listen(scope, until=lambda sent: sent[-1]['type'] == 'websocket.close')
+        self.assertEqual(json.loads(sent[1]['text']), {'event': 'resync'})
+        self.assertEqual(sent[2], {'type': 'websocket.close', 'code': 4410})
+
+    def test_board_events_websocket_checks_origin(self):
+        # Pages of other sites cannot open the stream with the user's session cookie.
+        scope = self.get_events_scope(get_user(1), 'websocket',
+                                       headers=[(b'host', b'testserver'), (b'origin', b'https://evil.example')])
+        sent = self.listen(scope, until=lambda sent: True)
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': 4403}])
+
+        scope = self.get_events_scope(get_user(1), 'websocket',
+                                       headers=[(b'host', b'testserver'), (b'origin', b'http://testserver')])
+        sent = self.listen(scope, until=lambda sent: len(sent) == 2)
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+
+        with self.settings(CSRF_TRUSTED_ORIGINS=['https://*.example.com']):
+            scope = self.get_events_scope(get_user(1), 'websocket', headers=[(b'origin', b'https://app.example.com')])
+            sent = self.listen(scope, until=lambda sent: len(sent) == 2)
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
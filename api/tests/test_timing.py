@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.base import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from boards.models import Project, Board, BoardMember
+from trello.timing import install_hooks as install_timing_hooks
+
+User = get_user_model()
+
+
+def get_user(pk):
+    return User.objects.get(pk=pk)
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1, SERVER_TIMING_HEADER=True)
+class ServerTimingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User(email='n@user.com', password='foo', first_name='N', last_name='U').save()
+        Project(title='Example', owner=get_user(1)).save()
+        Board(title='Example', project=Project.objects.get(pk=1), background_img='back_img/example.jpg').save()
+        BoardMember(user=get_user(1), board=Board.objects.get(pk=1)).save()
+        self.client.force_login(get_user(1))
+
+    def test_header_splits_the_response_time(self):
+        with self.assertLogs('trello.timing', 'INFO'):
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, ')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_sampled_requests_are_logged(self):
+        with self.assertLogs('trello.timing', 'INFO') as logs:
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        record = logs.records[0].timing
+        self.assertEqual((record['view'], record['status']), ('api-board-detail', 200))
+        self.assertGreater(record['db_queries'], 0)
+        self.assertIn(f'desc="{record["db_queries"]} queries"', response['Server-Timing'])
+        self.assertGreater(record['serializer_ms'], 0)
+
+    def test_template_rendering_is_timed(self):
+        with self.assertLogs('trello.timing', 'INFO'):
+            response = self.client.get(reverse('search_results'), {'q': 'example'})
+        self.assertIn('template;dur=', response['Server-Timing'])
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_is_off_for_users(self):
+        with self.assertLogs('trello.timing', 'INFO'):
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_is_on_for_staff(self):
+        User.objects.filter(pk=1).update(is_staff=True)
+        with self.assertLogs('trello.timing', 'INFO'):
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        with self.assertNoLogs('trello.timing', 'INFO'):
+            response = self.client.get(reverse('api-board-detail', kwargs={'pk': 1}))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_hooks_are_installed_once(self):
+        render = Template.render
+        install_timing_hooks()
+        self.assertIs(Template.render, render)
@@ -1,13 +1,15 @@
 from django.urls import path, re_path, include
-from .views import (BoardView, BoardDetailView,
-                    ColumnView, ColumnDetailView,
-                    CardView, CardDetailView,
+from .views import (BoardView, BoardDetailView, BoardChangesView,
+                    ColumnView, ColumnDetailView, ColumnMoveView,
+                    CardView, CardDetailView, CardMoveView, CardBulkView,
                     CardMarkView, CardMarkDetailView,
                     BoardMarkView, BoardMarkDetailView,
-                    CardFileView, CardFileDetailView,
+                    CardFileView, CardFileDetailView, CardFileUploadView, CardFileUploadDetailView,
+                    CardFileUploadPartView, CardFileUploadCompleteView,
                     CardCommentView,
                     BoardsFavouriteView, BoardsFavouriteView, BoardsLastSeenView,
-                    ProjectView, ProjectDetailView, ProjectBoardView, BoardMemberAddView, CardCommentDetailView)
+                    ProjectView, ProjectDetailView, ProjectBoardView, BoardMemberAddView, CardCommentDetailView,
+                    SearchView, ProjectExportView, BoardExportView, ImportView, ImportDetailView)
 
 
 urlpatterns = [
@@ -18,18 +20,24 @@ urlpatterns = [
     path('projects/<int:pk>', ProjectDetailView.as_view(), name='api-project-detail'),
 
     path('boards/project/<int:pk>/', ProjectBoardView.as_view(), name='api-project-boards'),
+    path('boards/project/<int:pk>/export/', ProjectExportView.as_view(), name='api-project-export'),
     path('boards/', BoardView.as_view(), name='api-boards'),
     path('boards/favourite/', BoardsFavouriteView.as_view(), name='api-boards-favourite'),
     path('boards/recent/', BoardsLastSeenView.as_view(), name='api-boards-recent'),
     path('boards/<int:pk>/', BoardDetailView.as_view(), name='api-board-detail'),
+    path('boards/<int:pk>/changes/', BoardChangesView.as_view(), name='api-board-changes'),
     path('boards/<int:pk>/invite/', BoardMemberAddView.as_view(), name='api-board-add-member'),
+    path('boards/<int:pk>/export/', BoardExportView.as_view(), name='api-board-export'),
     path('boards/favourite/', BoardsFavouriteView.as_view(), name='api-board-favourite'),
 
     path('columns/board/<int:pk>/', ColumnView.as_view(), name='api-columns'),
     path('columns/<int:pk>/', ColumnDetailView.as_view(), name='api-column-detail'),
+    path('columns/<int:pk>/move/', ColumnMoveView.as_view(), name='api-column-move'),
 
     path('cards/column/<int:pk>/', CardView.as_view(), name='api-cards'),
     path('cards/<int:pk>/', CardDetailView.as_view(), name='api-card-detail'),
+    path('cards/<int:pk>/move/', CardMoveView.as_view(), name='api-card-move'),
+    path('cards/bulk/', CardBulkView.as_view(), name='api-cards-bulk'),
 
     path('mark/board/<int:pk>/', BoardMarkView.as_view(), name='api-board-mark'),
     path('mark/<int:pk>/', BoardMarkDetailView.as_view(), name='api-board-mark-detail'),
@@ -38,7 +46,18 @@ urlpatterns = [
 
     path('files/card/<int:pk>/', CardFileView.as_view(), name='api-card-file'),
     path('files/card/<int:pk>/delete', CardFileDetailView.as_view(), name='api-card-file-detail'),
+    path('files/card/<int:pk>/uploads/', CardFileUploadView.as_view(), name='api-card-file-uploads'),
+    path('files/uploads/<int:pk>/', CardFileUploadDetailView.as_view(), name='api-card-file-upload'),
+    path('files/uploads/<int:pk>/parts/<int:number>/', CardFileUploadPartView.as_view(),
+         name='api-card-file-upload-part'),
+    path('files/uploads/<int:pk>/complete/', CardFileUploadCompleteView.as_view(),
+         name='api-card-file-upload-complete'),
 
     path('comments/card/<int:pk>/', CardCommentView.as_view(), name='api-card-comment'),
-    path('comments/<int:pk>/', CardCommentDetailView.as_view(), name='api-card-comment-detail')
+    path('comments/<int:pk>/', CardCommentDetailView.as_view(), name='api-card-comment-detail'),
+
+    path('search/', SearchView.as_view(), name='api-search'),
+
+    path('imports/', ImportView.as_view(), name='api-imports'),
+    path('imports/<int:pk>/', ImportDetailView.as_view(), name='api-import-detail'),
 ]
\ No newline at end of file
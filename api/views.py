@@ -1,34 +1,61 @@
+import hashlib
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects, Count, Max, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import swagger_auto_schema, no_body
 
 from .serializers.project_serializers import ProjectSerializer
 from .serializers.card_serializers import CardSerializer, CardUpdateSerializer, CardMarkSerializer, \
     CardMarkDetailSerializer, CardFileSerializer, CardFileDetailSerializer, CardCommentSerializer, \
-    CardCommentDetailSerializer, CardCommentUpdateSerializer
+    CardCommentDetailSerializer, CardCommentUpdateSerializer, CardOperationSerializer, MoveSerializer, \
+    CardMoveSerializer, CardFileUploadSerializer, CardFileUploadPartSerializer, CardFileUploadCompleteSerializer
 from .serializers.column_serializers import BarSerializer
+from .serializers.search_serializers import SearchHitSerializer
+from .serializers.import_serializers import ImportJobSerializer
 from .serializers.board_serializers import BoardSerializer, BoardUpdateSerializer, BoardPatchSerializer, \
     BoardDetailSerializer, BoardFavouriteSerializer, BoardMemberSerializer, BoardMarkSerializer, \
-    BoardMarkUpdateSerializer, BoardsLastSeenSerializer
+    BoardMarkUpdateSerializer, BoardsLastSeenSerializer, BoardChangeSerializer
+from .cache import get_board_detail_content, ConditionalGetMixin
+from .payloads import render_board, render_column, render_card
+from .renderers import FastJSONRenderer
+from .pagination import CursorPaginationMixin, PageNumberPagination, pagination_parameters, page_parameters
+from .selection import FieldSelection, selection_parameters
 from .permissions import IsProjectOwnerOrReadOnly, IsBoardOwnerOrMember, IsBoardMember, IsCommentOwner
 from boards.models import (Project, Board, Column,
-                           Card, Mark, CardMark, CardFile, CardComment,
-                           BoardMember, BoardLastSeen, BoardFavourite)
+                           Card, Mark, CardMark, CardFile, CardFileUpload, CardComment,
+                           BoardMember, BoardFavourite, BoardChange, ImportJob)
+from boards.ranks import get_rank, rank_between
+from boards.recent import record_board_seen, get_recent_boards
+from boards.search import SearchResults, get_backend as get_search_backend
+from boards.changes import record_changes, board_touches_suppressed
+from boards.export import export_project, export_board
+from boards.imports import schedule_import, restart_import
+from boards.uploads import UploadError, save_part, complete_upload, abort_upload
+from boards.access import get_user_access
 
 
-class ProjectView(APIView):
+class ProjectView(CursorPaginationMixin, APIView):
 
     @swagger_auto_schema(responses={200: ProjectSerializer(many=True)},
-                         operation_summary='Reads all Projects that current user owns')
+                         operation_summary='Reads all Projects that current user owns',
+                         manual_parameters=(*pagination_parameters, *selection_parameters))
     def get(self, request):
         self.check_permissions(request)
 
-        projects = Project.objects.filter(owner=request.user)
-        serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        selection = FieldSelection.from_request(request)
+        projects = self.paginate_queryset(Project.objects.filter(owner=request.user), request)
+        prefetch_related_objects(projects, *ProjectSerializer.get_prefetch_lookups(selection=selection))
+        serializer = ProjectSerializer(projects, many=True, context={'selection': selection})
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(operation_summary='Creates a new Project for current user',
                          request_body=ProjectSerializer)
@@ -42,7 +69,7 @@ class ProjectView(APIView):
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
 
 
-class ProjectDetailView(APIView):
+class ProjectDetailView(ConditionalGetMixin, APIView):
     permission_classes = (IsProjectOwnerOrReadOnly,)
 
     @staticmethod
@@ -50,13 +77,28 @@ class ProjectDetailView(APIView):
         project = Project.objects.get(pk=pk)
         return project
 
+    @staticmethod
+    def get_etag(project):
+        # Every board write bumps its version, so the sum changes whenever a listed board does.
+        boards = project.boards.aggregate(count=Count('id'), max_id=Max('id'),
+                                          version=Sum('version'), last_modified=Max('last_modified'))
+        state = ':'.join(str(value) for value in (project.title, project.owner_id, *boards.values()))
+        return f'project-{project.pk}-' + hashlib.md5(state.encode()).hexdigest()
+
     @swagger_auto_schema(responses={200: ProjectSerializer()},
-                         operation_summary='Reads certain Project by pk')
+                         operation_summary='Reads certain Project by pk',
+                         manual_parameters=selection_parameters)
     def get(self, request, pk):
         project = self.get_object(pk)
         self.check_object_permissions(request, project)
 
-        serializer = ProjectSerializer(project)
+        selection = FieldSelection.from_request(request)
+        not_modified = self.get_not_modified_response(request, etag=selection.vary_etag(self.get_etag(project)))
+        if not_modified:
+            return not_modified
+
+        prefetch_related_objects([project], *ProjectSerializer.get_prefetch_lookups(selection=selection))
+        serializer = ProjectSerializer(project, context={'selection': selection})
         return Response(serializer.data)
 
     @swagger_auto_schema(request_body=ProjectSerializer, operation_summary='Updates certain Project by pk')
@@ -78,7 +120,7 @@ class ProjectDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BoardView(APIView):
+class BoardView(CursorPaginationMixin, APIView):
     parser_classes = (MultiPartParser, FormParser)
 
     is_archived = openapi.Parameter('is_archived', openapi.IN_QUERY,
@@ -95,18 +137,20 @@ class BoardView(APIView):
         if is_archived is not None:
             boards = boards.filter(board__is_archived=is_archived)
 
-        return [board.board for board in boards]
+        return boards.select_related('board')
 
     @swagger_auto_schema(responses={200: BoardSerializer(many=True)},
                          operation_summary='Reads all Boards that the current user is member of',
-                         manual_parameters=(is_archived,))
+                         manual_parameters=(is_archived, *pagination_parameters, *selection_parameters))
     def get(self, request):
-        boards = self.get_queryset(request=request)
-        serializer = BoardSerializer(boards, many=True)
-        return Response(serializer.data)
+        selection = FieldSelection.from_request(request)
+        members = self.paginate_queryset(self.get_queryset(request=request), request)
+        serializer = BoardSerializer([member.board for member in members], many=True,
+                                     context={'selection': selection})
+        return self.get_paginated_response(serializer.data)
 
 
-class ProjectBoardView(APIView):
+class ProjectBoardView(CursorPaginationMixin, APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = (IsProjectOwnerOrReadOnly,)
 
@@ -114,13 +158,15 @@ class ProjectBoardView(APIView):
         return Project.objects.get(pk=self.kwargs['pk'])
 
     @swagger_auto_schema(responses={200: BoardSerializer(many=True)},
-                         operation_summary='Reads all Boards that were created under a certain Project')
+                         operation_summary='Reads all Boards that were created under a certain Project',
+                         manual_parameters=(*pagination_parameters, *selection_parameters))
     def get(self, request, pk):
         project = self.get_object()
-        boards = project.boards
         self.check_object_permissions(request, project)
-        serializer = BoardSerializer(boards, many=True)
-        return Response(serializer.data)
+        selection = FieldSelection.from_request(request)
+        boards = self.paginate_queryset(project.boards.all(), request)
+        serializer = BoardSerializer(boards, many=True, context={'selection': selection})
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(request_body=BoardSerializer, operation_summary='Creates a new Board under a certain Project')
     def post(self, request, pk):
@@ -131,13 +177,13 @@ class ProjectBoardView(APIView):
         if serializer.is_valid():
             instance = serializer.save(project=self.kwargs['pk'])
             BoardMember.objects.create(user=request.user, board=instance)
-            BoardLastSeen.objects.create(user=request.user, board=instance)
+            record_board_seen(request.user, instance)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class BoardDetailView(APIView):
+class BoardDetailView(ConditionalGetMixin, APIView):
     permission_classes = (IsBoardOwnerOrMember,)
 
     @staticmethod
@@ -146,14 +192,32 @@ class BoardDetailView(APIView):
         return board
 
     @swagger_auto_schema(responses={200: BoardDetailSerializer()},
-                         operation_summary='Reads a certain Board by pk')
+                         operation_summary='Reads a certain Board by pk',
+                         manual_parameters=selection_parameters)
     def get(self, request, pk):
         board = self.get_object(pk)
         self.check_object_permissions(request, board)
-        serializer = BoardDetailSerializer(board)
-        recent, created = BoardLastSeen.objects.get_or_create(user=request.user, board=board)
-        recent.save()
-        return Response(serializer.data)
+        selection = FieldSelection.from_request(request)
+        record_board_seen(request.user, board)
+
+        not_modified = self.get_not_modified_response(request,
+                                                      etag=selection.vary_etag(f'board-{board.pk}-{board.version}'),
+                                                      last_modified=board.last_modified)
+        if not_modified:
+            return not_modified
+
+        # Only the full board is cached, sparse ones are cheap to build.
+        if not selection.is_default:
+            return Response(self.get_data(board, selection))
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return Response(render_board(board))
+        content = get_board_detail_content(board, lambda: FastJSONRenderer().render(render_board(board)))
+        return HttpResponse(content, content_type='application/json')
+
+    @staticmethod
+    def get_data(board, selection):
+        prefetch_related_objects([board], *BoardDetailSerializer.get_prefetch_lookups(selection=selection))
+        return BoardDetailSerializer(board, context={'selection': selection}).data
 
     @swagger_auto_schema(request_body=BoardUpdateSerializer, operation_summary='Updates a Board by pk')
     def put(self, request, pk):
@@ -162,7 +226,8 @@ class BoardDetailView(APIView):
         serializer = BoardDetailSerializer(board, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # The board tree is read with a fixed set of queries, not once per column and card.
+            return Response(render_board(board), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @swagger_auto_schema(request_body=BoardPatchSerializer, operation_summary='Partially updates a Board by pk')
@@ -183,16 +248,19 @@ class BoardDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BoardsFavouriteView(APIView):
+class BoardsFavouriteView(CursorPaginationMixin, APIView):
     permission_classes = (IsBoardMember,)
 
     @swagger_auto_schema(responses={200: BoardFavouriteSerializer(many=True)},
-                         operation_summary='Reads current user\'s Favourite Boards')
+                         operation_summary='Reads current user\'s Favourite Boards',
+                         manual_parameters=(*pagination_parameters, *selection_parameters))
     def get(self, request):
         self.check_permissions(request)
-        boards = [b.board for b in BoardFavourite.objects.filter(user=request.user)]
-        serializer = BoardSerializer(boards, many=True)
-        return Response(serializer.data)
+        selection = FieldSelection.from_request(request)
+        favourites = self.paginate_queryset(BoardFavourite.objects.filter(user=request.user).select_related('board'),
+                                            request)
+        serializer = BoardSerializer([b.board for b in favourites], many=True, context={'selection': selection})
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(request_body=BoardFavouriteSerializer,
                          operation_summary='Makes a certain Board user\'s Favourite')
@@ -218,15 +286,48 @@ class BoardsFavouriteView(APIView):
 class BoardsLastSeenView(APIView):
 
     @swagger_auto_schema(responses={200: BoardsLastSeenSerializer(many=True)},
-                         operation_summary='Reads all user\'s Last Seen Boards')
+                         operation_summary='Reads user\'s most recently seen Boards')
     def get(self, request):
         self.check_permissions(request)
 
-        boards = BoardLastSeen.objects.filter(user=request.user).order_by('-timestamp')
-        serializer = BoardsLastSeenSerializer(boards, many=True)
+        # The list is capped at RECENT_BOARDS_LIMIT, so it is returned in one page.
+        serializer = BoardsLastSeenSerializer(get_recent_boards(request.user), many=True)
         return Response(serializer.data)
 
 
+class BoardChangesView(APIView):
+    permission_classes = (IsBoardOwnerOrMember,)
+    page_size = 500
+
+    @swagger_auto_schema(responses={200: BoardChangeSerializer(many=True)},
+                         operation_summary='Reads the changes made to a Board after a certain version',
+                         operation_description='Without since, only the current version is returned. '
+                                               'More pages follow while more is true. A 410 means the '
+                                               'changes were compacted and the Board has to be reloaded.',
+                         manual_parameters=(openapi.Parameter('since', openapi.IN_QUERY,
+                                                              description='Last seq the client has seen',
+                                                              type=openapi.TYPE_INTEGER),))
+    def get(self, request, pk):
+        board = Board.objects.get(pk=pk)
+        self.check_object_permissions(request, board)
+
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'seq': board.version, 'changes': [], 'more': False})
+        if not since.isdigit():
+            return Response({'since': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        since = int(since)
+        if since < board.journal_start:
+            return Response({'Details': 'Changes are no longer available, reload the board', 'seq': board.version},
+                            status=status.HTTP_410_GONE)
+
+        changes = list(board.changes.filter(seq__gt=since).order_by('seq')[:self.page_size + 1])
+        more = len(changes) > self.page_size
+        changes = changes[:self.page_size]
+        seq = changes[-1].seq if more else max([board.version, *(change.seq for change in changes[-1:])])
+        return Response({'seq': seq, 'changes': BoardChangeSerializer(changes, many=True).data, 'more': more})
+
+
 class BoardMemberAddView(APIView):
     permission_classes = (IsBoardOwnerOrMember,)
 
@@ -261,20 +362,31 @@ class ColumnView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ColumnDetailView(APIView):
+class ColumnDetailView(ConditionalGetMixin, APIView):
     permission_classes = (IsBoardMember,)
 
     @staticmethod
     def get_object(pk):
-        column = Column.objects.get(pk=pk)
+        column = Column.objects.select_related('board').get(pk=pk)
         return column
 
     @swagger_auto_schema(responses={200: BarSerializer()},
-                         operation_summary='Read a certain Column Object')
+                         operation_summary='Read a certain Column Object',
+                         manual_parameters=selection_parameters)
     def get(self, request, pk):
         column = self.get_object(pk)
         self.check_object_permissions(request, column.board)
-        serializer = BarSerializer(column)
+
+        selection = FieldSelection.from_request(request)
+        etag = selection.vary_etag(f'column-{column.pk}-{column.board.version}')
+        not_modified = self.get_not_modified_response(request, etag=etag, last_modified=column.board.last_modified)
+        if not_modified:
+            return not_modified
+
+        if selection.is_default:
+            return Response(render_column(column))
+        prefetch_related_objects([column], *BarSerializer.get_prefetch_lookups(selection=selection))
+        serializer = BarSerializer(column, context={'selection': selection})
         return Response(serializer.data)
 
     @swagger_auto_schema(request_body=BarSerializer, operation_summary='Updates a new Column Object')
@@ -284,7 +396,7 @@ class ColumnDetailView(APIView):
         serializer = BarSerializer(column, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(render_column(column), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @swagger_auto_schema(operation_summary='Delete a certain Column Object')
@@ -295,13 +407,37 @@ class ColumnDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ColumnMoveView(APIView):
+    permission_classes = (IsBoardMember,)
+
+    @swagger_auto_schema(request_body=MoveSerializer,
+                         operation_summary='Moves a Column before or after another Column of its Board')
+    def post(self, request, pk):
+        column = Column.objects.select_related('board').get(pk=pk)
+        self.check_object_permissions(request, column.board)
+        serializer = MoveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        neighbours = {name: Column.objects.filter(pk=neighbour, board=column.board_id).first()
+                      for name, neighbour in serializer.validated_data.items()}
+        if None in neighbours.values():
+            return Response({name: ['Column not found.'] for name, neighbour in neighbours.items() if not neighbour},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the moved column is written, its neighbours keep their ranks.
+        column.rank = get_rank(Column, {'board_id': column.board_id}, exclude=column.pk, **neighbours)
+        column.save(update_fields=['rank'])
+        return Response({'id': column.pk})
+
+
 class CardView(APIView):
     permission_classes = (IsBoardMember,)
 
     @swagger_auto_schema(request_body=CardSerializer,
                          operation_summary='Creates a new Card Object')
     def post(self, request, pk):
-        column = Column.objects.get(pk=pk)
+        column = Column.objects.select_related('board').get(pk=pk)
         self.check_object_permissions(request, column.board)
         serializer = CardSerializer(data=request.data)
         if serializer.is_valid():
@@ -311,21 +447,33 @@ class CardView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CardDetailView(APIView):
+class CardDetailView(ConditionalGetMixin, APIView):
     permission_classes = (IsBoardMember,)
 
     @staticmethod
     def get_object(pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         return card
 
     @swagger_auto_schema(responses={200: CardSerializer()},
-                         operation_summary='Read a certain Card Object')
+                         operation_summary='Read a certain Card Object',
+                         manual_parameters=selection_parameters)
     def get(self, request, pk):
         card = self.get_object(pk)
         self.check_object_permissions(request, card.column.board)
 
-        serializer = CardSerializer(card)
+        board = card.column.board
+        selection = FieldSelection.from_request(request)
+        etag = selection.vary_etag(f'card-{card.pk}-{board.version}')
+        not_modified = self.get_not_modified_response(request, etag=etag, last_modified=board.last_modified)
+        if not_modified:
+            return not_modified
+
+        if selection.is_default:
+            return Response(render_card(card))
+        prefetch_related_objects([card], *CardSerializer.get_prefetch_lookups(selection=selection))
+
+        serializer = CardSerializer(card, context={'selection': selection})
         return Response(serializer.data)
 
     @swagger_auto_schema(request_body=CardSerializer, operation_summary='Updates a new Card Object')
@@ -357,7 +505,171 @@ class CardDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class BoardMarkView(APIView):
+class CardMoveView(APIView):
+    permission_classes = (IsBoardMember,)
+
+    @swagger_auto_schema(request_body=CardMoveSerializer,
+                         operation_summary='Moves a Card before or after another Card, optionally into another Column',
+                         operation_description='The Card goes to the end of the Column if neither before '
+                                               'nor after is given.')
+    def post(self, request, pk):
+        card = Card.objects.select_related('column__board').get(pk=pk)
+        self.check_object_permissions(request, card.column.board)
+        serializer = CardMoveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        column = card.column
+        placement = dict(serializer.validated_data)
+        if 'column' in placement:
+            column = Column.objects.select_related('board').filter(pk=placement.pop('column')).first()
+            if not column:
+                return Response({'column': ['Column not found.']}, status=status.HTTP_400_BAD_REQUEST)
+            self.check_object_permissions(request, column.board)
+
+        neighbours = {name: Card.objects.filter(pk=neighbour, column=column).first()
+                      for name, neighbour in placement.items()}
+        if None in neighbours.values():
+            return Response({name: ['Card not found.'] for name, neighbour in neighbours.items() if not neighbour},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the moved card is written, its neighbours keep their ranks.
+        card.column = column
+        card.rank = get_rank(Card, {'column_id': column.pk}, exclude=card.pk, **neighbours)
+        card.save(update_fields=['column', 'rank'])
+        return Response({'id': card.pk, 'column': column.pk})
+
+
+class CardBulkView(APIView):
+    permission_classes = (IsBoardMember,)
+    max_operations = 10000
+    card_fields = ('title', 'description', 'checklist', 'deadline')
+
+    @swagger_auto_schema(request_body=CardOperationSerializer(many=True),
+                         operation_summary='Creates, updates, moves and deletes Cards in one batch',
+                         operation_description='Operations are applied in order and in one transaction. '
+                                               'Created cards and cards given a new column go to the end '
+                                               'of the column. The response lists the op and card id '
+                                               'of every operation.')
+    def post(self, request):
+        self.check_permissions(request)
+        serializer = CardOperationSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        operations = serializer.validated_data
+        if len(operations) > self.max_operations:
+            return Response({'Details': f'At most {self.max_operations} operations are allowed per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        cards = Card.objects.select_related('column').in_bulk(
+            {operation['id'] for operation in operations if operation['op'] != 'create'})
+        columns = Column.objects.in_bulk({operation['column'] for operation in operations if 'column' in operation})
+        errors = self.get_reference_errors(operations, cards, columns)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        origins = {pk: card.column.board_id for pk, card in cards.items()}
+        board_ids = {column.board_id for column in columns.values()} | set(origins.values())
+        for board in Board.objects.in_bulk(board_ids).values():
+            self.check_object_permissions(request, board)
+
+        with transaction.atomic():
+            # Bulk writes send no signals and the deletes would journal every card on their own.
+            with board_touches_suppressed():
+                results = self.apply(operations, cards, columns)
+            for board_id, changes in self.get_journal(results, origins).items():
+                record_changes(board_id, changes)
+            self.update_search(results, origins)
+        return Response([{'op': op, 'id': card.pk} for op, card in results])
+
+    @staticmethod
+    def get_journal(results, origins):
+        """Groups one change per card, in its final state, by the boards it was on."""
+        journal, final = defaultdict(list), {card.pk: card for op, card in results}
+        deleted = {card.pk for op, card in results if op == 'delete'}
+        for pk, card in final.items():
+            board_id, origin = card.column.board_id, origins.get(pk)
+            if pk in deleted:
+                journal[origin].append((card, BoardChange.Action.DELETED))
+            elif origin is None:
+                journal[board_id].append((card, BoardChange.Action.CREATED))
+            elif origin != board_id:
+                journal[origin].append((card, BoardChange.Action.DELETED))
+                journal[board_id].append((card, BoardChange.Action.CREATED))
+            else:
+                journal[board_id].append((card, BoardChange.Action.UPDATED))
+        return journal
+
+    @staticmethod
+    def update_search(results, origins):
+        deleted = {card.pk for op, card in results if op == 'delete'}
+        cards = {card.pk: card for op, card in results if card.pk not in deleted}
+        get_search_backend().update(cards.values())
+        # Comments are indexed under the board of their card.
+        moved = [pk for pk, origin in origins.items() if pk in cards and cards[pk].column.board_id != origin]
+        if moved:
+            get_search_backend().update(CardComment.objects.filter(card__in=moved).select_related('card__column'))
+
+    @staticmethod
+    def get_reference_errors(operations, cards, columns):
+        errors, deleted = [], set()
+        for operation in operations:
+            error = {}
+            card_id = operation.get('id')
+            if operation['op'] != 'create' and (card_id not in cards or card_id in deleted
+                                                or not cards[card_id].column_id):
+                error['id'] = ['Card not found.']
+            if 'column' in operation and (operation['column'] not in columns
+                                          or not columns[operation['column']].board_id):
+                error['column'] = ['Column not found.']
+            if operation['op'] == 'delete':
+                deleted.add(card_id)
+            errors.append(error)
+        return errors
+
+    def apply(self, operations, cards, columns):
+        results, created, changed, deleted, fields = [], [], {}, set(), set()
+        last_ranks = dict(Card.objects.filter(column__in=columns).values('column')
+                          .annotate(last=Max('rank')).values_list('column', 'last'))
+
+        def next_rank(column):
+            last_ranks[column.pk] = rank_between(last_ranks.get(column.pk), None)
+            return last_ranks[column.pk]
+
+        for operation in operations:
+            op = operation['op']
+            if op == 'create':
+                column = columns[operation['column']]
+                card = Card(column=column, rank=next_rank(column),
+                            checklist=operation.get('checklist', {'Make a to-do': False}),
+                            **{name: operation[name] for name in self.card_fields if name in operation})
+                created.append(card)
+            elif op == 'delete':
+                card = cards[operation['id']]
+                changed.pop(card.pk, None)
+                deleted.add(card.pk)
+            else:
+                card = cards[operation['id']]
+                names = [] if op == 'move' else [name for name in self.card_fields if name in operation]
+                for name in names:
+                    setattr(card, name, operation[name])
+                if 'column' in operation:
+                    card.column = columns[operation['column']]
+                    card.rank = next_rank(card.column)
+                    names.extend(('column', 'rank'))
+                fields.update(names)
+                changed[card.pk] = card
+            results.append((op, card))
+
+        Card.objects.bulk_create(created, batch_size=1000)
+        if changed and fields:
+            Card.objects.bulk_update(changed.values(), fields, batch_size=1000)
+        if deleted:
+            Card.objects.filter(pk__in=deleted).delete()
+        return results
+
+
+class BoardMarkView(CursorPaginationMixin, APIView):
     permission_classes = (IsBoardMember,)
 
     @staticmethod
@@ -366,14 +678,15 @@ class BoardMarkView(APIView):
         return board
 
     @swagger_auto_schema(responses={200: BoardMarkSerializer(many=True)},
-                         operation_summary='Read all Card Label Objects')
+                         operation_summary='Read all Card Label Objects',
+                         manual_parameters=pagination_parameters)
     def get(self, request, pk):
         board = self.get_object(pk)
         self.check_object_permissions(request, board)
 
-        marks = Mark.objects.filter(board=board)
+        marks = self.paginate_queryset(Mark.objects.filter(board=board), request)
         serializer = BoardMarkSerializer(marks, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(request_body=BoardMarkSerializer, operation_summary='Creates a new Card Label Object')
     def post(self, request, pk):
@@ -392,7 +705,7 @@ class BoardMarkDetailView(APIView):
 
     @staticmethod
     def get_object(pk):
-        board_mark = Mark.objects.get(pk=pk)
+        board_mark = Mark.objects.select_related('board').get(pk=pk)
         return board_mark
 
     @swagger_auto_schema(responses={200: BoardMarkSerializer()},
@@ -443,7 +756,7 @@ class CardMarkView(APIView):
     @swagger_auto_schema(request_body=CardMarkSerializer,
                          operation_summary='Adding Mark to a Card')
     def post(self, request, pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         self.check_object_permissions(request, card.column.board)
 
         serializer = CardMarkSerializer(data=request.data)
@@ -459,31 +772,33 @@ class CardMarkDetailView(APIView):
     @swagger_auto_schema(request_body=CardMarkDetailSerializer,
                          operation_summary='Deletes marks(s) from a certain card')
     def delete(self, request, pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
+        self.check_object_permissions(request, card.column.board)
+
         delete_ids = [b['mark'] for b in request.data]
         card_marks = CardMark.objects.filter(mark__in=delete_ids, card=card)
         card_marks.delete()
-        self.check_object_permissions(request, card.column.board)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CardFileView(APIView):
+class CardFileView(CursorPaginationMixin, APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = (IsBoardMember,)
 
     @swagger_auto_schema(responses={200: CardFileSerializer(many=True)},
-                         operation_summary='Reads all Files uploaded to a certain Card')
+                         operation_summary='Reads all Files uploaded to a certain Card',
+                         manual_parameters=pagination_parameters)
     def get(self, request, pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         self.check_object_permissions(request, card.column.board)
 
-        files = CardFile.objects.filter(card=card)
+        files = self.paginate_queryset(CardFile.objects.filter(card=card), request)
         serializer = CardFileSerializer(files, many=True)
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(request_body=CardFileSerializer, operation_summary='Uploads new File to a certain Card')
     def post(self, request, pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         self.check_object_permissions(request, card.column.board)
 
         serializer = CardFileSerializer(data=request.data)
@@ -499,7 +814,7 @@ class CardFileDetailView(APIView):
     @swagger_auto_schema(request_body=CardFileDetailSerializer,
                          operation_summary='Deletes a certain Card File by pk')
     def delete(self, request, pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         self.check_object_permissions(request, card.column.board)
 
         delete_ids = [b['file'] for b in request.data]
@@ -509,23 +824,101 @@ class CardFileDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CardCommentView(APIView):
+class CardFileUploadView(APIView):
+    permission_classes = (IsBoardMember,)
+
+    @swagger_auto_schema(request_body=CardFileUploadSerializer, responses={201: CardFileUploadSerializer()},
+                         operation_summary='Starts a chunked upload of a File to a certain Card')
+    def post(self, request, pk):
+        card = Card.objects.select_related('column__board').get(pk=pk)
+        self.check_object_permissions(request, card.column.board)
+
+        serializer = CardFileUploadSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(card=pk, owner=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CardFileUploadMixin:
+    permission_classes = (IsBoardMember,)
+
+    def get_object(self, request, pk):
+        # Aborted and expired uploads are gone, which resuming clients need to tell from a failure.
+        upload = get_object_or_404(CardFileUpload.objects.select_related('card__column__board', 'card_file'),
+                                   pk=pk, owner=request.user)
+        self.check_object_permissions(request, upload.card.column.board)
+        return upload
+
+
+class CardFileUploadDetailView(CardFileUploadMixin, APIView):
+
+    @swagger_auto_schema(responses={200: CardFileUploadSerializer()},
+                         operation_summary='Reads a chunked Card File upload and the parts it received so far')
+    def get(self, request, pk):
+        upload = self.get_object(request, pk)
+        return Response(CardFileUploadSerializer(upload).data)
+
+    @swagger_auto_schema(operation_summary='Aborts a chunked Card File upload and drops its parts')
+    def delete(self, request, pk):
+        abort_upload(self.get_object(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CardFileUploadPartView(CardFileUploadMixin, APIView):
+
+    @swagger_auto_schema(request_body=no_body, responses={200: CardFileUploadPartSerializer()},
+                         operation_summary='Uploads a part of a chunked Card File upload as the raw request body')
+    def put(self, request, pk, number):
+        upload = self.get_object(request, pk)
+        length = request.META.get('CONTENT_LENGTH')
+        if not length:
+            return Response({'Details': 'Content-Length is required'}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        # The body is streamed to storage, never parsed into request.data.
+        try:
+            part = save_part(upload, number, request.stream, int(length))
+        except UploadError as error:
+            return Response({'Details': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(CardFileUploadPartSerializer(part).data)
+
+
+class CardFileUploadCompleteView(CardFileUploadMixin, APIView):
+
+    @swagger_auto_schema(request_body=CardFileUploadCompleteSerializer, responses={202: CardFileUploadSerializer()},
+                         operation_summary='Joins the parts of a chunked upload into a new File of its Card',
+                         operation_description='The parts are joined in the background, poll the returned upload.')
+    def post(self, request, pk):
+        upload = self.get_object(request, pk)
+        serializer = CardFileUploadCompleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upload = complete_upload(upload, serializer.validated_data.get('sha256'))
+        except UploadError as error:
+            return Response({'Details': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(CardFileUploadSerializer(upload).data, status=status.HTTP_202_ACCEPTED)
+
+
+class CardCommentView(CursorPaginationMixin, APIView):
     permission_classes = (IsBoardMember,)
 
     @staticmethod
     def get_object(pk):
-        card = Card.objects.get(pk=pk)
+        card = Card.objects.select_related('column__board').get(pk=pk)
         return card
 
     @swagger_auto_schema(responses={200: CardCommentSerializer(many=True)},
-                         operation_summary='Read all Card Comments')
+                         operation_summary='Read all Card Comments',
+                         manual_parameters=pagination_parameters)
     def get(self, request, pk):
         card = self.get_object(pk)
         self.check_object_permissions(request, card.column.board)
 
-        comments = CardComment.objects.filter(card=card)
-        serializer = CardCommentSerializer(comments)
-        return Response(serializer.data)
+        comments = self.paginate_queryset(CardComment.objects.filter(card=card), request)
+        serializer = CardCommentSerializer(comments, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(request_body=CardCommentSerializer,
                          operation_summary='Creates a new Comment to a certain Card')
@@ -558,7 +951,7 @@ class CardCommentDetailView(APIView):
     @swagger_auto_schema(request_body=CardCommentUpdateSerializer,
                          operation_summary='Updates a new Comment to a certain Card')
     def put(self, request, pk):
-        card_comment = CardComment.objects.get(pk=pk)
+        card_comment = CardComment.objects.select_related('card__column').get(pk=pk)
         self.check_object_permissions(request, card_comment)
 
         serializer = CardCommentSerializer(card_comment, data=request.data, partial=True)
@@ -566,3 +959,99 @@ class CardCommentDetailView(APIView):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SearchView(APIView):
+
+    @swagger_auto_schema(responses={200: SearchHitSerializer(many=True)},
+                         operation_summary='Searches the Boards, Cards, Comments and Labels the user can see',
+                         operation_description='Hits come best first. Every word of q has to match, '
+                                               'words also match longer words they start.',
+                         manual_parameters=(openapi.Parameter('q', openapi.IN_QUERY, description='Words to look for',
+                                                              type=openapi.TYPE_STRING),
+                                            *page_parameters))
+    def get(self, request):
+        self.check_permissions(request)
+        paginator = PageNumberPagination()
+        hits = paginator.paginate_queryset(SearchResults(request.query_params.get('q', ''), request.user),
+                                           request, view=self)
+        return paginator.get_paginated_response(SearchHitSerializer(hits, many=True).data)
+
+
+export_parameters = (
+    openapi.Parameter('media', openapi.IN_QUERY, description='0 leaves the media files out of the archive',
+                      type=openapi.TYPE_INTEGER),
+)
+
+
+def get_export_response(request, export, instance, filename):
+    """Streams the archive as it is written, see boards.export."""
+    response = StreamingHttpResponse(export(instance, media=request.query_params.get('media') != '0'),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ProjectExportView(APIView):
+    permission_classes = (IsProjectOwnerOrReadOnly,)
+
+    @swagger_auto_schema(operation_summary='Downloads a Project as a zip of NDJSON files and media',
+                         manual_parameters=export_parameters)
+    def get(self, request, pk):
+        project = Project.objects.get(pk=pk)
+        self.check_object_permissions(request, project)
+        return get_export_response(request, export_project, project, f'project-{project.pk}.zip')
+
+
+class BoardExportView(APIView):
+    permission_classes = (IsBoardOwnerOrMember,)
+
+    @swagger_auto_schema(operation_summary='Downloads a Board as a zip of NDJSON files and media',
+                         manual_parameters=export_parameters)
+    def get(self, request, pk):
+        board = Board.objects.get(pk=pk)
+        self.check_object_permissions(request, board)
+        return get_export_response(request, export_board, board, f'board-{board.pk}.zip')
+
+
+class ImportView(APIView):
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(request_body=ImportJobSerializer, responses={202: ImportJobSerializer()},
+                         operation_summary='Imports a Trello board JSON export or an export archive',
+                         operation_description='The import runs in the background, poll the returned job. '
+                                               'Without a project, one is created from the source.')
+    def post(self, request):
+        self.check_permissions(request)
+        serializer = ImportJobSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        project = serializer.validated_data.get('project_id')
+        if project is not None and project not in get_user_access(request.user).projects:
+            return Response({'Details': 'Project is not available'}, status=status.HTTP_403_FORBIDDEN)
+        job = serializer.save(owner=request.user)
+        schedule_import(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportDetailView(APIView):
+
+    @staticmethod
+    def get_object(request, pk):
+        return ImportJob.objects.get(pk=pk, owner=request.user)
+
+    @swagger_auto_schema(responses={200: ImportJobSerializer()},
+                         operation_summary='Reads the progress and throughput of an import')
+    def get(self, request, pk):
+        self.check_permissions(request)
+        return Response(ImportJobSerializer(self.get_object(request, pk)).data)
+
+    @swagger_auto_schema(request_body=no_body, responses={202: ImportJobSerializer()},
+                         operation_summary='Restarts a failed or interrupted import where it stopped')
+    def post(self, request, pk):
+        self.check_permissions(request)
+        job = self.get_object(request, pk)
+        if not restart_import(job):
+            return Response({'Details': f'Import is {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
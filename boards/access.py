@@ -0,0 +1,42 @@
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import BoardMember, Project
+
+User = get_user_model()
+
+BoardAccess = namedtuple('BoardAccess', ('boards', 'projects'))
+
+ACCESS_KEY = 'board-access:{pk}:{version}'
+ACCESS_TIMEOUT = 60 * 60
+
+
+def get_user_access(user):
+    """
+    Returns the ids of the boards `user` is a member of and of the projects they own.
+
+    The set is cached under the user's access version, which is read together
+    with the user on every request, so a warm lookup costs no queries and a
+    membership change is seen by every process at once.
+    """
+    if not user.is_authenticated:
+        return BoardAccess(frozenset(), frozenset())
+
+    key = ACCESS_KEY.format(pk=user.pk, version=user.access_version)
+    access = cache.get(key)
+    if access is None:
+        access = BoardAccess(
+            boards=frozenset(BoardMember.objects.filter(user=user).values_list('board_id', flat=True)),
+            projects=frozenset(Project.objects.filter(owner=user).values_list('id', flat=True)),
+        )
+        cache.set(key, access, ACCESS_TIMEOUT)
+    return access
+
+
+def invalidate_user_access(*user_ids):
+    user_ids = {pk for pk in user_ids if pk}
+    if user_ids:
+        User.objects.filter(pk__in=user_ids).update(access_version=F('access_version') + 1)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BoardsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'boards'
+
+    def ready(self):
+        from trello.timing import install_hooks
+        from . import signals
+
+        install_hooks()
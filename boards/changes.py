@@ -0,0 +1,112 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, Max, Subquery
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .events import publish_change
+from .models import Board, BoardChange
+
+_local = threading.local()
+
+
+def touch_boards(**lookups):
+    """Bumps the content version and modification time of every board matching `lookups`."""
+    if getattr(_local, 'touches_suppressed', False):
+        return
+    Board.objects.filter(**lookups).update(version=F('version') + 1, last_modified=timezone.now())
+
+
+@contextmanager
+def board_touches_suppressed():
+    """
+    Turns touch_boards() and record_change() into no-ops in this thread for the duration of the block.
+
+    Bulk writes use it to skip the per-row work of the signal handlers and
+    record every change they made with record_changes() afterwards.
+    """
+    _local.touches_suppressed = True
+    try:
+        yield
+    finally:
+        _local.touches_suppressed = False
+
+
+def get_deleted_boards():
+    """Boards being deleted in this thread, whose cascades must not be journaled."""
+    if not hasattr(_local, 'deleted_boards'):
+        _local.deleted_boards = set()
+    return _local.deleted_boards
+
+
+def get_snapshot(instance):
+    data = {}
+    for field in instance._meta.concrete_fields:
+        value = field.value_from_object(instance)
+        data[field.name] = value.name if isinstance(value, FieldFile) else value
+    return data
+
+
+def get_change(instance, action):
+    return BoardChange(model=instance._meta.model_name, object_id=instance.pk, action=action,
+                       data=None if action == BoardChange.Action.DELETED else get_snapshot(instance))
+
+
+def record_change(board_id, instance, action):
+    """
+    Bumps the version of the board and journals the change under the new version.
+
+    The version is read back by the insert itself, in the transaction whose
+    update locked the board row, so the sequence numbers of a board follow
+    the order in which its writes commit. Inside a caller's transaction no
+    savepoint is taken, a failure rolls the caller back.
+    """
+    if getattr(_local, 'touches_suppressed', False) or not board_id or board_id in get_deleted_boards():
+        return
+    change = get_change(instance, action)
+    change.board_id = board_id
+    change.seq = Subquery(Board.objects.filter(pk=board_id).values('version')[:1])
+    with transaction.atomic(savepoint=False):
+        touch_boards(pk=board_id)
+        change.save()
+    publish_change(board_id)
+
+
+def record_changes(board_id, changes):
+    """Journals a batch of `(instance, action)` changes of one board with two updates and one insert."""
+    if not changes:
+        return
+    journal = [get_change(instance, action) for instance, action in changes]
+    with transaction.atomic(savepoint=False):
+        Board.objects.filter(pk=board_id).update(version=F('version') + len(changes), last_modified=timezone.now())
+        version = Board.objects.values_list('version', flat=True).get(pk=board_id)
+        for seq, change in enumerate(journal, start=version - len(changes) + 1):
+            change.board_id, change.seq = board_id, seq
+        BoardChange.objects.bulk_create(journal, batch_size=1000)
+    publish_change(board_id)
+
+
+def compact_changes(before=None, keep=None):
+    """
+    Deletes journal entries older than `before` or beyond the newest `keep` of their board.
+
+    Each board remembers the last sequence number it dropped in
+    `journal_start`, so clients asking for changes since an earlier one are
+    told to reload the board. Returns the number of deleted entries.
+    """
+    cutoffs = {}
+    if before is not None:
+        old = BoardChange.objects.filter(timestamp__lt=before).values('board').annotate(last=Max('seq'))
+        cutoffs.update((row['board'], row['last']) for row in old.order_by())
+    if keep is not None:
+        for board_id, version in Board.objects.filter(version__gt=F('journal_start') + keep).values_list('id', 'version'):
+            cutoffs[board_id] = max(cutoffs.get(board_id, 0), version - keep)
+
+    deleted = 0
+    for board_id, last in cutoffs.items():
+        Board.objects.filter(pk=board_id).update(journal_start=Greatest('journal_start', last))
+        deleted += BoardChange.objects.filter(board=board_id, seq__lte=last).delete()[0]
+    return deleted
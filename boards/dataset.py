@@ -0,0 +1,195 @@
+import bisect
+import itertools
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Project, Board, BoardMember, Column, Card, CardComment, Mark, CardMark, MediaBlob
+from .ranks import spread_ranks
+from .search import get_backend as get_search_backend
+from .storage import get_media_storage
+
+User = get_user_model()
+
+WORDS = ('release', 'roadmap', 'backlog', 'design', 'review', 'bug', 'sprint', 'launch', 'meeting', 'draft',
+         'budget', 'report', 'client', 'api', 'mobile', 'search', 'invoice', 'deploy', 'test', 'docs',
+         'onboarding', 'marketing', 'feedback', 'metrics', 'migration', 'security', 'hiring', 'support')
+COLORS = ('#61bd4f', '#f2d600', '#ff9f1a', '#eb5a46', '#c377e0', '#0079bf', '#00c2e0', '#51e898')
+COLUMN_TITLES = ('To do', 'Doing', 'Review', 'Done', 'Ideas', 'Blocked', 'Backlog', 'Archive')
+# Largest draw of skewed(), as a multiple of the mean, so one board cannot swallow the whole run.
+SKEW_CAP = 50
+# Batches of cards written per transaction, which bounds the rows held in memory at once.
+CHUNK_BATCHES = 10
+
+
+def get_background():
+    """Encodes the single background every generated board shares."""
+    image_output = BytesIO()
+    Image.new('RGB', (320, 180), '#0079bf').save(image_output, 'JPEG', quality=70)
+    return image_output.getvalue()
+
+
+class DatasetGenerator:
+    """
+    Bulk-creates a realistic, reproducible dataset for load testing.
+
+    Sizes follow Pareto distributions around the given means, so most boards
+    are small and a few are huge, and a few users own and join most of the
+    projects and boards. The same seed and options give the same rows.
+
+    Rows are written with bulk_create in batches of `batch_size`, one
+    transaction per chunk of projects, and indexed for search as they are
+    written. Users share one password hash and boards one background image,
+    stored once with a reference per board.
+    """
+
+    def __init__(self, users=1000, projects=500, boards=4, columns=5, cards=100, comments=2, marks=6, members=4,
+                 card_marks=1, skew=1.5, seed=0, batch_size=2000, email_prefix='load', password='password',
+                 log=None):
+        self.users, self.projects = users, projects
+        self.means = {'boards': boards, 'columns': columns, 'cards': cards, 'comments': comments, 'marks': marks,
+                      'members': members, 'card_marks': card_marks}
+        self.skew = skew
+        self.batch_size = batch_size
+        self.email_prefix = email_prefix
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.rows = Counter()
+
+    def skewed(self, name):
+        """Draws a count with the mean of `name` from a Pareto distribution of shape `skew`."""
+        mean = self.means[name]
+        if not mean:
+            return 0
+        value = mean * (self.skew - 1) / self.skew * self.random.paretovariate(self.skew)
+        return min(int(value), mean * SKEW_CAP)
+
+    def pick_users(self, count, exclude=None):
+        """Picks up to `count` distinct users, the first ones generated far more often than the rest."""
+        picked = set()
+        for _ in range(count * 3):
+            if len(picked) >= count:
+                break
+            user_id = self.user_ids[bisect.bisect(self.user_weights, self.random.random() * self.user_weights[-1])]
+            if user_id != exclude:
+                picked.add(user_id)
+        return sorted(picked)
+
+    def words(self, low, high):
+        return ' '.join(self.random.choices(WORDS, k=self.random.randint(low, high)))
+
+    def bulk_create(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.rows[model.__name__] += len(created)
+        return created
+
+    def run(self):
+        """Generates the dataset, returns the rows created by model and the seconds it took."""
+        start = time.perf_counter()
+        self.create_users()
+        storage = get_media_storage()
+        self.background = storage.save('back_img/dataset.jpg', ContentFile(get_background()))
+
+        # Enough projects per transaction for about CHUNK_BATCHES batches of cards.
+        chunk_size = max(1, CHUNK_BATCHES * self.batch_size // max(1, self.means['boards'] * self.means['cards']))
+        done = 0
+        while done < self.projects:
+            count = min(chunk_size, self.projects - done)
+            with transaction.atomic():
+                self.create_projects(count)
+            done += count
+            self.log(f'{done}/{self.projects} projects, {sum(self.rows.values())} rows')
+
+        # save() counted one reference, every board holds one.
+        if self.rows['Board']:
+            MediaBlob.objects.filter(name=self.background).update(refs=F('refs') + self.rows['Board'] - 1)
+        else:
+            storage.delete(self.background)
+        return self.rows, time.perf_counter() - start
+
+    def create_users(self):
+        password = make_password(self.password)
+        users = self.bulk_create(User, [
+            User(email=f'{self.email_prefix}{i}@example.com', password=password, first_name=self.words(1, 1).title(),
+                 last_name=f'User {i}')
+            for i in range(self.users)
+        ])
+        self.user_ids = [user.pk for user in users]
+        # Zipf weights: the n-th user is picked about 1/n as often as the first.
+        self.user_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(users))))
+
+    def create_projects(self, count):
+        projects = self.bulk_create(Project, [
+            Project(title=self.words(1, 3)[:50], owner_id=self.pick_users(1)[0]) for _ in range(count)
+        ])
+        boards = self.bulk_create(Board, [
+            Board(project=project, title=self.words(1, 4)[:50], background_img=self.background)
+            for project in projects for _ in range(max(1, self.skewed('boards')))
+        ])
+        owners = {project.pk: project.owner_id for project in projects}
+        members = self.bulk_create(BoardMember, [
+            BoardMember(board=board, user_id=user_id) for board in boards
+            for user_id in [owners[board.project_id],
+                            *self.pick_users(self.skewed('members'), exclude=owners[board.project_id])]
+        ])
+        board_members = {}
+        for member in members:
+            board_members.setdefault(member.board_id, []).append(member.user_id)
+        marks = self.bulk_create(Mark, [
+            Mark(board=board, title=self.words(1, 1), color=self.random.choice(COLORS))
+            for board in boards for _ in range(self.skewed('marks'))
+        ])
+        board_marks = {}
+        for mark in marks:
+            board_marks.setdefault(mark.board_id, []).append(mark)
+
+        columns, column_cards = [], []
+        for board in boards:
+            board_columns = [Column(board=board, title=COLUMN_TITLES[i % len(COLUMN_TITLES)], rank=rank)
+                             for i, rank in enumerate(spread_ranks(max(1, self.skewed('columns'))))]
+            # Cards pile up in some columns more than others.
+            weights = [self.random.random() for _ in board_columns]
+            sizes = Counter(self.random.choices(range(len(board_columns)), weights, k=self.skewed('cards')))
+            columns += board_columns
+            column_cards += [sizes[i] for i in range(len(board_columns))]
+        columns = self.bulk_create(Column, columns)
+
+        cards = []
+        for column, count in zip(columns, column_cards):
+            for rank in spread_ranks(count) if count else ():
+                checklist = None
+                if self.random.random() < 0.3:
+                    checklist = {self.words(2, 4): self.random.random() < 0.5
+                                 for _ in range(self.random.randint(1, 5))}
+                cards.append(Card(column=column, title=self.words(1, 4)[:30], description=self.words(0, 60)[:500],
+                                  deadline=self.now + timedelta(days=self.random.randint(-30, 90)),
+                                  checklist=checklist, rank=rank))
+        cards = self.bulk_create(Card, cards)
+        comments = self.bulk_create(CardComment, [
+            CardComment(card=card, user_id=self.random.choice(board_members[card.column.board_id]),
+                        body=self.words(1, 40)[:300])
+            for card in cards for _ in range(self.skewed('comments'))
+        ])
+        self.bulk_create(CardMark, [
+            CardMark(card=card, mark=mark) for card in cards
+            for mark in self.random.sample(board_marks.get(card.column.board_id, []),
+                                           min(len(board_marks.get(card.column.board_id, [])),
+                                               self.skewed('card_marks')))
+        ])
+
+        # Bulk inserts skip the signals keeping the search index up to date.
+        search = get_search_backend()
+        for instances in (boards, marks, cards, comments):
+            search.update(instances)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Board, BoardChange
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+_feeds = weakref.WeakKeyDictionary()
+
+
+class Broker:
+    """
+    Carries "board changed" notifications from the processes writing boards to the ones streaming them.
+
+    publish() is called once a write is committed and the callbacks given to
+    subscribe() may be called from any thread. The changes themselves are
+    read from the journal, so a notification only has to name the board.
+    """
+
+    def publish(self, board_id):
+        raise NotImplementedError
+
+    def subscribe(self, board_id, callback):
+        raise NotImplementedError
+
+    def unsubscribe(self, board_id, callback):
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """Notifies the subscribers of the current process only. Feeds poll for writes made by other processes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}
+
+    def publish(self, board_id):
+        with self._lock:
+            callbacks = list(self._callbacks.get(board_id, ()))
+        for callback in callbacks:
+            callback()
+
+    def subscribe(self, board_id, callback):
+        with self._lock:
+            self._callbacks.setdefault(board_id, set()).add(callback)
+
+    def unsubscribe(self, board_id, callback):
+        with self._lock:
+            callbacks = self._callbacks.get(board_id, set())
+            callbacks.discard(callback)
+            if not callbacks:
+                self._callbacks.pop(board_id, None)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.BOARD_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_change(board_id):
+    """Notifies the subscribers of the board once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(board_id))
+
+
+def get_changes(board_id, since, limit, known_version=None):
+    """
+    Returns up to `limit` journal entries of a board after `since` and the board version.
+
+    The entries are None if some of them were compacted or the board is gone.
+    Nothing is read from the journal while the version is `known_version`.
+    """
+    board = Board.objects.filter(pk=board_id).values('version', 'journal_start').first()
+    if board is None or since < board['journal_start']:
+        return None, board and board['version']
+    if board['version'] == known_version:
+        return [], known_version
+
+    changes = BoardChange.objects.filter(board=board_id, seq__gt=since).order_by('seq')
+    changes = list(changes.values('seq', 'model', 'object_id', 'action', 'data')[:limit])
+    for change in changes:
+        change['id'] = change.pop('object_id')
+    return changes, board['version']
+
+
+def get_version(board_id):
+    return Board.objects.filter(pk=board_id).values_list('version', flat=True).first()
+
+
+async def wait_for(awaitable, timeout):
+    """
+    asyncio.wait_for() that never swallows a cancellation coming in together with the result.
+
+    Python 3.11 can lose the cancellation of a stream in that case, which
+    keeps the stream waiting for changes after the client went away.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, pending = await asyncio.wait({task}, timeout=timeout)
+    finally:
+        task.cancel()
+    if not done:
+        raise asyncio.TimeoutError
+    return task.result()
+
+
+class ResyncRequired(Exception):
+    """The subscriber missed changes that are no longer available and has to reload the board."""
+
+
+class BoardFeed:
+    """
+    Fans the journal of one board out to the subscribers of one event loop.
+
+    A broker notification, or the poll interval passing, makes the feed read
+    the new entries once and queue them for every subscriber, so the database
+    sees one query per board and not one per connection. Subscribers too slow
+    to drain their queue are dropped and asked to resync.
+    """
+
+    def __init__(self, board_id, seq, feeds):
+        self.board_id = board_id
+        self.seq = self.version = seq
+        self.feeds = feeds
+        self.queues = set()
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def join(self):
+        queue = asyncio.Queue(maxsize=settings.BOARD_EVENTS_QUEUE_SIZE)
+        self.queues.add(queue)
+        if self.task is None:
+            get_broker().subscribe(self.board_id, self.notify)
+            self.task = self.loop.create_task(self.run())
+        return queue
+
+    def leave(self, queue):
+        self.queues.discard(queue)
+        if not self.queues and self.task is not None:
+            self.task.cancel()
+            get_broker().unsubscribe(self.board_id, self.notify)
+            if self.feeds.get(self.board_id) is self:
+                del self.feeds[self.board_id]
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        except RuntimeError:
+            # The loop was closed under the subscribers.
+            pass
+
+    async def run(self):
+        while True:
+            try:
+                await wait_for(self.wakeup.wait(), settings.BOARD_EVENTS_POLL_INTERVAL)
+                notified = True
+            except asyncio.TimeoutError:
+                notified = False
+            self.wakeup.clear()
+            try:
+                await self.refresh(notified)
+            except Exception:
+                logger.exception('Could not read the changes of board %s', self.board_id)
+
+    async def refresh(self, notified):
+        limit = settings.BOARD_EVENTS_QUEUE_SIZE
+        while True:
+            changes, self.version = await sync_to_async(get_changes)(self.board_id, self.seq, limit,
+                                                                     None if notified else self.version)
+            if changes is None:
+                self.publish(None)
+                self.seq = self.version or self.seq
+                return
+            for change in changes:
+                self.publish(change)
+            if len(changes) < limit:
+                return
+            self.seq = changes[-1]['seq']
+
+    def publish(self, change):
+        if change is not None:
+            self.seq = change['seq']
+        for queue in list(self.queues):
+            if queue.full() or change is None:
+                # The subscriber reloads the board, what is still queued is stale.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self.queues.discard(queue)
+            else:
+                queue.put_nowait(change)
+
+
+async def get_feed(board_id):
+    feeds = _feeds.setdefault(asyncio.get_running_loop(), {})
+    if board_id not in feeds:
+        version = await sync_to_async(get_version)(board_id)
+        # Another subscriber may have started the feed in the meantime.
+        if board_id not in feeds:
+            feeds[board_id] = BoardFeed(board_id, version or 0, feeds)
+    return feeds[board_id]
+
+
+class Subscription:
+    """
+    Receives the changes made to a board after `since`, or after subscribing without it.
+
+    Used as an async context manager; get() raises ResyncRequired when the
+    changes since the last one received can no longer be delivered.
+    """
+
+    def __init__(self, board_id, since=None):
+        self.board_id = board_id
+        self.seq = since
+        self.backlog = deque()
+
+    async def __aenter__(self):
+        self.feed = await get_feed(self.board_id)
+        self.queue = self.feed.join()
+        if self.seq is None:
+            self.seq = self.feed.seq
+        elif self.seq < self.feed.seq:
+            limit = settings.BOARD_EVENTS_QUEUE_SIZE
+            changes, version = await sync_to_async(get_changes)(self.board_id, self.seq, limit)
+            self.backlog.extend(changes or ())
+            if changes is None or len(changes) == limit:
+                self.backlog.append(None)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.feed.leave(self.queue)
+
+    async def get(self, timeout=None):
+        """Returns the next change, or None if none came in `timeout` seconds."""
+        while True:
+            if self.backlog:
+                change = self.backlog.popleft()
+            else:
+                try:
+                    change = await wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+            if change is None:
+                raise ResyncRequired
+            # The backlog and the feed may both carry the changes made while subscribing.
+            if change['seq'] > self.seq:
+                self.seq = change['seq']
+                return change
@@ -0,0 +1,127 @@
+import json
+import logging
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Board, BoardMember, Column, Card, CardComment, CardFile, Mark, CardMark
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = 'zeon-trello-export'
+EXPORT_VERSION = 1
+CHUNK_SIZE = 2000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# (file name, model, lookup from the model to its board, fields, renamed fields)
+TABLES = (
+    ('boards.ndjson', Board, 'id', ('id', 'project', 'title', 'background_img', 'is_archived',
+                                    'created_on', 'last_modified'), {}),
+    ('members.ndjson', BoardMember, 'board', ('board', 'user'), {'email': 'user__email'}),
+    ('marks.ndjson', Mark, 'board', ('id', 'board', 'title', 'color'), {}),
+    ('columns.ndjson', Column, 'board', ('id', 'board', 'title', 'rank'), {}),
+    ('cards.ndjson', Card, 'column__board', ('id', 'column', 'title', 'description', 'deadline', 'checklist',
+                                             'rank'), {}),
+    ('card_marks.ndjson', CardMark, 'card__column__board', ('card', 'mark'), {}),
+    ('comments.ndjson', CardComment, 'card__column__board', ('id', 'card', 'user', 'body', 'created_on'),
+     {'email': 'user__email'}),
+    ('files.ndjson', CardFile, 'card__column__board', ('id', 'card', 'file', 'name'), {}),
+)
+
+# (model, lookup from the model to its board, file field) of the media copied into the archive.
+MEDIA = (
+    (Board, 'id', 'background_img'),
+    (CardFile, 'card__column__board', 'file'),
+)
+
+
+class StreamBuffer:
+    """Write-only file collecting what ZipFile writes until the stream takes it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def encode(row):
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b'\n'
+
+
+def get_rows(model, board_lookup, boards, fields, renamed):
+    rows = model.objects.filter(**{f'{board_lookup}__in': boards}).order_by('id')
+    rows = rows.values(*fields, **{name: F(lookup) for name, lookup in renamed.items()})
+    return rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def get_media_names(boards):
+    for model, board_lookup, field in MEDIA:
+        rows = model.objects.filter(**{f'{board_lookup}__in': boards}).exclude(**{field: ''}).order_by('id')
+        yield from rows.values_list(field, flat=True).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_export(manifest, boards, media=True):
+    """
+    Yields a zip archive of `boards` and everything on them, a chunk at a time.
+
+    Every table is written as an NDJSON file from a chunked query, and the
+    media the rows refer to is copied under media/ by storage chunks, so
+    memory does not grow with the size of the export.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('manifest.json', json.dumps({
+            'format': EXPORT_FORMAT, 'version': EXPORT_VERSION, 'exported_on': timezone.now(), **manifest,
+        }, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+        yield buffer.take()
+
+        for name, model, board_lookup, fields, renamed in TABLES:
+            with archive.open(name, 'w', force_zip64=True) as file:
+                for row in get_rows(model, board_lookup, boards, fields, renamed):
+                    file.write(encode(row))
+                    if buffer.size >= STREAM_CHUNK_SIZE:
+                        yield buffer.take()
+            yield buffer.take()
+
+        if media:
+            written = set()
+            for name in get_media_names(boards):
+                if name in written:
+                    continue
+                written.add(name)
+                try:
+                    source = default_storage.open(name)
+                except OSError:
+                    logger.warning('Could not export missing media file %s', name)
+                    continue
+                with source, archive.open(f'media/{name}', 'w', force_zip64=True) as file:
+                    for chunk in source.chunks():
+                        file.write(chunk)
+                        yield buffer.take()
+                yield buffer.take()
+    yield buffer.take()
+
+
+def export_project(project, media=True):
+    manifest = {'project': {'id': project.pk, 'title': project.title}}
+    return stream_export(manifest, Board.objects.filter(project=project).values('id'), media)
+
+
+def export_board(board, media=True):
+    manifest = {'project': None, 'board': {'id': board.pk, 'title': board.title}}
+    return stream_export(manifest, Board.objects.filter(pk=board.pk).values('id'), media)
@@ -0,0 +1,232 @@
+import base64
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from trello.metrics import IMAGE_COMPRESSIONS, UPLOADS
+
+logger = logging.getLogger(__name__)
+
+# Width of the blurred preview inlined in pages and API responses while the background loads.
+PLACEHOLDER_WIDTH = 16
+
+_process_pool = None
+_thread_pool = None
+_slots = None
+
+
+def open_image(content):
+    image = Image.open(BytesIO(content))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def compress_image(content):
+    """Re-encodes raw image bytes as an optimized JPEG. Runs inside a worker process."""
+    image = open_image(content)
+    image_output = BytesIO()
+    image.save(image_output,
+               "JPEG",
+               optimize=True,
+               quality=30)
+    return image_output.getvalue()
+
+
+def render_variants(content, widths):
+    """
+    Renders raw image bytes as WebP at each of `widths` and as an inline placeholder. Runs inside a worker process.
+
+    Images are never upscaled: widths past the image width are replaced by
+    the image width itself. Returns `[(width, webp bytes)]` and the
+    placeholder as a data URI.
+    """
+    image = open_image(content)
+    variants = []
+    for width in sorted({min(width, image.width) for width in widths}):
+        resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        image_output = BytesIO()
+        resized.save(image_output, 'WEBP', quality=60, method=4)
+        variants.append((width, image_output.getvalue()))
+
+    preview = image.resize((PLACEHOLDER_WIDTH, max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))),
+                           Image.BILINEAR)
+    image_output = BytesIO()
+    preview.save(image_output, 'WEBP', quality=30)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(image_output.getvalue()).decode()
+    return variants, placeholder
+
+
+def process_background(content, widths):
+    """compress_image() and render_variants() of one upload in a single trip to the worker process."""
+    return compress_image(content), *render_variants(content, widths)
+
+
+def get_process_pool():
+    # Started from pool threads: forking a process with threads running can deadlock the children.
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.BOARD_IMAGE_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+
+def get_thread_pool():
+    # Threads only wait on the process pool and do the storage and database I/O.
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=settings.BOARD_IMAGE_WORKERS,
+                                          thread_name_prefix='board-images')
+    return _thread_pool
+
+
+def get_slots():
+    global _slots
+    if _slots is None:
+        _slots = threading.BoundedSemaphore(settings.BOARD_IMAGE_QUEUE_SIZE)
+    return _slots
+
+
+def schedule_background_compression(board):
+    """
+    Compresses the board background off the request once the upload is committed.
+
+    The board keeps pointing at the original upload, with a pending status,
+    until the optimized version and its WebP variants have been stored.
+    """
+    board_id = board.pk
+    UPLOADS.inc(kind='board_background')
+    transaction.on_commit(lambda: submit_compression(board_id))
+
+
+def submit_compression(board_id):
+    """Queues the compression in this process unless BOARD_IMAGE_QUEUE_SIZE are queued already."""
+    slots = get_slots()
+    if not slots.acquire(blocking=False):
+        logger.warning('Too many background compressions queued, board %s is left pending', board_id)
+        IMAGE_COMPRESSIONS.inc(task='compress', result='deferred')
+        return False
+    get_thread_pool().submit(_run_compression, board_id).add_done_callback(lambda future: slots.release())
+    return True
+
+
+def _run_compression(board_id):
+    try:
+        compress_board_background(board_id)
+    finally:
+        connection.close()
+
+
+def get_orphaned_backgrounds():
+    """
+    Boards still pending BOARD_IMAGE_PENDING_MINUTES after their background was queued.
+
+    Their compression was left out of a full queue or died with the process
+    running it, and will not happen unless it is started again.
+    """
+    from .models import Board
+
+    before = timezone.now() - timedelta(minutes=settings.BOARD_IMAGE_PENDING_MINUTES)
+    return Board.objects.filter(background_status=Board.BackgroundStatus.PENDING, background_queued_on__lt=before)
+
+
+def save_variants(storage, name, variants):
+    """Stores the variants next to `name`, returns their names by width. None are kept if one fails."""
+    stem = os.path.splitext(name)[0]
+    names = {}
+    try:
+        for width, content in variants:
+            names[str(width)] = storage.save(f'{stem}_{width}w.webp', ContentFile(content))
+    except Exception:
+        for variant in names.values():
+            storage.delete(variant)
+        raise
+    return names
+
+
+def compress_board_background(board_id):
+    from .models import Board, BoardChange
+    from .changes import record_change
+
+    board = Board.objects.get(pk=board_id)
+    original = board.background_img.name
+    pending = Board.objects.filter(pk=board_id, background_img=original)
+    storage = board.background_img.storage
+    stale = list(board.background_variants.values())
+
+    name = None
+    try:
+        with storage.open(original, 'rb') as image_file:
+            content = image_file.read()
+        compressed, variants, placeholder = get_process_pool().submit(
+            process_background, content, settings.BOARD_IMAGE_WIDTHS).result()
+        name = storage.save(os.path.splitext(original)[0] + '.jpg', ContentFile(compressed))
+        variants = save_variants(storage, name, variants)
+    except Exception:
+        logger.exception('Could not compress the background of board %s', board_id)
+        IMAGE_COMPRESSIONS.inc(task='compress', result='failed')
+        if name is not None:
+            storage.delete(name)
+        # The variants are of the previous background, which the original upload replaced.
+        if pending.update(background_status=Board.BackgroundStatus.FAILED, background_variants={},
+                          background_placeholder=''):
+            board.background_status = Board.BackgroundStatus.FAILED
+            board.background_variants, board.background_placeholder = {}, ''
+            record_change(board_id, board, BoardChange.Action.UPDATED)
+            for stale_name in stale:
+                storage.delete(stale_name)
+        return
+
+    IMAGE_COMPRESSIONS.inc(task='compress', result='ready')
+    # A newer upload wins over this one.
+    if pending.update(background_img=name, background_status=Board.BackgroundStatus.READY,
+                      background_variants=variants, background_placeholder=placeholder):
+        board.background_img, board.background_status = name, Board.BackgroundStatus.READY
+        board.background_variants, board.background_placeholder = variants, placeholder
+        record_change(board_id, board, BoardChange.Action.UPDATED)
+        # Drops the reference of the upload, even when it compressed to the very same content.
+        storage.delete(original)
+        for stale_name in stale:
+            storage.delete(stale_name)
+    else:
+        for new_name in (name, *variants.values()):
+            storage.delete(new_name)
+
+
+def render_board_variants(board_id):
+    """
+    Renders the WebP variants of a background compressed before they existed, returns whether it did.
+
+    The stored JPEG is used as is, only boards without variants are updated.
+    """
+    from .models import Board, BoardChange
+    from .changes import record_change
+
+    board = Board.objects.get(pk=board_id)
+    storage = board.background_img.storage
+    with storage.open(board.background_img.name, 'rb') as image_file:
+        content = image_file.read()
+    variants, placeholder = get_process_pool().submit(render_variants, content, settings.BOARD_IMAGE_WIDTHS).result()
+    variants = save_variants(storage, board.background_img.name, variants)
+    IMAGE_COMPRESSIONS.inc(task='variants', result='ready')
+
+    if Board.objects.filter(pk=board_id, background_img=board.background_img.name,
+                            background_status=Board.BackgroundStatus.READY, background_variants={}).update(
+            background_variants=variants, background_placeholder=placeholder):
+        # Journaled like any other update, so delta clients pick up the new background URLs.
+        board.background_variants, board.background_placeholder = variants, placeholder
+        record_change(board_id, board, BoardChange.Action.UPDATED)
+        return True
+    for name in variants.values():
+        storage.delete(name)
+    return False
@@ -0,0 +1,403 @@
+import json
+import logging
+import os
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .access import invalidate_user_access
+from .changes import record_changes, touch_boards
+from .export import EXPORT_FORMAT
+from .images import schedule_background_compression
+from .models import (Project, Board, BoardChange, BoardMember, Column, Card, CardComment, CardFile, Mark,
+                     CardMark, ImportJob, ImportedRow)
+from .ranks import spread_ranks
+from .search import get_backend as get_search_backend
+from .storage import get_media_storage
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# A running job that has not written a batch for this long is taken to have died with its process.
+STALE_AFTER = timedelta(minutes=5)
+
+TRELLO_COLORS = {
+    'green': '#61bd4f', 'yellow': '#f2d600', 'orange': '#ff9f1a', 'red': '#eb5a46', 'purple': '#c377e0',
+    'blue': '#0079bf', 'sky': '#00c2e0', 'lime': '#51e898', 'pink': '#ff78cb', 'black': '#344563',
+}
+
+_executor = None
+
+
+def clip(model, field, value):
+    return (value or '')[:model._meta.get_field(field).max_length]
+
+
+def parse_date(value):
+    return (parse_datetime(value) if value else None) or timezone.now()
+
+
+class ExportReader:
+    """Reads an archive written by boards.export, one NDJSON line at a time."""
+
+    # (file name, model, fields making up the source id)
+    tables = (
+        ('boards.ndjson', 'board', ('id',)),
+        ('members.ndjson', 'member', ('board', 'user')),
+        ('marks.ndjson', 'mark', ('id',)),
+        ('columns.ndjson', 'column', ('id',)),
+        ('cards.ndjson', 'card', ('id',)),
+        ('card_marks.ndjson', 'cardmark', ('card', 'mark')),
+        ('comments.ndjson', 'comment', ('id',)),
+        ('files.ndjson', 'file', ('id',)),
+    )
+
+    def __init__(self, file):
+        self.archive = zipfile.ZipFile(file)
+        manifest = json.loads(self.archive.read('manifest.json'))
+        if manifest.get('format') != EXPORT_FORMAT:
+            raise ValueError('Not an export archive')
+        self.title = (manifest.get('project') or manifest.get('board'))['title']
+
+    def read(self):
+        names = set(self.archive.namelist())
+        for name, model, key in self.tables:
+            if name not in names:
+                continue
+            with self.archive.open(name) as lines:
+                for line in lines:
+                    row = json.loads(line)
+                    yield model, ':'.join(str(row[field]) for field in key), row
+
+    def open_media(self, name):
+        try:
+            return self.archive.open(f'media/{name}')
+        except KeyError:
+            return None
+
+
+class TrelloReader:
+    """
+    Reads the JSON export of a Trello board.
+
+    Trello exports a board as a single JSON document, which is loaded at
+    once; the rows are then handed out in the same order as an archive's.
+    """
+
+    def __init__(self, file):
+        self.board = json.load(file)
+        if not isinstance(self.board, dict) or 'lists' not in self.board:
+            raise ValueError('Not a Trello board export')
+        self.title = self.board.get('name', '')
+
+    def read(self):
+        board = self.board
+        yield 'board', board['id'], {
+            'title': board.get('name'), 'is_archived': board.get('closed', False),
+            'color': board.get('prefs', {}).get('backgroundColor'),
+        }
+        for label in board.get('labels', ()):
+            yield 'mark', label['id'], {
+                'board': board['id'], 'title': label.get('name') or label.get('color') or '',
+                'color': TRELLO_COLORS.get((label.get('color') or '').split('_')[0], '#000'),
+            }
+
+        lists = sorted(board.get('lists', ()), key=lambda row: row.get('pos', 0))
+        for row, rank in zip(lists, spread_ranks(len(lists))):
+            yield 'column', row['id'], {'board': board['id'], 'title': row.get('name'), 'rank': rank}
+
+        checklists = defaultdict(dict)
+        for checklist in board.get('checklists', ()):
+            for item in checklist.get('checkItems', ()):
+                checklists[checklist['idCard']][item['name']] = item.get('state') == 'complete'
+        cards = defaultdict(list)
+        for card in board.get('cards', ()):
+            cards[card['idList']].append(card)
+        for rows in cards.values():
+            rows.sort(key=lambda row: row.get('pos', 0))
+            for card, rank in zip(rows, spread_ranks(len(rows))):
+                yield 'card', card['id'], {
+                    'column': card['idList'], 'title': card.get('name'), 'description': card.get('desc'),
+                    'deadline': card.get('due') or card.get('dateLastActivity'),
+                    'checklist': checklists.get(card['id'], {}), 'rank': rank,
+                }
+        for card in board.get('cards', ()):
+            for label_id in card.get('idLabels', ()):
+                yield 'cardmark', f'{card["id"]}:{label_id}', {'card': card['id'], 'mark': label_id}
+
+        # Actions come newest first.
+        for action in reversed(board.get('actions', ())):
+            if action.get('type') == 'commentCard':
+                data = action.get('data', {})
+                yield 'comment', action['id'], {'card': data.get('card', {}).get('id'), 'body': data.get('text')}
+
+    def open_media(self, name):
+        return None
+
+
+def get_reader(file):
+    if zipfile.is_zipfile(file):
+        file.seek(0)
+        return ExportReader(file)
+    file.seek(0)
+    return TrelloReader(file)
+
+
+def get_placeholder(color):
+    """Stores a plain background in `color` for boards imported without an image."""
+    image_output = BytesIO()
+    try:
+        Image.new('RGB', (160, 90), color or '#0079bf').save(image_output, 'JPEG')
+    except ValueError:
+        Image.new('RGB', (160, 90), '#0079bf').save(image_output, 'JPEG')
+    return get_media_storage().save('back_img/imported.jpg', ContentFile(image_output.getvalue()))
+
+
+class Importer:
+    """
+    Writes the rows of a reader into the project of an import job.
+
+    Rows are inserted with bulk_create in batches of BOARD_IMPORT_BATCH_SIZE
+    rows of one model, in the order the reader gives them. Every batch
+    commits together with the ImportedRow entries mapping its source ids
+    to the new ids, so a job restarted after a crash skips what is already
+    in and never imports a row twice.
+    """
+
+    def __init__(self, job, reader):
+        self.job = job
+        self.reader = reader
+        self.ids = defaultdict(dict)
+        for model, source_id, object_id in job.imported_rows.values_list('model', 'source_id', 'object_id'):
+            self.ids[model][source_id] = object_id
+        self.users = {}
+        self.started = time.perf_counter()
+
+    def run(self):
+        model, batch = None, []
+        for record in self.reader.read():
+            if record[0] != model or len(batch) == settings.BOARD_IMPORT_BATCH_SIZE:
+                self.flush(model, batch)
+                model, batch = record[0], []
+            if record[1] not in self.ids[model]:
+                batch.append(record)
+        self.flush(model, batch)
+
+    def flush(self, model, batch):
+        if not batch:
+            return
+        emails = {data['email'] for _, _, data in batch if data.get('email')}
+        if emails:
+            self.users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+
+        with transaction.atomic():
+            build = getattr(self, f'build_{model}')
+            rows = [(source_id, instance) for _, source_id, data in batch
+                    if (instance := build(data)) is not None]
+            if rows:
+                instances = type(rows[0][1]).objects.bulk_create([instance for _, instance in rows])
+                ImportedRow.objects.bulk_create([
+                    ImportedRow(job=self.job, model=model, source_id=source_id, object_id=instance.pk)
+                    for (source_id, _), instance in zip(rows, instances)
+                ])
+                for (source_id, _), instance in zip(rows, instances):
+                    self.ids[model][source_id] = instance.pk
+                getattr(self, f'after_{model}', lambda instances: None)(instances)
+                self.index(instances)
+                self.journal(instances)
+
+            now = time.perf_counter()
+            ImportJob.objects.filter(pk=self.job.pk).update(rows=F('rows') + len(rows),
+                                                             seconds=F('seconds') + now - self.started,
+                                                             last_modified=timezone.now())
+            self.started = now
+
+    @staticmethod
+    def journal(instances):
+        # Bulk inserts skip the signals journaling board changes too, so delta clients would miss the rows.
+        model = type(instances[0])
+        if model is Board:
+            # New boards are only bumped, as when they are created through the API.
+            touch_boards(pk__in=[instance.pk for instance in instances])
+            return
+        if model is Card:
+            boards = dict(Column.objects.filter(pk__in={instance.column_id for instance in instances})
+                          .values_list('pk', 'board_id'))
+            get_board_id = lambda instance: boards[instance.column_id]
+        elif model in (CardMark, CardComment, CardFile):
+            boards = dict(Card.objects.filter(pk__in={instance.card_id for instance in instances})
+                          .values_list('pk', 'column__board_id'))
+            get_board_id = lambda instance: boards[instance.card_id]
+        else:
+            get_board_id = lambda instance: instance.board_id
+
+        changes = defaultdict(list)
+        for instance in instances:
+            changes[get_board_id(instance)].append((instance, BoardChange.Action.CREATED))
+        for board_id, board_changes in changes.items():
+            record_changes(board_id, board_changes)
+
+    @staticmethod
+    def index(instances):
+        # Bulk inserts skip the signals keeping the search index up to date.
+        related = {Card: ('column',), CardComment: ('card__column',), Board: (), Mark: ()}.get(type(instances[0]))
+        if related is not None:
+            model = type(instances[0])
+            get_search_backend().update(model.objects.filter(pk__in=[instance.pk for instance in instances])
+                                        .select_related(*related))
+
+    def build_board(self, data):
+        name, status = data.get('background_img'), Board.BackgroundStatus.READY
+        media = name and self.reader.open_media(name)
+        if media:
+            with media:
+                name = get_media_storage().save(name, File(media, name=os.path.basename(name)))
+            status = Board.BackgroundStatus.PENDING
+        elif name and default_storage.exists(name):
+            name = get_media_storage().share(name)
+        else:
+            name = get_placeholder(data.get('color'))
+        return Board(project=self.job.project, title=clip(Board, 'title', data['title']),
+                     is_archived=bool(data.get('is_archived')), background_img=name, background_status=status,
+                     background_queued_on=timezone.now() if status == Board.BackgroundStatus.PENDING else None)
+
+    def after_board(self, boards):
+        # Whoever imports the boards is a member of them, like whoever creates one.
+        if self.job.owner_id:
+            BoardMember.objects.bulk_create([BoardMember(board=board, user_id=self.job.owner_id) for board in boards])
+            invalidate_user_access(self.job.owner_id)
+        for board in boards:
+            if board.background_status == Board.BackgroundStatus.PENDING:
+                schedule_background_compression(board)
+
+    def build_member(self, data):
+        board_id, user_id = self.ids['board'].get(str(data['board'])), self.users.get(data.get('email'))
+        if board_id and user_id and user_id != self.job.owner_id:
+            return BoardMember(board_id=board_id, user_id=user_id)
+        return None
+
+    def after_member(self, members):
+        invalidate_user_access(*(member.user_id for member in members))
+
+    def build_mark(self, data):
+        board_id = self.ids['board'].get(str(data['board']))
+        if board_id:
+            return Mark(board_id=board_id, title=clip(Mark, 'title', data['title']),
+                        color=clip(Mark, 'color', data.get('color')) or '#000')
+        return None
+
+    def build_column(self, data):
+        board_id = self.ids['board'].get(str(data['board']))
+        if board_id:
+            return Column(board_id=board_id, title=clip(Column, 'title', data['title']), rank=data.get('rank') or '')
+        return None
+
+    def build_card(self, data):
+        column_id = self.ids['column'].get(str(data['column']))
+        if column_id:
+            return Card(column_id=column_id, title=clip(Card, 'title', data['title']),
+                        description=clip(Card, 'description', data.get('description')),
+                        deadline=parse_date(data.get('deadline')), checklist=data.get('checklist'),
+                        rank=data.get('rank') or '')
+        return None
+
+    def build_cardmark(self, data):
+        card_id, mark_id = self.ids['card'].get(str(data['card'])), self.ids['mark'].get(str(data['mark']))
+        if card_id and mark_id:
+            return CardMark(card_id=card_id, mark_id=mark_id)
+        return None
+
+    def build_comment(self, data):
+        card_id = self.ids['card'].get(str(data['card']))
+        if card_id:
+            return CardComment(card_id=card_id, user_id=self.users.get(data.get('email')),
+                               body=clip(CardComment, 'body', data.get('body')))
+        return None
+
+    def build_file(self, data):
+        card_id, media = self.ids['card'].get(str(data['card'])), self.reader.open_media(data['file'])
+        if card_id and media:
+            with media:
+                name = get_media_storage().save(data['file'], File(media, name=os.path.basename(data['file'])))
+            return CardFile(card_id=card_id, file=name,
+                            name=clip(CardFile, 'name', data.get('name') or os.path.basename(data['file'])))
+        return None
+
+
+def run_import(job):
+    """Runs or resumes an import job, recording how it ended on the job."""
+    job.status, job.error = ImportJob.Status.RUNNING, ''
+    job.save(update_fields=['status', 'error', 'last_modified'])
+    try:
+        with job.source.open('rb') as source:
+            reader = get_reader(source)
+            if job.project is None:
+                with transaction.atomic():
+                    job.project = Project.objects.create(title=clip(Project, 'title', reader.title), owner=job.owner)
+                    job.save(update_fields=['project', 'last_modified'])
+                invalidate_user_access(job.owner_id)
+            Importer(job, reader).run()
+    except Exception as error:
+        logger.exception('Import job %s failed', job.pk)
+        job.status, job.error = ImportJob.Status.FAILED, str(error) or type(error).__name__
+    else:
+        job.status = ImportJob.Status.DONE
+    job.refresh_from_db(fields=['rows', 'seconds'])
+    job.save(update_fields=['status', 'error', 'last_modified'])
+    return job
+
+
+def restart_import(job):
+    """
+    Schedules a failed job, or one whose process died, to run again and returns whether it was.
+
+    The job is claimed with a conditional update, so of two concurrent
+    restarts only one schedules it.
+    """
+    if job.status == ImportJob.Status.FAILED:
+        restartable = True
+    else:
+        restartable = job.status != ImportJob.Status.DONE and job.last_modified < timezone.now() - STALE_AFTER
+    claimed = restartable and ImportJob.objects.filter(
+        pk=job.pk, status=job.status, last_modified=job.last_modified,
+    ).update(status=ImportJob.Status.PENDING, last_modified=timezone.now())
+    if claimed:
+        job.refresh_from_db()
+        schedule_import(job)
+    return bool(claimed)
+
+
+def schedule_import(job):
+    """Runs the job in the background once the current transaction commits."""
+    job_id = job.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run_import, job_id))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.BOARD_IMPORT_WORKERS, thread_name_prefix='board-imports')
+    return _executor
+
+
+def _run_import(job_id):
+    try:
+        run_import(ImportJob.objects.get(pk=job_id))
+    except Exception:
+        logger.exception('Could not run import job %s', job_id)
+    finally:
+        connection.close()
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from boards.uploads import clear_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Aborts the chunked card file uploads left idle, and deletes the parts they received.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CARD_FILE_UPLOAD_EXPIRY_HOURS,
+                            help='Abort the uploads nothing was sent to for this many hours')
+
+    def handle(self, *args, **options):
+        cleared = clear_stale_uploads(before=timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Aborted {cleared} uploads'))
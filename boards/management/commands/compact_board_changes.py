@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from boards.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Deletes old board change journal entries. Clients synced before them are asked to reload the board.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.BOARD_CHANGES_RETENTION_DAYS,
+                            help='Drop the entries older than this many days')
+        parser.add_argument('--keep', type=int, default=settings.BOARD_CHANGES_KEEP,
+                            help='Keep at most this many of the newest entries of each board')
+
+    def handle(self, *args, **options):
+        deleted = compact_changes(before=timezone.now() - timedelta(days=options['days']), keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} board changes'))
@@ -0,0 +1,72 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from boards.models import Board, CardFile
+from boards.storage import get_media_storage, is_content_addressed
+
+# (model, file field) of the media stored by content.
+FIELDS = (
+    (Board, 'background_img'),
+    (CardFile, 'file'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Moves media stored before it was content addressed into the deduplicated storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Leave the files that were moved in place')
+
+    def handle(self, *args, **options):
+        self.storage = get_media_storage()
+        # Name of every file moved so far, to the name of its content.
+        self.moved = {}
+        self.missing = set()
+        rows = 0
+
+        for model, field in FIELDS:
+            for pk, name in model.objects.exclude(**{field: ''}).values_list('pk', field).iterator():
+                if not is_content_addressed(name):
+                    rows += self.move(model.objects.filter(pk=pk, **{field: name}), field, name)
+
+        variants = Board.objects.exclude(background_variants={}).values_list('pk', 'background_variants')
+        for pk, old in variants.iterator():
+            new = {width: self.get_content_name(name) or name for width, name in old.items()}
+            if new != old and not Board.objects.filter(pk=pk, background_variants=old).update(background_variants=new):
+                for width, name in new.items():
+                    if name != old[width]:
+                        self.storage.delete(name)
+
+        if not options['keep_originals']:
+            for name in self.moved:
+                self.storage.backend.delete(name)
+
+        blobs = set(self.moved.values())
+        self.stdout.write(self.style.SUCCESS(f'Moved {len(self.moved)} files of {rows} rows into {len(blobs)} '
+                                             f'content addressed files, {len(self.missing)} were missing'))
+
+    def get_content_name(self, name):
+        """Stores the file under the name of its content, or adds a reference to it if it already was."""
+        if is_content_addressed(name) or name in self.missing:
+            return None
+        if name in self.moved:
+            return self.storage.share(self.moved[name])
+        try:
+            with self.storage.backend.open(name) as file:
+                self.moved[name] = self.storage.save(name, File(file, name))
+        except OSError:
+            self.stderr.write(f'Could not move missing media file {name}')
+            self.missing.add(name)
+            return None
+        return self.moved[name]
+
+    def move(self, rows, field, name):
+        new_name = self.get_content_name(name)
+        if not new_name:
+            return 0
+        # The row was changed in the meantime.
+        if not rows.update(**{field: new_name}):
+            self.storage.delete(new_name)
+            return 0
+        return 1
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.export import export_project, export_board
+from boards.models import Project, Board
+
+
+class Command(BaseCommand):
+    help = 'Writes a project or a board, with its media, to a zip of NDJSON files.'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--project', type=int, help='Id of the project to export')
+        target.add_argument('--board', type=int, help='Id of the board to export')
+        parser.add_argument('-o', '--output', default='-', help='Archive path, - writes to stdout')
+        parser.add_argument('--no-media', action='store_true', help='Leave the media files out')
+
+    def handle(self, *args, **options):
+        try:
+            if options['project']:
+                chunks = export_project(Project.objects.get(pk=options['project']), not options['no_media'])
+            else:
+                chunks = export_board(Board.objects.get(pk=options['board']), not options['no_media'])
+        except (Project.DoesNotExist, Board.DoesNotExist) as error:
+            raise CommandError(error)
+
+        start = time.perf_counter()
+        if options['output'] == '-':
+            size = self.write(sys.stdout.buffer, chunks)
+        else:
+            with open(options['output'], 'wb') as output:
+                size = self.write(output, chunks)
+
+        self.stderr.write(self.style.SUCCESS(f'Exported {size / 1024 / 1024:.1f}MiB '
+                                             f'in {time.perf_counter() - start:.1f}s'))
+
+    @staticmethod
+    def write(output, chunks):
+        size = 0
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+        return size
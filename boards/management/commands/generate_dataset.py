@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.dataset import DatasetGenerator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Generates a large, seeded dataset of users, projects, boards and their content for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--boards', type=int, default=4, help='Mean boards per project')
+        parser.add_argument('--columns', type=int, default=5, help='Mean columns per board')
+        parser.add_argument('--cards', type=int, default=100, help='Mean cards per board')
+        parser.add_argument('--comments', type=int, default=2, help='Mean comments per card')
+        parser.add_argument('--marks', type=int, default=6, help='Mean marks per board')
+        parser.add_argument('--card-marks', type=int, default=1, help='Mean marks per card')
+        parser.add_argument('--members', type=int, default=4, help='Mean members per board besides the owner')
+        parser.add_argument('--skew', type=float, default=1.5,
+                            help='Pareto shape of the sizes, lower is more skewed, must be above 1')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--email-prefix', default='load', help='Users are <prefix><n>@example.com')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        if options['skew'] <= 1:
+            raise CommandError('--skew must be above 1')
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+        if User.objects.filter(email__startswith=options['email_prefix'], email__endswith='@example.com').exists():
+            raise CommandError(f'There are users named {options["email_prefix"]}<n>@example.com already, '
+                               f'pick another --email-prefix')
+
+        generator = DatasetGenerator(
+            users=options['users'], projects=options['projects'], boards=options['boards'],
+            columns=options['columns'], cards=options['cards'], comments=options['comments'],
+            marks=options['marks'], members=options['members'], card_marks=options['card_marks'],
+            skew=options['skew'], seed=options['seed'], batch_size=options['batch_size'],
+            email_prefix=options['email_prefix'], password=options['password'], log=self.stderr.write,
+        )
+        rows, seconds = generator.run()
+        total = sum(rows.values())
+        for model, count in rows.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Generated {total} rows in {seconds:.1f}s, '
+                                             f'{round(total / seconds * 60) if seconds else total} rows/min'))
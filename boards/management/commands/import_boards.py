@@ -0,0 +1,50 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from boards.imports import run_import
+from boards.models import Project, ImportJob
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports a Trello board JSON export or an export archive, or resumes an import job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', help='Path of the Trello JSON or export zip to import')
+        parser.add_argument('--user', help='Email of the user owning the imported boards')
+        parser.add_argument('--project', type=int, help='Id of a project of the user to import into')
+        parser.add_argument('--resume', type=int, metavar='JOB', help='Id of an interrupted import job to resume')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = ImportJob.objects.filter(pk=options['resume']).first()
+            if job is None:
+                raise CommandError(f'Import job {options["resume"]} does not exist')
+        else:
+            job = self.create_job(options)
+        self.stderr.write(f'Import job {job.pk}')
+
+        job = run_import(job)
+        if job.status == ImportJob.Status.FAILED:
+            raise CommandError(f'Import job {job.pk} failed after {job.rows} rows: {job.error}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {job.rows} rows into project {job.project_id} '
+                                             f'in {job.seconds:.1f}s, {job.rows_per_second} rows/s'))
+
+    @staticmethod
+    def create_job(options):
+        if not options['source'] or not options['user']:
+            raise CommandError('A source and --user are needed to start an import')
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f'There is no user {options["user"]}')
+        if options['project'] and not Project.objects.filter(pk=options['project'], owner=user).exists():
+            raise CommandError(f'{user.email} owns no project {options["project"]}')
+
+        job = ImportJob(owner=user, project_id=options['project'])
+        with open(options['source'], 'rb') as source:
+            job.source.save(os.path.basename(options['source']), File(source))
+        return job
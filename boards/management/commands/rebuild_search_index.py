@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from boards.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Reindexes every board, card, comment and label for search.'
+
+    def handle(self, *args, **options):
+        indexed = get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} rows'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from boards.images import compress_board_background, get_orphaned_backgrounds, render_board_variants
+from boards.models import Board
+
+
+class Command(BaseCommand):
+    help = ('Compresses the board backgrounds left pending by a full queue or a worker that died, and renders '
+            'the WebP variants and placeholders of backgrounds compressed before they existed. Meant to run '
+            'periodically.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Compress the backgrounds that failed to compress again as well')
+
+    def handle(self, *args, **options):
+        boards = get_orphaned_backgrounds()
+        if options['retry_failed']:
+            boards |= Board.objects.filter(background_status=Board.BackgroundStatus.FAILED)
+        compressed = 0
+        for board_id in boards.values_list('id', flat=True).iterator():
+            compress_board_background(board_id)
+            compressed += Board.objects.filter(pk=board_id, background_status=Board.BackgroundStatus.READY).exists()
+
+        boards = Board.objects.filter(background_status=Board.BackgroundStatus.READY, background_variants={})
+        rendered = failed = 0
+        for board_id in boards.values_list('id', flat=True).iterator():
+            try:
+                rendered += render_board_variants(board_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Could not render the background of board {board_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Compressed the backgrounds of {compressed} boards, '
+                                             f'rendered the backgrounds of {rendered} boards, {failed} failed'))
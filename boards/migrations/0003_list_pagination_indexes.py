@@ -0,0 +1,45 @@
+# Generated by Django 4.1.3 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0002_alter_board_project_alter_boardfavourite_board_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='board',
+            index=models.Index(fields=['project', 'id'], name='board_project_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boardfavourite',
+            index=models.Index(fields=['user', 'id'], name='boardfavourite_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boardlastseen',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='boardlastseen_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boardmember',
+            index=models.Index(fields=['user', 'id'], name='boardmember_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardcomment',
+            index=models.Index(fields=['card', 'id'], name='cardcomment_card_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cardfile',
+            index=models.Index(fields=['card', 'id'], name='cardfile_card_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['board', 'id'], name='mark_board_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['owner', 'id'], name='project_owner_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0004_board_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='background_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, max_length=7),
+        ),
+    ]
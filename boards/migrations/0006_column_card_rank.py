@@ -0,0 +1,56 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:37
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+from boards.ranks import spread_ranks
+
+
+def rank_by_id(apps, schema_editor):
+    # Existing rows keep their insertion order.
+    for model_name, parent in (('Column', 'board_id'), ('Card', 'column_id')):
+        model = apps.get_model('boards', model_name)
+        rows = model.objects.order_by(parent, 'id').only('id', parent).iterator(chunk_size=2000)
+        for _, siblings in groupby(rows, key=lambda row: getattr(row, parent)):
+            siblings = list(siblings)
+            for row, rank in zip(siblings, spread_ranks(len(siblings))):
+                row.rank = rank
+            model.objects.bulk_update(siblings, ['rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_board_background_status'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='card',
+            options={'ordering': ('rank', 'id')},
+        ),
+        migrations.AlterModelOptions(
+            name='column',
+            options={'ordering': ('rank', 'id')},
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='rank',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='column',
+            name='rank',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(rank_by_id, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['column', 'rank', 'id'], name='card_column_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='column',
+            index=models.Index(fields=['board', 'rank', 'id'], name='column_board_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:45
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def start_journal(apps, schema_editor):
+    # There is no history before the journal, so clients synced to an earlier version have to reload.
+    Board = apps.get_model('boards', 'Board')
+    Board.objects.update(journal_start=models.F('version'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0006_column_card_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='journal_start',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(start_journal, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='BoardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='boards.board')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='boardchange',
+            index=models.Index(fields=['timestamp'], name='boardchange_timestamp_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='boardchange',
+            constraint=models.UniqueConstraint(fields=('board', 'seq'), name='boardchange_board_seq_uniq'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Rows are keyed by pk * 8 + the slot of their model, see boards.search.
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE boards_search USING fts5(
+    board_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)
+"""
+
+FILL_INDEX = """
+INSERT INTO boards_search (rowid, board_id, title, body)
+SELECT b.id * 8, b.id, b.title, '' FROM boards_board b
+UNION ALL
+SELECT c.id * 8 + 1, col.board_id, c.title,
+       c.description || char(10) || coalesce((SELECT group_concat(key, ' ') FROM json_each(c.checklist)
+                                              WHERE json_type(c.checklist) = 'object'), '')
+FROM boards_card c JOIN boards_column col ON col.id = c.column_id WHERE col.board_id IS NOT NULL
+UNION ALL
+SELECT cc.id * 8 + 2, col.board_id, '', cc.body
+FROM boards_cardcomment cc JOIN boards_card c ON c.id = cc.card_id JOIN boards_column col ON col.id = c.column_id
+WHERE col.board_id IS NOT NULL
+UNION ALL
+SELECT m.id * 8 + 3, m.board_id, m.title, '' FROM boards_mark m WHERE m.board_id IS NOT NULL
+"""
+
+
+def create_index(apps, schema_editor):
+    # Other databases use the unindexed boards.search.DatabaseSearchBackend.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_INDEX)
+        schema_editor.execute(FILL_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE boards_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0007_board_change_journal'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def dedupe(model, fields, order_by):
+    """
+    Deletes all but the first row, by `order_by`, of every group of rows sharing `fields`.
+
+    The table is walked in batches of BATCH_SIZE values of the first field,
+    each deduped in its own transaction, so an interrupted run keeps the
+    batches it finished and running it again picks up the rest.
+    """
+    key = fields[0]
+    rows = model.objects.filter(**{f'{name}__isnull': False for name in fields})
+    start = None
+    while True:
+        batch = rows if start is None else rows.filter(**{f'{key}__gt': start})
+        keys = list(batch.order_by(key).values_list(key, flat=True).distinct()[:BATCH_SIZE])
+        if not keys:
+            return
+        start = keys[-1]
+
+        with transaction.atomic():
+            duplicates, previous = [], None
+            group_rows = rows.filter(**{f'{key}__in': keys}).order_by(*fields, *order_by).values_list('id', *fields)
+            for pk, *group in group_rows:
+                if group == previous:
+                    duplicates.append(pk)
+                previous = group
+            for i in range(0, len(duplicates), BATCH_SIZE):
+                model.objects.filter(id__in=duplicates[i:i + BATCH_SIZE]).delete()
+
+
+def dedupe_join_tables(apps, schema_editor):
+    dedupe(apps.get_model('boards', 'BoardMember'), ('user_id', 'board_id'), ('id',))
+    dedupe(apps.get_model('boards', 'BoardFavourite'), ('user_id', 'board_id'), ('id',))
+    # The latest view of a board is the one the recent list shows.
+    dedupe(apps.get_model('boards', 'BoardLastSeen'), ('user_id', 'board_id'), ('-timestamp', '-id'))
+    dedupe(apps.get_model('boards', 'CardMark'), ('card_id', 'mark_id'), ('id',))
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own, see dedupe().
+    atomic = False
+
+    dependencies = [
+        ('boards', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_join_tables, migrations.RunPython.noop),
+    ]
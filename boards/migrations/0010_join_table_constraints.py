@@ -0,0 +1,33 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0009_dedupe_join_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['deadline'], name='card_deadline_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='boardfavourite',
+            constraint=models.UniqueConstraint(fields=('user', 'board'), name='boardfavourite_user_board_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='boardlastseen',
+            constraint=models.UniqueConstraint(fields=('user', 'board'), name='boardlastseen_user_board_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='boardmember',
+            constraint=models.UniqueConstraint(fields=('user', 'board'), name='boardmember_user_board_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardmark',
+            constraint=models.UniqueConstraint(fields=('card', 'mark'), name='cardmark_card_mark_uniq'),
+        ),
+    ]
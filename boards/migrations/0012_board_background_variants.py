@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0011_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='background_placeholder',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='background_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('boards', '0012_board_background_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardFileUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('part_size', models.PositiveIntegerField()),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('last_modified', models.DateTimeField(auto_now=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='boards.card')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='card_file_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CardFileUploadPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('file', models.FileField(upload_to='uploads/')),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='boards.cardfileupload')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='cardfileuploadpart',
+            constraint=models.UniqueConstraint(fields=('upload', 'number'), name='cardfileuploadpart_upload_number_uniq'),
+        ),
+    ]
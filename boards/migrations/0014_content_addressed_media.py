@@ -0,0 +1,40 @@
+# Generated by Django 4.1.3 on 2026-10-18 10:50
+
+import boards.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0013_card_file_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refs', models.PositiveIntegerField(default=0)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cardfile',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='board',
+            name='background_img',
+            field=models.ImageField(storage=boards.storage.get_media_storage, upload_to='back_img/'),
+        ),
+        migrations.AlterField(
+            model_name='cardfile',
+            name='file',
+            field=models.FileField(storage=boards.storage.get_media_storage, upload_to='card_files/'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Rows are keyed by pk * 8 + the slot of their model, see boards.search. Titles are weighted A and bodies D,
+# which ts_rank scores 1.0 and 0.1.
+CREATE_INDEX = """
+CREATE TABLE boards_search (
+    id bigint PRIMARY KEY,
+    board_id bigint,
+    title text NOT NULL,
+    body text NOT NULL,
+    document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'D')
+    ) STORED
+);
+CREATE INDEX boards_search_document ON boards_search USING gin (document);
+CREATE INDEX boards_search_board_id ON boards_search (board_id);
+"""
+
+FILL_INDEX = """
+INSERT INTO boards_search (id, board_id, title, body)
+SELECT b.id * 8, b.id, b.title, '' FROM boards_board b
+UNION ALL
+SELECT c.id * 8 + 1, col.board_id, c.title,
+       c.description || chr(10) || coalesce(CASE WHEN jsonb_typeof(c.checklist) = 'object' THEN
+                                                (SELECT string_agg(key, ' ') FROM jsonb_object_keys(c.checklist) key)
+                                            END, '')
+FROM boards_card c JOIN boards_column col ON col.id = c.column_id WHERE col.board_id IS NOT NULL
+UNION ALL
+SELECT cc.id * 8 + 2, col.board_id, '', cc.body
+FROM boards_cardcomment cc JOIN boards_card c ON c.id = cc.card_id JOIN boards_column col ON col.id = c.column_id
+WHERE col.board_id IS NOT NULL
+UNION ALL
+SELECT m.id * 8 + 3, m.board_id, m.title, '' FROM boards_mark m WHERE m.board_id IS NOT NULL
+"""
+
+
+def create_index(apps, schema_editor):
+    # The SQLite index is created by 0008_search_index, other databases have no index.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX)
+        schema_editor.execute(FILL_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE boards_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0014_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:32
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def queue_pending_on_last_write(apps, schema_editor):
+    # The last write is the best guess for backgrounds pending already.
+    Board = apps.get_model('boards', 'Board')
+    Board.objects.filter(background_status='pending').update(background_queued_on=F('last_modified'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0015_postgres_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='background_queued_on',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(queue_pending_on_last_write, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.3 on 2026-10-18 12:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0016_board_background_queued_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardfileupload',
+            name='card_file',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='boards.cardfile'),
+        ),
+        migrations.AddField(
+            model_name='cardfileupload',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='cardfileupload',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='cardfileupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('assembling', 'Assembling'), ('done', 'Done')], default='uploading', max_length=10),
+        ),
+    ]
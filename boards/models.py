@@ -1,8 +1,11 @@
 import sys
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from .storage import get_media_storage
+
 User = get_user_model()
 
 
@@ -10,24 +13,84 @@ class Project(models.Model):
     title = models.CharField(max_length=50)
     owner = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, related_name='projects')
 
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'id'], name='project_owner_id_idx')]
+
 
 class Board(models.Model):
+
+    class BackgroundStatus(models.TextChoices):
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     project = models.ForeignKey(to=Project, on_delete=models.SET_NULL, null=True, related_name='boards')
     title = models.CharField(max_length=50)
-    background_img = models.ImageField(upload_to='back_img/')
+    background_img = models.ImageField(upload_to='back_img/', storage=get_media_storage)
+    # Uploads are compressed in the background by boards.images.
+    background_status = models.CharField(max_length=7, choices=BackgroundStatus.choices,
+                                         default=BackgroundStatus.READY, editable=False)
+    # WebP renditions of the compressed background by width, and a tiny preview as a data URI.
+    background_variants = models.JSONField(default=dict, blank=True, editable=False)
+    background_placeholder = models.TextField(blank=True, default='', editable=False)
+    # When the pending upload was queued for compression, set by boards.signals.
+    background_queued_on = models.DateTimeField(null=True, blank=True, editable=False)
     is_archived = models.BooleanField(default=False)
 
     created_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
+    # Bumped by boards.signals on every write to the board or its content.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Changes up to this version were compacted out of the journal.
+    journal_start = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['project', 'id'], name='board_project_id_idx')]
 
     def __str__(self):
         return self.title
 
+    def get_background_variants(self):
+        """Returns the `(width, url)` of every variant of the background, narrowest first, once it is ready."""
+        if self.background_status != self.BackgroundStatus.READY:
+            return []
+        storage = self.background_img.storage
+        return sorted((int(width), storage.url(name)) for width, name in self.background_variants.items())
+
+    @property
+    def background_srcset(self):
+        return ', '.join(f'{url} {width}w' for width, url in self.get_background_variants())
+
+
+class BoardChange(models.Model):
+    """Journal entry for a write to a board's content, numbered by the board version it produced."""
+
+    class Action(models.TextChoices):
+        CREATED = 'created'
+        UPDATED = 'updated'
+        DELETED = 'deleted'
+
+    board = models.ForeignKey(to=Board, on_delete=models.CASCADE, related_name='changes')
+    seq = models.PositiveBigIntegerField()
+    model = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=7, choices=Action.choices)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['board', 'seq'], name='boardchange_board_seq_uniq')]
+        indexes = [models.Index(fields=['timestamp'], name='boardchange_timestamp_idx')]
+
 
 class BoardMember(models.Model):
     board = models.ForeignKey(to=Board, on_delete=models.SET_NULL, null=True, related_name='members')
     user = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, related_name='boards')
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'board'], name='boardmember_user_board_uniq')]
+        indexes = [models.Index(fields=['user', 'id'], name='boardmember_user_id_idx')]
+
     def __str__(self):
         return f'{self.board.id}:{self.user.id}'
 
@@ -37,19 +100,47 @@ class BoardLastSeen(models.Model):
     user = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, related_name='last_seen_boards')
     timestamp = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'board'], name='boardlastseen_user_board_uniq')]
+        indexes = [models.Index(fields=['user', '-timestamp', '-id'], name='boardlastseen_user_ts_idx')]
+
 
 class BoardFavourite(models.Model):
     board = models.ForeignKey(to=Board, on_delete=models.SET_NULL, null=True)
     user = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, related_name='favourite_boards')
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'board'], name='boardfavourite_user_board_uniq')]
+        indexes = [models.Index(fields=['user', 'id'], name='boardfavourite_user_id_idx')]
+
 
 class Column(models.Model):
     board = models.ForeignKey(to=Board, on_delete=models.SET_NULL, null=True, related_name='columns')
     title = models.CharField(max_length=30)
+    # Lexicographic position within the board, see boards.ranks.
+    rank = models.CharField(max_length=64, default='', editable=False)
+
+    class Meta:
+        ordering = ('rank', 'id')
+        indexes = [models.Index(fields=['board', 'rank', 'id'], name='column_board_rank_idx')]
 
     def __str__(self):
         return self.title
 
+    def delete(self, *args, **kwargs):
+        """
+        Leaves the cards without a column, out of search, with one update.
+
+        The delete collector would load every card and update them 100 at a time.
+        """
+        from .search import get_backend as get_search_backend
+
+        cards = Card.objects.filter(column=self.pk)
+        with transaction.atomic(savepoint=False):
+            get_search_backend().remove(list(cards.only('id')))
+            cards.update(column=None)
+            return super().delete(*args, **kwargs)
+
 
 class Card(models.Model):
     column = models.ForeignKey(to=Column, on_delete=models.SET_NULL, null=True, related_name='cards')
@@ -57,6 +148,15 @@ class Card(models.Model):
     description = models.TextField(max_length=500)
     deadline = models.DateTimeField()
     checklist = models.JSONField(blank=True, null=True)
+    # Lexicographic position within the column, see boards.ranks.
+    rank = models.CharField(max_length=64, default='', editable=False)
+
+    class Meta:
+        ordering = ('rank', 'id')
+        indexes = [
+            models.Index(fields=['column', 'rank', 'id'], name='card_column_rank_idx'),
+            models.Index(fields=['deadline'], name='card_deadline_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -68,23 +168,89 @@ class CardComment(models.Model):
     body = models.TextField(max_length=300)
     created_on = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['card', 'id'], name='cardcomment_card_id_idx')]
+
     def __str__(self):
         return self.body
 
 
 class CardFile(models.Model):
     card = models.ForeignKey(to=Card, on_delete=models.SET_NULL, related_name='files', null=True)
-    file = models.FileField(upload_to='card_files/')
+    file = models.FileField(upload_to='card_files/', storage=get_media_storage)
+    # Name of the uploaded file, the stored one is named after its content.
+    name = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['card', 'id'], name='cardfile_card_id_idx')]
 
     def __str__(self):
         return self.file
 
 
+class MediaBlob(models.Model):
+    """File stored once under the hash of its content by boards.storage, and how many rows refer to it."""
+    name = models.CharField(max_length=100, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    refs = models.PositiveIntegerField(default=0)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+
+
+class CardFileUpload(models.Model):
+    """Chunked upload of a card attachment, stored as a CardFile once all its parts are in, see boards.uploads."""
+
+    class Status(models.TextChoices):
+        UPLOADING = 'uploading'
+        ASSEMBLING = 'assembling'
+        DONE = 'done'
+
+    card = models.ForeignKey(to=Card, on_delete=models.CASCADE, related_name='uploads')
+    owner = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='card_file_uploads')
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Every part but the last is this long, so a part's number gives its place in the file.
+    part_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.UPLOADING)
+    # The SHA-256 the client expects of the joined parts, then the one they have once joined.
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    # Why the parts could not be joined, the upload takes parts again.
+    error = models.TextField(blank=True, default='')
+    card_file = models.ForeignKey(to=CardFile, on_delete=models.SET_NULL, null=True, related_name='+')
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.size // self.part_size))
+
+    def get_part_length(self, number):
+        return min(self.part_size, self.size - (number - 1) * self.part_size)
+
+
+class CardFileUploadPart(models.Model):
+    upload = models.ForeignKey(to=CardFileUpload, on_delete=models.CASCADE, related_name='parts')
+    number = models.PositiveIntegerField()
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    file = models.FileField(upload_to='uploads/')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'number'], name='cardfileuploadpart_upload_number_uniq'),
+        ]
+
+
 class Mark(models.Model):
     board = models.ForeignKey(to=Board, on_delete=models.SET_NULL, related_name='marks', null=True)
     title = models.CharField(max_length=30)
     color = models.CharField(default='#000', max_length=7)
 
+    class Meta:
+        indexes = [models.Index(fields=['board', 'id'], name='mark_board_id_idx')]
+
     def __str__(self):
         return self.title
 
@@ -93,5 +259,48 @@ class CardMark(models.Model):
     mark = models.ForeignKey(to=Mark, on_delete=models.SET_NULL, null=True)
     card = models.ForeignKey(to=Card, on_delete=models.SET_NULL, null=True, related_name='marks')
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['card', 'mark'], name='cardmark_card_mark_uniq')]
+
     def __str__(self):
         return self.mark.title
+
+
+class ImportJob(models.Model):
+    """Import of a Trello JSON export or an export archive into a project, see boards.imports."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    owner = models.ForeignKey(to=User, on_delete=models.SET_NULL, null=True, related_name='imports')
+    # Created from the source when the job first runs, unless given.
+    project = models.ForeignKey(to=Project, on_delete=models.SET_NULL, null=True, related_name='imports')
+    source = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=7, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True, default='')
+    # Rows imported so far and the seconds spent importing them, over every run of the job.
+    rows = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else None
+
+
+class ImportedRow(models.Model):
+    """Row of an import source and the row it was imported as, so a restarted job skips it."""
+    job = models.ForeignKey(to=ImportJob, on_delete=models.CASCADE, related_name='imported_rows')
+    model = models.CharField(max_length=20)
+    source_id = models.CharField(max_length=64)
+    object_id = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'model', 'source_id'], name='importedrow_job_source_uniq'),
+        ]
@@ -0,0 +1,136 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Keys are compared as plain strings, so the digits have to be in ASCII order.
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+# Appends step up at this width, so millions of them fit before keys get longer.
+APPEND_WIDTH = 4
+# Keys grow by about a digit every six inserts at the same spot; past this the siblings are respread.
+REBALANCE_LENGTH = 12
+
+_executor = None
+
+
+def _midpoint(lower, upper):
+    # `lower` may be empty and `upper` None for an open end; keys never end with the zero digit.
+    if upper is not None:
+        common = 0
+        while common < len(upper) and (lower[common] if common < len(lower) else DIGITS[0]) == upper[common]:
+            common += 1
+        if common:
+            return upper[:common] + _midpoint(lower[common:], upper[common:])
+
+    low = DIGITS.index(lower[0]) if lower else 0
+    high = DIGITS.index(upper[0]) if upper is not None else len(DIGITS)
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return DIGITS[low] + _midpoint(lower[1:], None)
+
+
+def _increment(lower):
+    digits = [DIGITS.index(digit) for digit in lower.ljust(APPEND_WIDTH, DIGITS[0])]
+    for i in reversed(range(len(digits))):
+        if digits[i] < len(DIGITS) - 1:
+            digits[i] += 1
+            return ''.join(DIGITS[digit] for digit in digits[:i + 1])
+    return _midpoint(lower, None)
+
+
+def rank_between(lower=None, upper=None):
+    """Returns a rank key sorting strictly between `lower` and `upper`, either of which may be open."""
+    if lower and upper and lower >= upper:
+        raise ValueError(f'{lower!r} does not sort before {upper!r}')
+    if lower and not upper:
+        return _increment(lower)
+    return _midpoint(lower or '', upper or None)
+
+
+def spread_ranks(count):
+    """Returns `count` ascending keys of equal length, evenly spaced over the key space."""
+    width = 1
+    while len(DIGITS) ** width < (count + 1) * len(DIGITS):
+        width += 1
+    step = len(DIGITS) ** width // (count + 1)
+
+    ranks = []
+    for i in range(1, count + 1):
+        value, digits = i * step, []
+        for _ in range(width):
+            value, digit = divmod(value, len(DIGITS))
+            digits.append(DIGITS[digit])
+        # Dropping trailing zero digits keeps the order and leaves room before every key.
+        ranks.append(''.join(reversed(digits)).rstrip(DIGITS[0]))
+    return ranks
+
+
+def get_rank(model, parent, exclude=None, before=None, after=None):
+    """
+    Returns the rank that places a row among the rows of `model` matching `parent`.
+
+    The row goes right before `before` or right after `after`, or at the end
+    if neither is given. `exclude` is the pk of the row being placed, which
+    is left out of its siblings.
+    """
+    if before is not None and not before.rank:
+        # Rows without a rank sort first and leave no room before them.
+        rebalance(model, parent)
+        before.refresh_from_db(fields=['rank'])
+
+    siblings = model.objects.filter(**parent)
+    if exclude is not None:
+        siblings = siblings.exclude(pk=exclude)
+    ranks = siblings.order_by('rank', 'id').values_list('rank', flat=True)
+    if after is not None:
+        lower, upper = after.rank, ranks.filter(rank__gt=after.rank).first()
+    elif before is not None:
+        lower, upper = ranks.filter(rank__lt=before.rank).last(), before.rank
+    else:
+        lower, upper = ranks.last(), None
+
+    rank = rank_between(lower, upper)
+    if len(rank) > REBALANCE_LENGTH:
+        schedule_rebalance(model, parent)
+    return rank
+
+
+def rebalance(model, parent):
+    """Rewrites the ranks of the rows of `model` matching `parent` with evenly spaced keys, keeping their order."""
+    from .changes import record_changes
+    from .models import BoardChange, Column
+
+    with transaction.atomic():
+        rows = list(model.objects.filter(**parent).select_for_update().order_by('rank', 'id'))
+        for row, rank in zip(rows, spread_ranks(len(rows))):
+            row.rank = rank
+        model.objects.bulk_update(rows, ['rank'], batch_size=1000)
+
+        board_id = parent.get('board_id') or Column.objects.filter(pk=parent['column_id']).values_list(
+            'board_id', flat=True).first()
+        record_changes(board_id, [(row, BoardChange.Action.UPDATED) for row in rows])
+
+
+def schedule_rebalance(model, parent):
+    """Rebalances in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run_rebalance, model, parent))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='board-ranks')
+    return _executor
+
+
+def _run_rebalance(model, parent):
+    try:
+        rebalance(model, parent)
+    except Exception:
+        logger.exception('Could not rebalance the %s ranks of %s', model.__name__, parent)
+    finally:
+        connection.close()
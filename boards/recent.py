@@ -0,0 +1,164 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Board, BoardLastSeen
+
+logger = logging.getLogger(__name__)
+
+RECENT_KEY = 'recent-boards:{pk}:{version}'
+RECENT_TIMEOUT = 60 * 60 * 24
+VERSION_KEY = 'recent-boards-version:{pk}'
+
+_lock = threading.Lock()
+_pending = {}
+_timer = None
+_background_flush = False
+
+
+def record_board_seen(user, board):
+    """
+    Marks `board` as seen by `user` now.
+
+    The user's recent list in the cache is updated right away. The database
+    write is buffered in this process and written in bulk by
+    flush_recent_boards, together with every other view buffered since.
+    Served processes call it on a timer and when they exit, see
+    start_background_flush.
+    """
+    now = timezone.now()
+    with _lock:
+        _pending[user.pk, board.pk] = now
+        _schedule_flush()
+
+    recent = [(pk, timestamp) for pk, timestamp in get_recent_board_ids(user) if pk != board.pk]
+    cache.set(get_recent_key(user.pk), [(board.pk, now), *recent][:settings.RECENT_BOARDS_LIMIT], RECENT_TIMEOUT)
+
+
+def get_recent_key(user_id):
+    """
+    The cache key of the user's recent list.
+
+    Its version changes whenever views of the user are written, so every
+    process rebuilds the list from the table rather than serving one that
+    predates them.
+    """
+    version = cache.get_or_set(VERSION_KEY.format(pk=user_id), time.time_ns, None)
+    return RECENT_KEY.format(pk=user_id, version=version)
+
+
+def get_recent_board_ids(user):
+    """Returns up to RECENT_BOARDS_LIMIT `(board id, timestamp)` pairs, the most recent first."""
+    key = get_recent_key(user.pk)
+    recent = cache.get(key)
+    if recent is None:
+        rows = (BoardLastSeen.objects.filter(user=user, board__isnull=False)
+                .order_by('-timestamp', '-id').values_list('board_id', 'timestamp'))
+        recent = {}
+        for board_id, timestamp in rows[:settings.RECENT_BOARDS_LIMIT]:
+            recent.setdefault(board_id, timestamp)
+        with _lock:
+            recent.update((board_id, timestamp) for (user_id, board_id), timestamp in _pending.items()
+                          if user_id == user.pk)
+        recent = sorted(recent.items(), key=lambda item: item[1], reverse=True)[:settings.RECENT_BOARDS_LIMIT]
+        cache.set(key, recent, RECENT_TIMEOUT)
+    return recent
+
+
+def get_recent_boards(user):
+    """Returns unsaved BoardLastSeen rows for the boards in the user's recent list that still exist."""
+    recent = get_recent_board_ids(user)
+    boards = Board.objects.in_bulk([pk for pk, timestamp in recent])
+    return [BoardLastSeen(user=user, board=boards[pk], timestamp=timestamp)
+            for pk, timestamp in recent if pk in boards]
+
+
+def flush_recent_boards():
+    """Writes the buffered views in bulk and trims each affected user to RECENT_BOARDS_LIMIT rows."""
+    with _lock:
+        pending = _pending.copy()
+        _pending.clear()
+    if not pending:
+        return
+    # Views of boards deleted since are dropped, they would fail the whole batch.
+    boards = set(Board.objects.filter(pk__in={board_id for user_id, board_id in pending}).values_list('id', flat=True))
+    pending = {key: timestamp for key, timestamp in pending.items() if key[1] in boards}
+    if not pending:
+        return
+
+    user_ids = {user_id for user_id, board_id in pending}
+    try:
+        with transaction.atomic():
+            rows = {(row.user_id, row.board_id): row for row in BoardLastSeen.objects.filter(
+                user_id__in=user_ids, board_id__in={board_id for user_id, board_id in pending})}
+            rows = [rows[key] for key in pending if key in rows]
+            # auto_now would stamp new rows with the flush time, so the view time is written afterwards.
+            rows.extend(BoardLastSeen.objects.bulk_create([
+                BoardLastSeen(user_id=user_id, board_id=board_id)
+                for user_id, board_id in pending.keys() - {(row.user_id, row.board_id) for row in rows}
+            ]))
+            for row in rows:
+                row.timestamp = pending[row.user_id, row.board_id]
+            BoardLastSeen.objects.bulk_update(rows, ['timestamp'])
+
+            for user_id in user_ids:
+                stale = (BoardLastSeen.objects.filter(user_id=user_id).order_by('-timestamp', '-id')
+                         .values_list('id', flat=True)[settings.RECENT_BOARDS_LIMIT:])
+                BoardLastSeen.objects.filter(id__in=list(stale)).delete()
+    except Exception:
+        # Putting the batch back would fail every later flush on the same rows.
+        logger.exception('Could not write %s buffered board views, dropping them', len(pending))
+        return
+    cache.set_many({VERSION_KEY.format(pk=user_id): time.time_ns() for user_id in user_ids}, None)
+
+
+def start_background_flush():
+    """
+    Writes the buffered views RECENT_BOARDS_FLUSH_INTERVAL seconds after the
+    first of them, and when the process exits. At most one interval of views
+    is lost if the process is killed.
+    """
+    global _background_flush
+    with _lock:
+        if _background_flush:
+            return
+        _background_flush = True
+        if _pending:
+            _schedule_flush()
+    atexit.register(flush_recent_boards)
+
+
+def clear_recent_boards():
+    """Drops the buffered views without writing them."""
+    global _timer
+    with _lock:
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+
+
+def _schedule_flush():
+    """Starts the timer writing the buffered views unless it is running already. Called with the lock held."""
+    global _timer
+    if _background_flush and _timer is None:
+        _timer = threading.Timer(settings.RECENT_BOARDS_FLUSH_INTERVAL, _flush_on_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_recent_boards()
+    finally:
+        connection.close()
+
@@ -0,0 +1,318 @@
+import json
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .access import get_user_access
+from .models import Board, Column, Card, CardComment, Mark
+
+# The index key of a row is its pk times the slot count plus the slot of its model.
+MODELS = (Board, Card, CardComment, Mark)
+SLOTS = 8
+
+SearchHit = namedtuple('SearchHit', ('model', 'id', 'board_id', 'title', 'snippet', 'card_id'), defaults=(None,))
+
+_backend = None
+
+
+def get_document(instance):
+    """Returns the `(board_id, title, body)` indexed for a row, or None if it is not on a board."""
+    if isinstance(instance, Board):
+        return instance.pk, instance.title, ''
+    if isinstance(instance, Mark):
+        return instance.board_id and (instance.board_id, instance.title, '')
+    if isinstance(instance, Card):
+        board_id = instance.column.board_id if instance.column_id else None
+        checklist = ' '.join(instance.checklist) if isinstance(instance.checklist, dict) else ''
+        return board_id and (board_id, instance.title, f'{instance.description}\n{checklist}')
+    if isinstance(instance, CardComment):
+        if CardComment.card.is_cached(instance):
+            board_id = instance.card and instance.card.column and instance.card.column.board_id
+        else:
+            board_id = Column.objects.filter(cards=instance.card_id).values_list('board_id', flat=True).first()
+        return board_id and (board_id, '', instance.body)
+    return None
+
+
+def get_match(text):
+    """Turns free text into a query matching rows that have every word, or a word starting with it."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text or ''))
+
+
+def get_board_ids(user):
+    access = get_user_access(user)
+    return access.boards | set(Board.objects.filter(project__in=access.projects).values_list('id', flat=True))
+
+
+class SearchBackend:
+    """
+    Full-text index over board, card, comment and label text.
+
+    update() and remove() are called by boards.signals in the transaction of
+    the write they mirror. search() returns the best hits first, only from
+    the boards in `board_ids`.
+    """
+
+    def update(self, instances):
+        raise NotImplementedError
+
+    def remove(self, instances):
+        raise NotImplementedError
+
+    def remove_board(self, board_id):
+        """Drops everything indexed under a deleted board, whose rows stay behind unlinked."""
+        raise NotImplementedError
+
+    def search(self, text, board_ids, offset, limit):
+        raise NotImplementedError
+
+    def count(self, text, board_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Reindexes every row, returns how many were indexed."""
+        raise NotImplementedError
+
+
+class TableSearchBackend(SearchBackend):
+    """Index kept in the boards_search table, one row per document keyed as described at MODELS."""
+    table = 'boards_search'
+
+    @staticmethod
+    def get_rowid(instance):
+        return instance.pk * SLOTS + MODELS.index(type(instance))
+
+    def remove_board(self, board_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE board_id = %s', [board_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        indexed, batch = 0, []
+        for model, related in ((Board, ()), (Mark, ()), (Card, ('column',)), (CardComment, ('card__column',))):
+            for instance in model.objects.select_related(*related).iterator(chunk_size=1000):
+                batch.append(instance)
+                if len(batch) == 1000:
+                    self.update(batch)
+                    indexed, batch = indexed + len(batch), []
+        self.update(batch)
+        return indexed + len(batch)
+
+
+class SqliteSearchBackend(TableSearchBackend):
+    """FTS5 index in the boards_search virtual table, ranked by BM25 with titles weighing more than bodies."""
+
+    def update(self, instances):
+        rows, removed = [], []
+        for instance in instances:
+            document = get_document(instance)
+            if document:
+                rows.append((self.get_rowid(instance), *document))
+            else:
+                removed.append(instance)
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(f'INSERT OR REPLACE INTO {self.table} (rowid, board_id, title, body) '
+                                   f'VALUES (%s, %s, %s, %s)', rows)
+        self.remove(removed)
+
+    def remove(self, instances):
+        rowids = [self.get_rowid(instance) for instance in instances]
+        cards = [instance.pk for instance in instances if isinstance(instance, Card)]
+        if rowids:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN (SELECT value FROM json_each(%s))',
+                               [json.dumps(rowids)])
+        if cards:
+            # Comments of removed cards stay behind without a board.
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN (SELECT id * {SLOTS} + '
+                               f'{MODELS.index(CardComment)} FROM boards_cardcomment '
+                               f'WHERE card_id IN (SELECT value FROM json_each(%s)))', [json.dumps(cards)])
+
+    def search(self, text, board_ids, offset, limit):
+        match = get_match(text)
+        if not match or not board_ids:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid, board_id, title, snippet({self.table}, -1, '', '', '…', 16) "
+                           f"FROM {self.table} WHERE {self.table} MATCH %s "
+                           f"AND board_id IN (SELECT value FROM json_each(%s)) "
+                           f"ORDER BY bm25({self.table}, 0.0, 10.0, 1.0), rowid LIMIT %s OFFSET %s",
+                           [match, json.dumps(sorted(board_ids)), limit, offset])
+            return [SearchHit(MODELS[rowid % SLOTS]._meta.model_name, rowid // SLOTS, board_id, title, snippet)
+                    for rowid, board_id, title, snippet in cursor.fetchall()]
+
+    def count(self, text, board_ids):
+        match = get_match(text)
+        if not match or not board_ids:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {self.table} WHERE {self.table} MATCH %s '
+                           f'AND board_id IN (SELECT value FROM json_each(%s))',
+                           [match, json.dumps(sorted(board_ids))])
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend(TableSearchBackend):
+    """
+    boards_search table with a stored tsvector under a GIN index, ranked by
+    ts_rank with titles weighing ten times more than bodies.
+
+    The hits are ranked, paged and given their snippet in a single query.
+    """
+
+    @staticmethod
+    def get_query(text):
+        """Turns free text into a tsquery matching rows that have every word, or a word starting with it."""
+        return ' & '.join(f'{word}:*' for word in re.findall(r'\w+', text or ''))
+
+    def update(self, instances):
+        rows, removed = [], []
+        for instance in instances:
+            document = get_document(instance)
+            if document:
+                rows.append((self.get_rowid(instance), *document))
+            else:
+                removed.append(instance)
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(f'INSERT INTO {self.table} (id, board_id, title, body) VALUES (%s, %s, %s, %s) '
+                                   f'ON CONFLICT (id) DO UPDATE SET board_id = EXCLUDED.board_id, '
+                                   f'title = EXCLUDED.title, body = EXCLUDED.body', rows)
+        self.remove(removed)
+
+    def remove(self, instances):
+        rowids = [self.get_rowid(instance) for instance in instances]
+        cards = [instance.pk for instance in instances if isinstance(instance, Card)]
+        if rowids:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE id = ANY(%s)', [rowids])
+        if cards:
+            # Comments of removed cards stay behind without a board.
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE id IN (SELECT id * {SLOTS} + '
+                               f'{MODELS.index(CardComment)} FROM boards_cardcomment WHERE card_id = ANY(%s))',
+                               [cards])
+
+    def search(self, text, board_ids, offset, limit):
+        query = self.get_query(text)
+        if not query or not board_ids:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id, board_id, title, ts_headline('simple', CASE WHEN to_tsvector('simple', body) "
+                           f"@@ query THEN body ELSE title END, query, 'StartSel=\"\", StopSel=\"\", MaxWords=16, "
+                           f"MinWords=8') "
+                           f"FROM (SELECT id, board_id, title, body, query, ts_rank(document, query) AS rank "
+                           f"FROM {self.table}, to_tsquery('simple', %s) AS query "
+                           f"WHERE document @@ query AND board_id = ANY(%s) "
+                           f"ORDER BY rank DESC, id LIMIT %s OFFSET %s) AS hits ORDER BY rank DESC, id",
+                           [query, sorted(board_ids), limit, offset])
+            return [SearchHit(MODELS[rowid % SLOTS]._meta.model_name, rowid // SLOTS, board_id, title, snippet)
+                    for rowid, board_id, title, snippet in cursor.fetchall()]
+
+    def count(self, text, board_ids):
+        query = self.get_query(text)
+        if not query or not board_ids:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {self.table} WHERE document @@ to_tsquery('simple', %s) "
+                           f"AND board_id = ANY(%s)", [query, sorted(board_ids)])
+            return cursor.fetchone()[0]
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Unindexed fallback for databases without an index backend, scanning the text columns of the boards in scope.
+
+    Title matches rank before body matches.
+    """
+    lookups = (
+        (Board, 'id', ('title',), ()),
+        (Card, 'column__board', ('title',), ('description', 'checklist')),
+        (CardComment, 'card__column__board', (), ('body',)),
+        (Mark, 'board', ('title',), ()),
+    )
+
+    def update(self, instances):
+        pass
+
+    def remove(self, instances):
+        pass
+
+    def remove_board(self, board_id):
+        pass
+
+    def get_querysets(self, text, board_ids):
+        words = re.findall(r'\w+', text or '')
+        if not words or not board_ids:
+            return
+        for model, board, titles, bodies in self.lookups:
+            queryset = model.objects.filter(**{f'{board}__in': board_ids}).order_by()
+            for word in words:
+                queryset = queryset.filter(Q(*(Q(**{f'{name}__icontains': word}) for name in titles + bodies),
+                                             _connector=Q.OR))
+            yield model, board, titles, queryset
+
+    def search(self, text, board_ids, offset, limit):
+        hits = []
+        for model, board, titles, queryset in self.get_querysets(text, board_ids):
+            fields = ('id', board, 'title' if titles else 'body')
+            for pk, board_id, value in queryset.values_list(*fields)[:offset + limit]:
+                hits.append(SearchHit(model._meta.model_name, pk, board_id,
+                                      value if titles else '', '' if titles else value))
+        words = [word.lower() for word in re.findall(r'\w+', text)]
+        hits.sort(key=lambda hit: not all(word in hit.title.lower() for word in words))
+        return hits[offset:offset + limit]
+
+    def count(self, text, board_ids):
+        return sum(queryset.count() for model, board, titles, queryset in self.get_querysets(text, board_ids))
+
+    def rebuild(self):
+        return 0
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = settings.SEARCH_BACKEND or {
+            'sqlite': 'boards.search.SqliteSearchBackend',
+            'postgresql': 'boards.search.PostgresSearchBackend',
+        }.get(connection.vendor, 'boards.search.DatabaseSearchBackend')
+        _backend = import_string(path)()
+    return _backend
+
+
+class SearchResults:
+    """
+    Lazy, sliceable hits of a search over the boards `user` can see.
+
+    Only the requested slice is fetched, so it can be handed to Django's
+    Paginator and to the API pagination as is.
+    """
+
+    def __init__(self, text, user):
+        self.text = text
+        self.board_ids = get_board_ids(user)
+
+    def count(self):
+        return get_backend().count(self.text, self.board_ids)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        hits = get_backend().search(self.text, self.board_ids, start, stop - start)
+
+        # Links to a comment go to its card.
+        comments = [hit.id for hit in hits if hit.model == 'cardcomment']
+        cards = dict(CardComment.objects.filter(pk__in=comments).values_list('id', 'card_id')) if comments else {}
+        return [hit._replace(card_id=hit.id if hit.model == 'card' else cards.get(hit.id)) for hit in hits]
@@ -0,0 +1,218 @@
+import os
+
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from trello.metrics import UPLOADS
+
+from .access import invalidate_user_access
+from .changes import get_deleted_boards, record_change
+from .models import Project, Board, BoardChange, BoardMember, Column, Card, Mark, CardMark, CardFile, CardComment
+from .ranks import get_rank
+from .search import get_backend as get_search_backend
+from .storage import release_media
+
+
+def get_action(signal, created=False):
+    if signal is post_delete:
+        return BoardChange.Action.DELETED
+    return BoardChange.Action.CREATED if created else BoardChange.Action.UPDATED
+
+
+@receiver(post_save, sender=Board)
+def board_saved(sender, instance, created, **kwargs):
+    if created:
+        # last_modified was already set by the save itself.
+        Board.objects.filter(pk=instance.pk).update(version=F('version') + 1)
+    else:
+        record_change(instance.pk, instance, BoardChange.Action.UPDATED)
+
+
+@receiver(pre_delete, sender=Board)
+def board_deleting(sender, instance, **kwargs):
+    get_deleted_boards().add(instance.pk)
+
+
+@receiver(post_delete, sender=Board)
+def board_deleted(sender, instance, **kwargs):
+    get_deleted_boards().discard(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Column)
+@receiver([post_save, post_delete], sender=Mark)
+@receiver([post_save, post_delete], sender=BoardMember)
+def board_asset_changed(sender, instance, signal, created=False, **kwargs):
+    record_change(instance.board_id, instance, get_action(signal, created))
+
+
+@receiver(pre_save, sender=Project)
+def project_owner_changing(sender, instance, **kwargs):
+    # The admin can hand a project over to somebody else.
+    instance._previous_owner_id = None
+    if not instance._state.adding:
+        previous = Project.objects.filter(pk=instance.pk).values_list('owner_id', flat=True)
+        instance._previous_owner_id = previous.first()
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, **kwargs):
+    if instance._previous_owner_id != instance.owner_id:
+        invalidate_user_access(instance.owner_id, instance._previous_owner_id)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    invalidate_user_access(instance.owner_id)
+
+
+@receiver(pre_save, sender=BoardMember)
+def board_member_changing(sender, instance, **kwargs):
+    instance._previous_user_id = None
+    if not instance._state.adding:
+        previous = BoardMember.objects.filter(pk=instance.pk).values_list('user_id', flat=True)
+        instance._previous_user_id = previous.first()
+
+
+@receiver(post_save, sender=BoardMember)
+def board_member_saved(sender, instance, **kwargs):
+    invalidate_user_access(instance.user_id, instance._previous_user_id)
+
+
+@receiver(post_delete, sender=BoardMember)
+def board_member_deleted(sender, instance, **kwargs):
+    invalidate_user_access(instance.user_id)
+
+
+@receiver(pre_save, sender=Column)
+def column_ranking(sender, instance, **kwargs):
+    # New columns go to the end of their board unless they were placed explicitly.
+    if instance._state.adding and not instance.rank and instance.board_id:
+        instance.rank = get_rank(Column, {'board_id': instance.board_id})
+
+
+@receiver(pre_save, sender=Card)
+def card_moving(sender, instance, **kwargs):
+    # A card can be moved to a column of another board, which has to be touched as well.
+    previous = None
+    if not instance._state.adding:
+        previous = Card.objects.filter(pk=instance.pk).values_list('column_id', 'rank').first()
+    instance._previous_column_id, previous_rank = previous or (None, '')
+
+    # New cards, and cards moved to another column without a new rank, go to the end of the column.
+    if previous is None:
+        placed = bool(instance.rank)
+    else:
+        placed = instance.column_id == instance._previous_column_id or instance.rank != previous_rank
+    if instance.column_id and not placed:
+        instance.rank = get_rank(Card, {'column_id': instance.column_id}, exclude=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Card)
+def card_changed(sender, instance, signal, created=False, **kwargs):
+    previous_column_id = getattr(instance, '_previous_column_id', None)
+    columns = {instance.column_id, previous_column_id} - {None}
+    if not columns:
+        return
+    boards = dict(Column.objects.filter(pk__in=columns).values_list('pk', 'board_id'))
+    board_id, previous_board_id = boards.get(instance.column_id), boards.get(previous_column_id)
+
+    # A card moved to another board leaves the journal of the old one as deleted.
+    if previous_board_id and previous_board_id != board_id:
+        record_change(previous_board_id, instance, BoardChange.Action.DELETED)
+        created = True
+    record_change(board_id, instance, get_action(signal, created))
+
+
+@receiver([post_save, post_delete], sender=CardMark)
+@receiver([post_save, post_delete], sender=CardFile)
+@receiver([post_save, post_delete], sender=CardComment)
+def card_asset_changed(sender, instance, signal, created=False, **kwargs):
+    if instance.card_id:
+        board_id = Column.objects.filter(cards=instance.card_id).values_list('board_id', flat=True).first()
+        record_change(board_id, instance, get_action(signal, created))
+
+
+@receiver(post_save, sender=Board)
+@receiver(post_save, sender=Mark)
+@receiver(post_save, sender=CardComment)
+def search_document_saved(sender, instance, **kwargs):
+    get_search_backend().update([instance])
+
+
+@receiver(post_save, sender=Card)
+def search_card_saved(sender, instance, **kwargs):
+    backend = get_search_backend()
+    backend.update([instance])
+    previous_column_id = getattr(instance, '_previous_column_id', None)
+    if previous_column_id and previous_column_id != instance.column_id:
+        # Comments are indexed under the board of their card.
+        backend.update(instance.comments.select_related('card__column'))
+
+
+@receiver(post_delete, sender=Mark)
+@receiver(post_delete, sender=CardComment)
+@receiver(pre_delete, sender=Card)
+def search_document_deleted(sender, instance, **kwargs):
+    get_search_backend().remove([instance])
+
+
+@receiver(pre_delete, sender=Column)
+def search_column_deleting(sender, instance, **kwargs):
+    # The cards are left without a column and drop out of search. Column.delete() detaches them beforehand, this
+    # covers queryset deletes. Not through instance.cards, which would load each card's column_id one at a time.
+    get_search_backend().remove(list(Card.objects.filter(column=instance.pk).only('id')))
+
+
+@receiver(post_delete, sender=Board)
+def search_board_deleted(sender, instance, **kwargs):
+    get_search_backend().remove_board(instance.pk)
+
+
+@receiver(pre_save, sender=CardFile)
+def card_file_naming(sender, instance, **kwargs):
+    # Still the name of the upload, the storage names the file after its content.
+    if not instance.name and instance.file:
+        instance.name = os.path.basename(instance.file.name)[:CardFile._meta.get_field('name').max_length]
+
+
+@receiver(pre_save, sender=Board)
+def board_background_queueing(sender, instance, **kwargs):
+    # A new upload is compressed once the save commits, imports go through bulk_create and set it themselves.
+    if instance.background_status == Board.BackgroundStatus.PENDING and not instance.background_img._committed:
+        instance.background_queued_on = timezone.now()
+
+
+@receiver(pre_save, sender=Board)
+def board_background_replacing(sender, instance, **kwargs):
+    # A new upload replaces the background, its variants go when the upload is compressed.
+    instance._previous_background = None
+    if instance.pk and not instance.background_img._committed:
+        previous = Board.objects.filter(pk=instance.pk).values_list('background_img', flat=True)
+        instance._previous_background = previous.first()
+
+
+@receiver(post_save, sender=Board)
+def board_background_replaced(sender, instance, **kwargs):
+    # Only once the new one is saved, outside a transaction on_commit() would run right away.
+    if instance._previous_background:
+        release_media([instance._previous_background])
+
+
+@receiver(post_delete, sender=Board)
+def board_media_deleted(sender, instance, **kwargs):
+    release_media([instance.background_img.name, *instance.background_variants.values()])
+
+
+@receiver(post_save, sender=CardFile)
+def card_file_uploaded(sender, instance, created, **kwargs):
+    # Whole uploads and completed chunked ones alike, imports go through bulk_create.
+    if created:
+        UPLOADS.inc(kind='card_file')
+
+
+@receiver(post_delete, sender=CardFile)
+def card_file_deleted(sender, instance, **kwargs):
+    release_media([instance.file.name])
+
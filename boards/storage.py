@@ -0,0 +1,174 @@
+import hashlib
+import os
+from io import UnsupportedOperation
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage, get_storage_class
+from django.db import transaction
+from django.db.models import F
+
+# Content addressed names never point to other content, so caches may keep them for good.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PREFIX = 'cas/'
+
+_media_storage = None
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(PREFIX)
+
+
+def get_content_name(digest, name):
+    return f'{PREFIX}{digest[:2]}/{digest}{os.path.splitext(name or "")[1].lower()}'
+
+
+def hash_content(content):
+    """
+    Returns the SHA-256 and size of `content` and a file to store in its place, rewound.
+
+    Content that cannot be rewound, like a streamed upload, is copied to a
+    temporary file while it is hashed, kept in memory only up to
+    FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    digest, size = hashlib.sha256(), 0
+    try:
+        content.seek(0)
+        copy = None
+    except (AttributeError, UnsupportedOperation):
+        copy = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    for chunk in content.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+        if copy is not None:
+            copy.write(chunk)
+    if copy is None:
+        content.seek(0)
+        return digest.hexdigest(), size, content
+    copy.seek(0)
+    return digest.hexdigest(), size, File(copy, content.name)
+
+
+class ContentAddressedStorage(Storage):
+    """
+    Stores every file once, under the SHA-256 of its content, and counts the references to it in MediaBlob.
+
+    save() of content already stored only adds a reference and delete() drops
+    one, removing the file with the last. Both lock the MediaBlob row of the
+    content, so a save racing the delete of the last reference either waits
+    for the file to go and stores it again, or keeps it from going. Names
+    saved before media was content addressed are passed to the backend as
+    they are. Files are kept in the DEFAULT_FILE_STORAGE backend, S3 objects
+    with immutable cache headers.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or get_storage_class()()
+        if hasattr(self.backend, 'object_parameters'):
+            self.backend.object_parameters = {**self.backend.object_parameters,
+                                              'CacheControl': IMMUTABLE_CACHE_CONTROL}
+
+    def save(self, name, content, max_length=None):
+        from .models import MediaBlob
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest, size, rewound = hash_content(content)
+        name = get_content_name(digest, name or content.name)
+        try:
+            while True:
+                with transaction.atomic():
+                    MediaBlob.objects.bulk_create([MediaBlob(name=name, sha256=digest, size=size)],
+                                                  ignore_conflicts=True)
+                    blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+                    # Deleted with its last reference after the insert, the next round creates it again.
+                    if blob is None:
+                        continue
+                    if not blob.refs:
+                        self.store(name, rewound)
+                    MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') + 1)
+                    return name
+        finally:
+            if rewound is not content:
+                rewound.close()
+
+    def store(self, name, content):
+        # Written whenever nothing refers to the content, the file may be gone with its last reference
+        # whatever exists() says.
+        self.backend.delete(name)
+        stored = self.backend.save(name, content)
+        # The same content was stored by a concurrent save in the meantime.
+        if stored != name:
+            self.backend.delete(stored)
+
+    def share(self, name):
+        """Adds a reference to a stored file for another row pointing at it, returns the name."""
+        from .models import MediaBlob
+
+        if is_content_addressed(name):
+            MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+        return name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        if not is_content_addressed(name):
+            return self.backend.delete(name)
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            if blob.refs > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') - 1)
+                return
+            # The file goes while the row is locked, before a concurrent save can add a reference again.
+            blob.delete()
+            self.backend.delete(name)
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+def get_media_storage():
+    """Storage of board backgrounds and card files."""
+    global _media_storage
+    if _media_storage is None:
+        _media_storage = ContentAddressedStorage()
+    return _media_storage
+
+
+def release_media(names):
+    """Drops the references of a deleted row to its content addressed files once the deletion commits."""
+    names = [name for name in names if is_content_addressed(name)]
+
+    def release():
+        for name in names:
+            get_media_storage().delete(name)
+
+    if names:
+        transaction.on_commit(release)
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from trello.metrics import UPLOADS
+from .models import CardFile, CardFileUpload, CardFileUploadPart
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+
+
+class UploadError(Exception):
+    """The upload cannot go on as asked, the message says why."""
+
+
+def spool(stream, limit):
+    """
+    Copies the first `limit` bytes of `stream` to a temporary file, hashing them on the way.
+
+    Returns the file, rewound, the number of bytes read and their SHA-256.
+    Storage backends may rewind what they save, which a request stream
+    cannot do, so the copy is what gets saved. It is kept in memory only up
+    to FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    copy = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    digest, received = hashlib.sha256(), 0
+    while received < limit:
+        data = stream.read(min(CHUNK_SIZE, limit - received))
+        if not data:
+            break
+        digest.update(data)
+        copy.write(data)
+        received += len(data)
+    copy.seek(0)
+    return copy, received, digest.hexdigest()
+
+
+class PartsReader:
+    """Read-only file of the stored parts of an upload one after the other, hashing them on the way."""
+
+    def __init__(self, parts):
+        self.parts = iter(parts)
+        self.file = None
+        self.hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        # Reads at most a chunk at a time whatever `size` asks for, which is all File.chunks() needs.
+        size = size if size and 0 < size < CHUNK_SIZE else CHUNK_SIZE
+        while True:
+            if self.file is None:
+                part = next(self.parts, None)
+                if part is None:
+                    return b''
+                self.file = default_storage.open(part.file.name, 'rb')
+            data = self.file.read(size)
+            if data:
+                self.hash.update(data)
+                return data
+            self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def save_part(upload, number, stream, length):
+    """
+    Streams part `number` of an upload from `stream` to storage, replacing the part if it was uploaded before.
+
+    The part is read in chunks and hashed on the way to a temporary file,
+    which is what storage receives, so memory does not grow with the part
+    size. A part cut short by a disconnect is discarded and has to be
+    uploaded again.
+    """
+    if upload.status != CardFileUpload.Status.UPLOADING:
+        raise UploadError(f'The upload is {upload.status}')
+    if not 1 <= number <= upload.part_count:
+        raise UploadError(f'The upload has parts 1 to {upload.part_count}')
+    if length != upload.get_part_length(number):
+        raise UploadError(f'Part {number} must be {upload.get_part_length(number)} bytes long')
+
+    copy, received, sha256 = spool(stream, length)
+    with copy:
+        if received != length:
+            raise UploadError(f'Part {number} was cut short, upload it again')
+        name = default_storage.save(f'uploads/{upload.pk}/{number}.part', File(copy, f'{number}.part'))
+
+    try:
+        with transaction.atomic():
+            # Locks the upload first, a part comes in before the upload is completed or not at all.
+            if not CardFileUpload.objects.filter(pk=upload.pk, status=CardFileUpload.Status.UPLOADING).update(
+                    last_modified=timezone.now()):
+                raise UploadError('The upload was completed or aborted in the meantime')
+            parts = upload.parts.filter(number=number)
+            stale = list(parts.values_list('file', flat=True))
+            parts.delete()
+            part = CardFileUploadPart.objects.create(upload=upload, number=number, size=length,
+                                                     sha256=sha256, file=name)
+    except UploadError:
+        default_storage.delete(name)
+        raise
+    except IntegrityError:
+        default_storage.delete(name)
+        raise UploadError(f'Part {number} is being uploaded by another request')
+    UPLOADS.inc(kind='card_file_part')
+    delete_files(stale)
+    return part
+
+
+def complete_upload(upload, sha256=None):
+    """
+    Schedules the parts of an upload to be joined into a new file of its card.
+
+    Joining copies the whole file, which takes longer than a request may,
+    so it runs in the background and the client polls the upload until it
+    is done or takes parts again, with the reason in `error`. The upload is
+    claimed with a conditional update, so of two requests completing it
+    only one schedules it, and no part is accepted in the meantime.
+    """
+    numbers = set(upload.parts.values_list('number', flat=True))
+    missing = sorted(set(range(1, upload.part_count + 1)) - numbers)
+    if missing:
+        raise UploadError(f'Parts {", ".join(map(str, missing))} are missing')
+
+    claimed = CardFileUpload.objects.filter(pk=upload.pk, status=CardFileUpload.Status.UPLOADING).update(
+        status=CardFileUpload.Status.ASSEMBLING, sha256=(sha256 or '').lower(), error='', last_modified=timezone.now())
+    if not claimed:
+        raise UploadError('The upload was already completed or aborted')
+    upload.refresh_from_db()
+    upload_id = upload.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run_assembly, upload_id))
+    return upload
+
+
+def assemble_upload(upload):
+    """
+    Joins the parts of a completed upload into a new file of its card, recording how it ended on the upload.
+
+    The parts are copied a chunk at a time and hashed on the way. When the
+    SHA-256 given to complete_upload() does not match, the parts are kept
+    so the client can compare them with their own hashes and upload the
+    wrong ones again.
+    """
+    field = CardFile._meta.get_field('file')
+    parts = list(upload.parts.order_by('number'))
+    reader = PartsReader(parts)
+    try:
+        name = field.storage.save(field.generate_filename(None, upload.name), File(reader))
+    except Exception as error:
+        logger.exception('Could not join the parts of upload %s', upload.pk)
+        return _reopen(upload, str(error) or type(error).__name__)
+    finally:
+        reader.close()
+    digest = reader.hash.hexdigest()
+    if upload.sha256 and upload.sha256 != digest:
+        field.storage.delete(name)
+        return _reopen(upload, f'The file has SHA-256 {digest}, not {upload.sha256}')
+
+    with transaction.atomic():
+        # An upload aborted in the meantime is gone, and so is what its parts were joined into.
+        aborted = not CardFileUpload.objects.select_for_update().filter(pk=upload.pk, status=upload.status).exists()
+        if not aborted:
+            upload.card_file = CardFile.objects.create(card_id=upload.card_id, file=name, name=upload.name)
+            upload.status, upload.sha256 = CardFileUpload.Status.DONE, digest
+            upload.save(update_fields=['status', 'sha256', 'card_file', 'last_modified'])
+    if aborted:
+        field.storage.delete(name)
+        return upload
+    upload.parts.all().delete()
+    delete_files(part.file.name for part in parts)
+    return upload
+
+
+def _reopen(upload, error):
+    # The upload takes parts again unless it was aborted in the meantime.
+    CardFileUpload.objects.filter(pk=upload.pk, status=upload.status).update(
+        status=CardFileUpload.Status.UPLOADING, error=error, last_modified=timezone.now())
+    upload.status, upload.error = CardFileUpload.Status.UPLOADING, error
+    return upload
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.CARD_FILE_UPLOAD_WORKERS,
+                                       thread_name_prefix='card-file-uploads')
+    return _executor
+
+
+def _run_assembly(upload_id):
+    try:
+        # Unless it was aborted before its turn came.
+        upload = CardFileUpload.objects.filter(pk=upload_id, status=CardFileUpload.Status.ASSEMBLING).first()
+        if upload is not None:
+            assemble_upload(upload)
+    except Exception:
+        logger.exception('Could not complete upload %s', upload_id)
+    finally:
+        connection.close()
+
+
+def abort_upload(upload):
+    names = list(upload.parts.values_list('file', flat=True))
+    upload.delete()
+    delete_files(names)
+
+
+def clear_stale_uploads(before):
+    """Aborts the uploads nothing was sent to since `before`, returns how many."""
+    uploads = list(CardFileUpload.objects.filter(last_modified__lt=before))
+    for upload in uploads:
+        abort_upload(upload)
+    return len(uploads)
@@ -1,14 +1,15 @@
-from io import BytesIO
-
-from django.core.files import File
+from django.conf import settings
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, RedirectView
 from django.views.generic.edit import FormMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import redirect, get_object_or_404
-from django.db.models import Q
-from PIL import Image
+from django.views.static import serve
 
+from .images import schedule_background_compression
+from .recent import record_board_seen, get_recent_boards
+from .search import SearchResults
+from .storage import IMMUTABLE_CACHE_CONTROL
 from .models import *
 from .forms import BarForm, CommentForm, CardCreateForm, CardUpdateForm
 
@@ -23,7 +24,7 @@ class ProjectListView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        recent_boards = [b.board for b in BoardLastSeen.objects.filter(user=self.request.user).order_by('-timestamp')]
+        recent_boards = [b.board for b in get_recent_boards(self.request.user)]
         fav_boards = [b.board for b in BoardFavourite.objects.filter(user=self.request.user)]
         archived_boards = [b.board for b in BoardMember.objects.filter(user=self.request.user, board__is_archived=True)]
         context['recent_boards'] = recent_boards
@@ -65,14 +66,9 @@ class BoardCreateView(CreateView):
 
     def form_valid(self, form):
         form.instance.project = Project.objects.get(pk=self.kwargs['pk'])
-        img = Image.open(form.instance.background_img)
-        img_output = BytesIO()
-        img.save(img_output,
-                 "JPEG",
-                 optimize=True,
-                 quality=30)
-        form.instance.background_img = File(img_output, name=form.instance.background_img.name)
+        form.instance.background_status = Board.BackgroundStatus.PENDING
         form.instance.save()
+        schedule_background_compression(form.instance)
         BoardMember(board=form.instance, user=self.request.user).save()
         return super().form_valid(form)
 
@@ -81,6 +77,14 @@ class BoardUpdateView(UpdateView):
     model = Board
     fields = ["title", "background_img", "is_archived"]
 
+    def form_valid(self, form):
+        if 'background_img' not in form.changed_data:
+            return super().form_valid(form)
+        form.instance.background_status = Board.BackgroundStatus.PENDING
+        response = super().form_valid(form)
+        schedule_background_compression(form.instance)
+        return response
+
     def get_success_url(self):
         return reverse("board-detail", kwargs={'pk': self.kwargs['pk']})
 
@@ -109,8 +113,7 @@ class BoardDetailView(DetailView, LoginRequiredMixin, FormMixin):
         self.object = self.get_object()
         context = self.get_context_data(object=self.object)
 
-        last_seen, created = BoardLastSeen.objects.get_or_create(board=self.object, user=self.request.user)
-        last_seen.save()
+        record_board_seen(self.request.user, self.object)
         return self.render_to_response(context)
 
     def post(self, request, pk):
@@ -130,7 +133,7 @@ class BoardFavRedirectView(RedirectView):
 
     def get_redirect_url(self, *args, **kwargs):
         board = Board.objects.get(pk=self.kwargs['pk'])
-        BoardFavourite(board=board, user=self.request.user).save()
+        BoardFavourite.objects.get_or_create(board=board, user=self.request.user)
         return super().get_redirect_url(*args, **kwargs)
 
 
@@ -239,13 +242,23 @@ class CardDeleteView(DeleteView):
         return reverse('home')
 
 
-class SearchResultsView(ListView):
-    model = Board
-    template_name = 'boards/board_list.html'
+class SearchResultsView(LoginRequiredMixin, ListView):
+    login_url = reverse_lazy('account_login')
+    template_name = 'boards/search_results.html'
+    context_object_name = 'hits'
+    paginate_by = 20
 
     def get_queryset(self):
-        query = self.request.GET.get("q")
-        object_list = Board.objects.filter(
-            Q(title__icontains=query) & Q(members__id=self.request.user.pk)
-        )
-        return object_list
+        return SearchResults(self.request.GET.get('q', ''), self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '')
+        return context
+
+
+def serve_content_addressed_media(request, path):
+    """Serves content addressed media from MEDIA_ROOT in development, cacheable for good as it never changes."""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -13,4 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trello.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up by get_asgi_application().
+from api.streams import BoardEventsRouter  # noqa: E402
+from boards.recent import start_background_flush  # noqa: E402
+
+application = BoardEventsRouter(django_application)
+start_background_flush()
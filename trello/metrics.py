@@ -0,0 +1,307 @@
+import atexit
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+ARCHIVE = 'archive.json'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def get_key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self, self.get_key(labels), lambda value: (value or 0) + amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        def add(value):
+            # One count per bucket, the last one for +Inf, then the sum and the count.
+            value = value or [0] * (len(self.buckets) + 3)
+            for index, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            value[index] += 1
+            value[-2] += amount
+            value[-1] += 1
+            return value
+        self.registry.update(self, self.get_key(labels), add)
+
+
+def merge(total, value):
+    if total is None:
+        return value
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in pairs) + '}'
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def format_number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Counters and histograms of this process, merged with the other workers' on collect().
+
+    Each process keeps its values in memory. With METRICS_DIR set, a
+    background thread writes them to <METRICS_DIR>/<pid>.json every
+    METRICS_FLUSH_INTERVAL seconds and at exit, and collect() adds up the
+    files of every process, so any worker can answer a scrape. The files of
+    workers that are gone are added to <METRICS_DIR>/archive.json, whose
+    counts still belong to the totals, before their pid can be reused.
+    Clear the directory when the whole app is restarted.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._values = {}
+        self._pid = os.getpid()
+        self._flusher = None
+        # The directory this process has written its file to, if any.
+        self._flushed_to = None
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def update(self, metric, key, function):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Values inherited from the parent process are its own.
+                self._pid, self._values, self._flusher, self._flushed_to = os.getpid(), {}, None, None
+            values = self._values.setdefault(metric.name, {})
+            values[key] = function(values.get(key))
+            if self._flusher is None and settings.METRICS_DIR:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='metrics-flush',
+                                                 daemon=True)
+                self._flusher.start()
+
+    def get_values(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return {}
+            return {name: {key: list(value) if isinstance(value, list) else value for key, value in values.items()}
+                    for name, values in self._values.items()}
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+        values = self.get_values()
+        if not values:
+            return
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        if self._flushed_to != directory:
+            # A file under this pid was left by an earlier process that had it.
+            self.archive(directory, [path])
+            self._flushed_to = directory
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({name: [[list(key), value] for key, value in values.items()]
+                                         for name, values in values.items()}))
+        os.replace(temporary, path)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write the metrics of process %s', os.getpid())
+
+    @staticmethod
+    def read(path):
+        """Returns the values in a metrics file, or None if it is gone."""
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Removed or replaced since it was listed.
+            return None
+        return {name: {tuple(key): value for key, value in rows} for name, rows in data.items()}
+
+    @staticmethod
+    def add(totals, values):
+        for name, rows in values.items():
+            metric_totals = totals.setdefault(name, {})
+            for key, value in rows.items():
+                metric_totals[key] = merge(metric_totals.get(key), value)
+        return totals
+
+    def archive(self, directory, paths):
+        """Adds the files of processes that are gone to the archive and removes them, one process at a time."""
+        with open(directory / 'archive.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            paths = [path for path in paths if path.exists()]
+            if not paths:
+                return
+            totals = self.read(directory / ARCHIVE) or {}
+            for path in paths:
+                self.add(totals, self.read(path) or {})
+            temporary = directory / 'archive.tmp'
+            temporary.write_text(json.dumps({name: [[list(key), value] for key, value in values.items()]
+                                             for name, values in totals.items()}))
+            os.replace(temporary, directory / ARCHIVE)
+            for path in paths:
+                path.unlink()
+
+    def collect(self):
+        """Returns the values of every process as `{metric name: {label values: value}}`."""
+        if settings.WORKER_PROCESSES > 1 and not settings.METRICS_DIR:
+            raise ImproperlyConfigured(f'METRICS_DIR is required to add up the metrics of '
+                                       f'{settings.WORKER_PROCESSES} worker processes')
+        totals = self.add({}, self.get_values())
+        if settings.METRICS_DIR:
+            directory = Path(settings.METRICS_DIR)
+            own = f'{os.getpid()}.json'
+            paths = [path for path in directory.glob('*.json') if path.name not in (own, ARCHIVE)]
+            dead = [path for path in paths if path.stem.isdigit() and not is_running(int(path.stem))]
+            if dead:
+                self.archive(directory, dead)
+            for path in [*(path for path in paths if path not in dead), directory / ARCHIVE]:
+                self.add(totals, self.read(path) or {})
+        return totals
+
+    def render(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(totals.get(name, {}).items()):
+                if metric.kind == 'counter':
+                    lines.append(f'{name}{format_labels(metric.labelnames, key)} {format_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, math.inf), value):
+                    cumulative += count
+                    labels = format_labels(metric.labelnames, key, [('le', format_number(float(bound)))])
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(metric.labelnames, key)} {format_number(value[-2])}')
+                lines.append(f'{name}_count{format_labels(metric.labelnames, key)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+REQUESTS = registry.counter('trello_http_requests_total', 'Requests handled, by URL name.',
+                            ('view', 'method', 'status'))
+REQUEST_DURATION = registry.histogram('trello_http_request_duration_seconds', 'Time spent handling requests.',
+                                      ('view', 'method'))
+RESPONSE_SIZE = registry.histogram('trello_http_response_size_bytes', 'Size of the response bodies, '
+                                   'streamed responses left out.', ('view',), SIZE_BUCKETS)
+REQUEST_QUERIES = registry.histogram('trello_http_request_db_queries', 'Database queries run per request.',
+                                     ('view',), QUERY_BUCKETS)
+IMAGE_COMPRESSIONS = registry.counter('trello_image_compressions_total', 'Board backgrounds processed, '
+                                      'by task and result.', ('task', 'result'))
+UPLOADS = registry.counter('trello_uploads_total', 'Files uploaded, by kind.', ('kind',))
+
+
+class MetricsMiddleware:
+    """Counts every request, and its latency, response size and queries, under the URL name it resolved to."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match and match.url_name or 'unmatched'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(duration, view=view, method=request.method)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view=view)
+        REQUEST_QUERIES.observe(queries, view=view)
+        return response
+
+
+def metrics_view(request):
+    """Serves the metrics of every worker, to clients sending METRICS_TOKEN as a bearer token if it is set."""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
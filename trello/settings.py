@@ -133,10 +133,27 @@ SOCIALACCOUNT_PROVIDERS = {
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
+    'PAGE_SIZE': 50,
+    # The first renderer answers requests asking for no format in particular. Its output is the same as
+    # DRF's JSONRenderer, only faster; `Accept: application/msgpack` gets MessagePack instead.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
 MIDDLEWARE = [
+    'trello.metrics.MetricsMiddleware',
+    'trello.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -166,6 +183,62 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'trello.wsgi.application'
 
+# Share of the requests measured by trello.timing.ServerTimingMiddleware, and whether the measures are
+# sent back to everyone in a Server-Timing header besides being logged. Staff users, and everyone with
+# DEBUG on, get the header of measured requests either way.
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0.01))
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', 'false').lower() == 'true'
+
+# Directory where each worker process writes its metrics for /metrics to add up, required when gunicorn runs
+# more than one worker: WEB_CONCURRENCY, which gunicorn reads as its worker count, has to match --workers if
+# that is passed instead. METRICS_TOKEN, if set, is required as a bearer token.
+WORKER_PROCESSES = int(os.environ.get('WEB_CONCURRENCY', 1))
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Size of the process pool compressing board backgrounds off the request, and the compressions each process
+# holds at most. Uploads past that stay pending, like those of a worker that died while compressing them,
+# until render_board_backgrounds picks up the ones pending for more than BOARD_IMAGE_PENDING_MINUTES.
+BOARD_IMAGE_WORKERS = int(os.environ.get('BOARD_IMAGE_WORKERS', 2))
+BOARD_IMAGE_QUEUE_SIZE = int(os.environ.get('BOARD_IMAGE_QUEUE_SIZE', 32))
+BOARD_IMAGE_PENDING_MINUTES = 10
+
+# Widths of the WebP variants rendered for every board background, offered to browsers as a srcset.
+BOARD_IMAGE_WIDTHS = (320, 640, 1280)
+
+# Boards kept in each user's "recently seen" list, and how often buffered views are written. The lists are read
+# from the cache, so CACHES has to point every worker at a shared backend such as Redis or Memcached; with the
+# default per-process LocMemCache each worker serves its own list.
+RECENT_BOARDS_LIMIT = 20
+RECENT_BOARDS_FLUSH_INTERVAL = 5
+
+# Board change journal entries kept by the compact_board_changes command, by age and per board.
+BOARD_CHANGES_RETENTION_DAYS = 7
+BOARD_CHANGES_KEEP = 10000
+
+# Live board events: the broker notifying streams of committed writes, how often streams also poll the
+# journal for writes the broker does not reach, the idle heartbeat and the changes buffered per client.
+BOARD_EVENTS_BROKER = 'boards.events.InProcessBroker'
+BOARD_EVENTS_POLL_INTERVAL = 5
+BOARD_EVENTS_HEARTBEAT = 15
+BOARD_EVENTS_QUEUE_SIZE = 1000
+
+# Background threads running import jobs, and the rows each import writes per bulk insert.
+BOARD_IMPORT_WORKERS = 1
+BOARD_IMPORT_BATCH_SIZE = 1000
+
+# Chunked card file uploads: the length of every part but the last, the largest file accepted, the
+# hours an upload may sit idle before clear_card_file_uploads drops it, and the background threads
+# joining the parts of completed uploads.
+CARD_FILE_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+CARD_FILE_MAX_SIZE = 4 * 1024 ** 3
+CARD_FILE_UPLOAD_EXPIRY_HOURS = 24
+CARD_FILE_UPLOAD_WORKERS = 1
+
+# Full-text search backend class, picked from the database vendor when None (see boards.search).
+SEARCH_BACKEND = None
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
@@ -0,0 +1,138 @@
+import functools
+import json
+import logging
+import random
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Order of the measures in the header and the log line.
+MEASURES = ('db', 'serializer', 'template', 'image')
+
+_timings = ContextVar('timings', default=None)
+_hooks_installed = False
+
+
+class Timings:
+    """Time spent on each measure by the request being handled, and the queries it ran."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(MEASURES, 0.0)
+        self.queries = 0
+        self.active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds['db'] += perf_counter() - start
+            self.queries += 1
+
+    def get_header(self, total):
+        entries = [f'db;dur={self.seconds["db"] * 1000:.1f};desc="{self.queries} queries"']
+        entries += [f'{name};dur={self.seconds[name] * 1000:.1f}' for name in MEASURES[1:] if self.seconds[name]]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def measure(name):
+    """Adds the time spent in the block to `name` on the sampled request being handled, if there is one."""
+    timings = _timings.get()
+    # Nested serializers and included templates are part of the outermost one.
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[name] += perf_counter() - start
+        timings.active.discard(name)
+
+
+def measured(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def install_hooks():
+    """
+    Wraps serializer output, template rendering and uploaded image validation in measure().
+
+    Called once by BoardsConfig.ready(), and only when the middleware is
+    installed. Calling it again does nothing.
+    """
+    global _hooks_installed
+    if _hooks_installed or 'trello.timing.ServerTimingMiddleware' not in settings.MIDDLEWARE:
+        return
+    _hooks_installed = True
+
+    from django.forms import ImageField
+    from django.template.base import Template
+    from rest_framework.serializers import BaseSerializer
+
+    # Serializer.data and ListSerializer.data both go through BaseSerializer.data.
+    BaseSerializer.data = property(measured('serializer')(BaseSerializer.data.fget))
+    Template.render = measured('template')(Template.render)
+    # DRF's ImageField validates uploads with Django's, which opens them with PIL.
+    ImageField.to_python = measured('image')(ImageField.to_python)
+
+
+class ServerTimingMiddleware:
+    """
+    Measures a sample of SERVER_TIMING_SAMPLE_RATE of the requests.
+
+    A measured request gets the count and time of its database queries and
+    the time spent on DRF serializer output, template rendering and uploaded
+    image validation. They are logged as one JSON line, and sent in a
+    Server-Timing header when SERVER_TIMING_HEADER or DEBUG is on or the user
+    is staff. Requests left out of the sample only cost a random number.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = Timings()
+        token = _timings.set(timings)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings.record_query))
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = perf_counter() - start
+
+        user = getattr(request, 'user', None)
+        if settings.SERVER_TIMING_HEADER or settings.DEBUG or (user and user.is_staff):
+            response['Server-Timing'] = timings.get_header(total)
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match and match.url_name,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': timings.queries,
+            **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in timings.seconds.items()},
+        }
+        logger.info(json.dumps(record), extra={'timing': record})
+        return response
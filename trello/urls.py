@@ -19,7 +19,10 @@ from django.conf.urls.static import static
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from boards.storage import PREFIX as CONTENT_ADDRESSED_PREFIX
+from boards.views import serve_content_addressed_media
 from . import settings
+from .metrics import metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -39,10 +42,20 @@ urlpatterns = [
     # REST API
     path('api/', include('api.urls')),
 
+    # Prometheus
+    path('metrics', metrics_view, name='metrics'),
+
     # Swagger
     re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + static(settings.STATIC_URL,
-                                                                           document_root=settings.STATIC_ROOT)
+]
+
+if settings.DEBUG:
+    # Ahead of static() to add the cache headers S3 gives content addressed media in production.
+    urlpatterns.append(re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>{CONTENT_ADDRESSED_PREFIX}.*)$',
+                               serve_content_addressed_media))
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + static(settings.STATIC_URL,
+                                                                            document_root=settings.STATIC_ROOT)
 
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trello.settings')
 
 application = get_wsgi_application()
+
+# Imported once Django is set up by get_wsgi_application().
+from boards.recent import start_background_flush  # noqa: E402
+
+start_background_flush()
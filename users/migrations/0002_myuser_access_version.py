@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='access_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]